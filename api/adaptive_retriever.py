@@ -1,38 +1,147 @@
-from langchain_chroma import Chroma
-from langchain_community.retrievers import BM25Retriever
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
 from langchain_core.documents import Document
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain.retrievers.document_compressors import EmbeddingsFilter
-from langchain.retrievers import ContextualCompressionRetriever
+from langchain_core.retrievers import BaseRetriever
+from api.bm25_index import get_bm25_index
+from api.gazetteer import get_place_index, match_places, place_where
+from api.vector_store import get_embedding_model, get_vectorstore
+from api.metrics import EMBEDDING_SECONDS, PLACE_FILTER_TOTAL, RETRIEVAL_SECONDS, timed
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import os
 
-# ✅ Explicit model name to avoid deprecation
-embedding_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+HYBRID_K = int(os.getenv("OKOO_HYBRID_K", "6"))
+HYBRID_CANDIDATES = int(os.getenv("OKOO_HYBRID_CANDIDATES", "20"))
+HYBRID_RRF_K = int(os.getenv("OKOO_HYBRID_RRF_K", "60"))
+HYBRID_LEXICAL_WEIGHT = float(os.getenv("OKOO_HYBRID_LEXICAL_WEIGHT", "1.0"))
+HYBRID_DENSE_WEIGHT = float(os.getenv("OKOO_HYBRID_DENSE_WEIGHT", "1.0"))
+# Compare queries keep only dense hits at least this similar; the lexical leg is unfiltered
+COMPARE_DENSE_THRESHOLD = float(os.getenv("OKOO_COMPARE_DENSE_THRESHOLD", "0.7"))
 
-vectorstore = Chroma(persist_directory="./chroma_db", embedding_function=embedding_model)
+_search_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="hybrid-search")
 
-def get_adaptive_retriever(query: str):
-    raw_docs = vectorstore.get()["documents"]
-    documents = [Document(page_content=doc, metadata={}) for doc in raw_docs]
+# ✅ Convert Chroma distances back to cosine similarity (MiniLM embeddings are unit-normalised,
+# so Chroma's squared L2 distance d equals 2 - 2 * cos)
+def _distance_to_similarity(distance: float, space: str) -> float:
+    if space in ("cosine", "ip"):
+        return 1.0 - distance
+    return 1.0 - distance / 2.0
 
-    if not documents:
-        return vectorstore.as_retriever(search_kwargs={"k": 3})
+# ✅ Dense search returning chunk ids and similarities straight from Chroma's stored vectors
+def dense_search(query: str, k: int = 6, where: Optional[Dict] = None) -> List[Tuple[str, Document, float]]:
+    collection = get_vectorstore()._collection
+    with timed(EMBEDDING_SECONDS, "embedding.query", purpose="query"):
+        query_embedding = get_embedding_model().embed_query(query)
+    with timed(RETRIEVAL_SECONDS, "retrieval.dense", stage="dense"):
+        results = collection.query(
+            query_embeddings=[query_embedding],
+            n_results=k,
+            where=where,
+            include=["documents", "metadatas", "distances"]
+        )
+    space = (collection.metadata or {}).get("hnsw:space", "l2")
+    return [
+        (chunk_id, Document(id=chunk_id, page_content=text, metadata=metadata or {}), _distance_to_similarity(distance, space))
+        for chunk_id, text, metadata, distance in zip(
+            results["ids"][0], results["documents"][0], results["metadatas"][0], results["distances"][0]
+        )
+    ]
 
-    bm25 = BM25Retriever.from_documents(documents)
-    bm25.k = 6
+# ✅ Search only the chunks covering the query's places; an empty restricted result
+# falls back to searching the whole corpus
+def _with_place_fallback(search, query: str, places: List[str]) -> List[Document]:
+    if not places:
+        return search(query, [])
+    docs = search(query, places)
+    if docs:
+        PLACE_FILTER_TOTAL.inc(outcome="filtered")
+        return docs
+    PLACE_FILTER_TOTAL.inc(outcome="fallback")
+    return search(query, [])
 
-    dense = vectorstore.as_retriever(search_kwargs={"k": 6})
+# ✅ Places named in the query that at least one stored chunk covers
+def query_places(query: str) -> List[str]:
+    places = match_places(query)
+    return get_place_index().known_places(places) if places else []
 
-    hybrid = ContextualCompressionRetriever(
-        base_retriever=dense,
-        base_compressor=EmbeddingsFilter(
-            embeddings=embedding_model,
-            similarity_threshold=0.7
-        )
-    )
-
-    if len(query.split()) < 4:
-        return bm25
-    elif "compare" in query.lower():
-        return hybrid
-    else:
-        return dense
\ No newline at end of file
+# ✅ Weighted reciprocal rank fusion over several ranked id lists, vectorised in NumPy.
+# Returns positions into the concatenated input lists (first occurrence of each id) and fused scores.
+def reciprocal_rank_fusion(
+    ranked_ids: Sequence[Sequence[str]], weights: Sequence[float], rrf_k: int = HYBRID_RRF_K, top_k: int = HYBRID_K
+) -> Tuple[np.ndarray, np.ndarray]:
+    lists = [np.asarray(ids, dtype=str) for ids in ranked_ids if len(ids)]
+    if not lists:
+        return np.empty(0, dtype=int), np.empty(0)
+    all_ids = np.concatenate(lists)
+    contributions = np.concatenate([
+        weight / (rrf_k + np.arange(1, len(ids) + 1))
+        for ids, weight in zip(ranked_ids, weights) if len(ids)
+    ])
+    _, first_index, inverse = np.unique(all_ids, return_index=True, return_inverse=True)
+    fused = np.bincount(inverse, weights=contributions)
+    # Highest fused score first; ties keep the order in which the ids were first seen
+    order = np.lexsort((first_index, -fused))[:top_k]
+    return first_index[order], fused[order]
+
+# ✅ Lexical and dense search run together and fused with reciprocal rank fusion. dense_threshold
+# drops dense hits below that similarity, checked against Chroma's own distances so no retrieved
+# chunk is embedded again on the request thread
+class HybridRetriever(BaseRetriever):
+    k: int = HYBRID_K
+    candidates: int = HYBRID_CANDIDATES
+    rrf_k: int = HYBRID_RRF_K
+    lexical_weight: float = HYBRID_LEXICAL_WEIGHT
+    dense_weight: float = HYBRID_DENSE_WEIGHT
+    dense_threshold: Optional[float] = None
+    places: List[str] = []
+
+    def _search(self, query: str, places: List[str]) -> List[Document]:
+        index = get_bm25_index()
+        allowed = get_place_index().chunk_ids(places) if places else None
+
+        def lexical_search():
+            with timed(RETRIEVAL_SECONDS, "retrieval.lexical", stage="lexical"):
+                return index.get_documents(chunk_id for chunk_id, _ in index.search(query, self.candidates, allowed=allowed))
+
+        lexical_future = _search_pool.submit(contextvars.copy_context().run, lexical_search)
+        dense_docs = [
+            doc for _, doc, similarity in dense_search(query, self.candidates, where=place_where(places))
+            if self.dense_threshold is None or similarity >= self.dense_threshold
+        ]
+        lexical_docs = lexical_future.result()
+
+        with timed(RETRIEVAL_SECONDS, "retrieval.fusion", stage="fusion"):
+            positions, _ = reciprocal_rank_fusion(
+                [[doc.id for doc in lexical_docs], [doc.id for doc in dense_docs]],
+                [self.lexical_weight, self.dense_weight],
+                rrf_k=self.rrf_k,
+                top_k=self.k
+            )
+        pool = lexical_docs + dense_docs
+        return [pool[position] for position in positions]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return _with_place_fallback(self._search, query, self.places)
+
+# ✅ filter_places restricts the search to chunks about the places the query names
+def get_adaptive_retriever(query: str, filter_places: bool = False):
+    vectorstore = get_vectorstore()
+
+    if len(get_bm25_index()) == 0:
+        return vectorstore.as_retriever(search_kwargs={"k": 3})
+    places = query_places(query) if filter_places else []
+    if "compare" in query.lower():
+        return HybridRetriever(dense_threshold=COMPARE_DENSE_THRESHOLD, places=places)
+    return HybridRetriever(places=places)
+
+# ✅ Documents retrieved speculatively while the intent was being classified; nodes only query
+# again when nothing was prefetched for this input
+def prefetched_or_retrieve(state: Dict) -> List[Document]:
+    docs = state.get("retrieved")
+    if docs is not None:
+        return docs
+    query = state["input"]
+    return get_adaptive_retriever(query, filter_places=True).invoke(query)
@@ -0,0 +1,102 @@
+from api.vector_store import get_embedding_model
+from api.metrics import EMBEDDING_SECONDS, timed
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import logging
+import os
+import threading
+
+SIMILARITY_THRESHOLD = float(os.getenv("OKOO_CACHE_SIMILARITY", "0.95"))
+MAX_ENTRIES = int(os.getenv("OKOO_CACHE_MAX_ENTRIES", "1024"))
+
+# ✅ Answer cache matched on query-embedding similarity, scoped by (model, intent)
+class SemanticAnswerCache:
+    def __init__(self, similarity_threshold: float = SIMILARITY_THRESHOLD, max_entries: int = MAX_ENTRIES):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.corpus_version = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, Dict]" = OrderedDict()
+        self._scopes: Dict[Tuple[str, str], List[int]] = {}
+        self._matrices: Dict[Tuple[str, str], np.ndarray] = {}
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def embed(self, query: str) -> np.ndarray:
+        with timed(EMBEDDING_SECONDS, "embedding.answer_cache", purpose="answer_cache"):
+            vector = np.asarray(get_embedding_model().embed_query(query), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, vector: np.ndarray, model: str, intent: str) -> Optional[Dict]:
+        scope = (model, intent)
+        with self._lock:
+            entry_ids = self._scopes.get(scope)
+            if not entry_ids:
+                self.misses += 1
+                return None
+            matrix = self._matrices.get(scope)
+            if matrix is None:
+                matrix = np.stack([self._entries[entry_id]["vector"] for entry_id in entry_ids])
+                self._matrices[scope] = matrix
+            similarities = matrix @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.similarity_threshold:
+                self.misses += 1
+                return None
+            entry_id = entry_ids[best]
+            self._entries.move_to_end(entry_id)
+            self.hits += 1
+            entry = self._entries[entry_id]
+            logging.info(f"⚡ Answer cache hit ({similarities[best]:.3f}) for intent {intent}")
+            return {"answer": entry["answer"], "source": entry["source"], "similarity": float(similarities[best])}
+
+    def store(self, vector: np.ndarray, model: str, intent: str, answer: str, source: str, corpus_version: int) -> None:
+        scope = (model, intent)
+        with self._lock:
+            # ✅ Drop answers computed against a corpus that changed while the graph was running
+            if corpus_version != self.corpus_version:
+                return
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = {"scope": scope, "vector": vector, "answer": answer, "source": source}
+            self._scopes.setdefault(scope, []).append(entry_id)
+            self._matrices.pop(scope, None)
+            while len(self._entries) > self.max_entries:
+                self._evict_oldest()
+
+    def _evict_oldest(self) -> None:
+        entry_id, entry = self._entries.popitem(last=False)
+        scope = entry["scope"]
+        self._scopes[scope].remove(entry_id)
+        if not self._scopes[scope]:
+            del self._scopes[scope]
+        self._matrices.pop(scope, None)
+        self.evictions += 1
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.corpus_version += 1
+            self._entries.clear()
+            self._scopes.clear()
+            self._matrices.clear()
+        logging.info(f"♻️ Answer cache invalidated (corpus version {self.corpus_version})")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "similarity_threshold": self.similarity_threshold,
+                "corpus_version": self.corpus_version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+answer_cache = SemanticAnswerCache()
@@ -0,0 +1,202 @@
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from api.vector_store import CHROMA_DIR, get_vectorstore
+from collections import defaultdict, Counter
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import heapq
+import json
+import logging
+import math
+import os
+import re
+import threading
+
+# ✅ Persisted next to the Chroma collection so both stay in step
+INDEX_PATH = os.path.join(CHROMA_DIR, "bm25_index.json")
+
+_TOKEN_RE = re.compile(r"\w+")
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+# ✅ Inverted BM25 index that supports adding and removing chunks in place
+class BM25Index:
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._docs: Dict[str, Tuple[str, Dict]] = {}
+        self._doc_len: Dict[str, int] = {}
+        self._postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self._total_len = 0
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(self, ids: Iterable[str], texts: Iterable[str], metadatas: Iterable[Optional[Dict]]) -> None:
+        with self._lock:
+            for chunk_id, text, metadata in zip(ids, texts, metadatas):
+                if chunk_id in self._docs:
+                    self._remove_one(chunk_id)
+                term_freqs = Counter(tokenize(text))
+                for term, tf in term_freqs.items():
+                    self._postings[term][chunk_id] = tf
+                length = sum(term_freqs.values())
+                self._docs[chunk_id] = (text, metadata or {})
+                self._doc_len[chunk_id] = length
+                self._total_len += length
+
+    def add_documents(self, ids: List[str], documents: List[Document]) -> None:
+        self.add(ids, [doc.page_content for doc in documents], [doc.metadata for doc in documents])
+
+    def remove(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            for chunk_id in ids:
+                if chunk_id in self._docs:
+                    self._remove_one(chunk_id)
+
+    def _remove_one(self, chunk_id: str) -> None:
+        text, _ = self._docs.pop(chunk_id)
+        for term in set(tokenize(text)):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(chunk_id, None)
+            if not postings:
+                del self._postings[term]
+        self._total_len -= self._doc_len.pop(chunk_id)
+
+    # allowed restricts scoring to those chunk ids (e.g. the chunks covering a place)
+    def search(self, query: str, k: int = 6, allowed: Optional[Set[str]] = None) -> List[Tuple[str, float]]:
+        with self._lock:
+            n_docs = len(self._docs)
+            if n_docs == 0:
+                return []
+            avg_len = self._total_len / n_docs
+            scores: Dict[str, float] = defaultdict(float)
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                df = len(postings)
+                idf = math.log((n_docs - df + 0.5) / (df + 0.5) + 1.0)
+                for chunk_id, tf in postings.items():
+                    if allowed is not None and chunk_id not in allowed:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_len[chunk_id] / avg_len)
+                    scores[chunk_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+            return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def texts(self) -> List[Tuple[str, str]]:
+        with self._lock:
+            return [(chunk_id, text) for chunk_id, (text, _) in self._docs.items()]
+
+    def get_documents(self, ids: Iterable[str]) -> List[Document]:
+        with self._lock:
+            documents = []
+            for chunk_id in ids:
+                if chunk_id in self._docs:
+                    text, metadata = self._docs[chunk_id]
+                    documents.append(Document(id=chunk_id, page_content=text, metadata=dict(metadata)))
+            return documents
+
+    def save(self, path: str = INDEX_PATH) -> None:
+        with self._lock:
+            payload = {"k1": self.k1, "b": self.b, "docs": self._docs}
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(payload, f)
+            os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = INDEX_PATH) -> "BM25Index":
+        with open(path, encoding="utf-8") as f:
+            payload = json.load(f)
+        index = cls(k1=payload.get("k1", 1.5), b=payload.get("b", 0.75))
+        docs = payload.get("docs", {})
+        index.add(docs.keys(), [text for text, _ in docs.values()], [meta for _, meta in docs.values()])
+        return index
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore) -> "BM25Index":
+        data = vectorstore.get(include=["documents", "metadatas"])
+        index = cls()
+        index.add(data["ids"], data["documents"], data["metadatas"])
+        return index
+
+class BM25IndexRetriever(BaseRetriever):
+    index: Any
+    k: int = 6
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        hits = self.index.search(query, self.k)
+        return self.index.get_documents(chunk_id for chunk_id, _ in hits)
+
+_index: Optional[BM25Index] = None
+_index_lock = threading.Lock()
+
+def _load_or_build() -> BM25Index:
+    vectorstore = get_vectorstore()
+    index = None
+    if os.path.exists(INDEX_PATH):
+        try:
+            index = BM25Index.load(INDEX_PATH)
+            logging.info(f"📇 Loaded BM25 index with {len(index)} chunks")
+        except Exception as e:
+            logging.warning(f"⚠️ Could not load BM25 index, rebuilding: {e}")
+        if index is not None and len(index) != vectorstore._collection.count():
+            logging.warning("⚠️ BM25 index is out of sync with Chroma, rebuilding.")
+            index = None
+    if index is None:
+        index = BM25Index.from_vectorstore(vectorstore)
+        index.save(INDEX_PATH)
+        logging.info(f"📇 Built BM25 index with {len(index)} chunks")
+    return index
+
+# ✅ Load the persisted index once; build it from Chroma only when it is missing
+def get_bm25_index() -> BM25Index:
+    global _index
+    if _index is not None:
+        return _index
+    with _index_lock:
+        if _index is None:
+            _index = _load_or_build()
+    return _index
+
+# ✅ Swap in the index another process saved; searches keep using the old one until it is loaded.
+# Only loads: the file is written by the process holding corpus_write_lock, so while it does not match
+# Chroma (a write is still in progress) the current index is kept and False tells the caller to retry
+def reload_bm25_index() -> bool:
+    global _index
+    if _index is None:
+        return True
+    try:
+        index = BM25Index.load(INDEX_PATH)
+    except Exception as e:
+        logging.warning(f"⚠️ Could not reload BM25 index, keeping the current one: {e}")
+        return False
+    if len(index) != get_vectorstore()._collection.count():
+        return False
+    with _index_lock:
+        _index = index
+    return True
+
+# ✅ Writer side, called under corpus_write_lock: saves are made once per write job (see corpus_sync), so
+# after another process's ingestion batch Chroma can be ahead of this index; it is rebuilt from Chroma then
+def catch_up_bm25_index() -> None:
+    global _index
+    if _index is None or len(_index) == get_vectorstore()._collection.count():
+        return
+    logging.info("📇 Chroma was written without a BM25 save, rebuilding the index from it")
+    index = BM25Index.from_vectorstore(get_vectorstore())
+    with _index_lock:
+        _index = index
+
+# Called under corpus_write_lock before a new corpus version is published
+def save_bm25_index() -> None:
+    if _index is not None:
+        _index.save(INDEX_PATH)
@@ -1,38 +1,37 @@
-from api.chroma_utils import index_document_to_chroma, vectorstore
+from api.corpus_sync import corpus_changed, corpus_write_lock
+from api.gazetteer import backfill_place_tags
+from api.ingestion import ingest_directory
+from api.place_cards import place_cards
+from typing import Callable, Dict, Optional
 import os
 import logging
 
-def preload_documents():
-    logging.info("📦 Starting document indexing from /data...")
+# ✅ Raises when indexing stops early so the caller can report it; progress is passed to ingest_directory
+def preload_documents(progress: Optional[Callable[[Dict[str, int]], None]] = None, data_dir: Optional[str] = None):
+    # ✅ Chunks stored under an older gazetteer are re-tagged by the writer, not by each process loading the index
+    with corpus_write_lock():
+        if backfill_place_tags():
+            corpus_changed()
 
-    try:
-        existing_docs = vectorstore.get()
-        if existing_docs and len(existing_docs["documents"]) > 0:
-            logging.info("🧠 Chroma DB already populated with chunks. Skipping indexing.")
-            return
-    except Exception as e:
-        logging.warning(f"⚠️ Could not inspect Chroma DB: {e}")
+    logging.info("📦 Starting document indexing from /data...")
 
-    data_dir = os.path.join(os.getcwd(), "data")
+    data_dir = data_dir or os.path.join(os.getcwd(), "data")
     if not os.path.exists(data_dir):
         logging.warning("⚠️ /data directory does not exist.")
         return
 
-    for filename in os.listdir(data_dir):
-        file_path = os.path.join(data_dir, filename)
-
-        if not os.path.isfile(file_path):
-            continue
-        if not filename.lower().endswith(('.pdf', '.docx', '.html', '.csv')):
-            logging.info(f"⏩ Skipping unsupported file: {filename}")
-            continue
-
-        logging.info(f"📄 Indexing file: {filename}")
-        success = index_document_to_chroma(file_path, file_id=None)
-
-        if success:
-            logging.info(f"✅ Indexed: {filename}")
-        else:
-            logging.warning(f"❌ Failed to index: {filename}")
-
-    logging.info("🎯 All files in /data indexed.")
\ No newline at end of file
+    try:
+        # ✅ With several API processes the first one to get the ingest lock indexes /data; the others
+        # wait for it and then find every file unchanged in the manifest
+        summary = ingest_directory(data_dir, progress=progress)
+    except Exception as e:
+        logging.error(f"❌ Indexing /data stopped early, it will resume on next start: {e}")
+        raise
+
+    logging.info(
+        f"🎯 /data indexed: {summary['indexed']} new or changed, {summary['skipped']} unchanged, "
+        f"{summary['removed']} removed, {summary['failed']} failed."
+    )
+    # ✅ Cards of places whose documents changed (or that have none yet) are generated in the background
+    place_cards.schedule_refresh()
+    return summary
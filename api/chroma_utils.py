@@ -2,12 +2,17 @@ from langchain_community.document_loaders import (
     PyPDFLoader, Docx2txtLoader, UnstructuredHTMLLoader, CSVLoader
 )
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_chroma import Chroma
 from langchain_core.documents import Document
-from typing import List
+from api.bm25_index import get_bm25_index
+from api.corpus_sync import corpus_changed
+from api.gazetteer import get_place_index, tag_places
+from api.vector_store import get_embedding_model, get_vectorstore
+from api.answer_cache import answer_cache
+from typing import Callable, List, Optional
 import os
-import logging
+import uuid
+
+EMBED_BATCH_SIZE = int(os.getenv("OKOO_EMBED_BATCH_SIZE", "256"))
 
 text_splitter = RecursiveCharacterTextSplitter(
     chunk_size=1000,
@@ -15,16 +20,7 @@ text_splitter = RecursiveCharacterTextSplitter(
     length_function=len
 )
 
-embedding_function = HuggingFaceEmbeddings(
-    model_name="sentence-transformers/all-MiniLM-L6-v2"
-)
-
-vectorstore = Chroma(
-    persist_directory="./chroma_db",
-    embedding_function=embedding_function
-)
-
-def load_and_split_document(file_path: str) -> List[Document]:
+def load_document(file_path: str) -> List[Document]:
     if file_path.endswith('.pdf'):
         loader = PyPDFLoader(file_path)
     elif file_path.endswith('.docx'):
@@ -36,33 +32,44 @@ def load_and_split_document(file_path: str) -> List[Document]:
     else:
         raise ValueError(f"Unsupported file type: {file_path}")
 
-    documents = loader.load()
-    return text_splitter.split_documents(documents)
+    return loader.load()
+
+def load_and_split_document(file_path: str) -> List[Document]:
+    return text_splitter.split_documents(load_document(file_path))
 
-def index_document_to_chroma(file_path: str, file_id: int | None = None) -> bool:
-    try:
-        splits = load_and_split_document(file_path)
-        logging.info(f"🔍 Loaded {len(splits)} chunks from {file_path}")
+# ✅ Embed chunks in large batches and upsert them into Chroma and the BM25 index in bulk.
+# Callers hold corpus_write_lock (see dedup)
+def store_chunks(
+    splits: List[Document], ids: Optional[List[str]] = None, progress: Optional[Callable[[int], None]] = None
+) -> List[str]:
+    ids = ids or [str(uuid.uuid4()) for _ in splits]
+    tag_places(splits)
+    collection = get_vectorstore()._collection
+    embedding_model = get_embedding_model()
 
-        for split in splits:
-            if file_id is not None:
-                split.metadata['file_id'] = file_id
-            split.metadata['filename'] = os.path.basename(file_path)
+    for start in range(0, len(splits), EMBED_BATCH_SIZE):
+        batch = splits[start:start + EMBED_BATCH_SIZE]
+        texts = [doc.page_content for doc in batch]
+        collection.upsert(
+            ids=ids[start:start + EMBED_BATCH_SIZE],
+            embeddings=embedding_model.embed_documents(texts),
+            documents=texts,
+            metadatas=[doc.metadata for doc in batch]
+        )
+        if progress:
+            progress(start + len(batch))
 
-        vectorstore.add_documents(splits)
-        logging.info(f"✅ Indexed {len(splits)} chunks into Chroma")
-        return True
-    except Exception as e:
-        logging.error(f"❌ Error indexing {file_path}: {e}")
-        return False
+    get_bm25_index().add_documents(ids, splits)
+    get_place_index().add(ids, [doc.metadata for doc in splits])
+    answer_cache.invalidate()
+    corpus_changed()
+    return ids
 
-def delete_doc_from_chroma(file_id: int) -> bool:
-    try:
-        docs = vectorstore.get(where={"file_id": file_id})
-        logging.info(f"Found {len(docs['ids'])} document chunks for file_id {file_id}")
-        vectorstore._collection.delete(where={"file_id": file_id})
-        logging.info(f"Deleted all documents with file_id {file_id}")
-        return True
-    except Exception as e:
-        logging.error(f"Error deleting document with file_id {file_id} from Chroma: {str(e)}")
-        return False
\ No newline at end of file
+def delete_chunks(ids: List[str]) -> None:
+    if not ids:
+        return
+    get_vectorstore()._collection.delete(ids=ids)
+    get_bm25_index().remove(ids)
+    get_place_index().remove(ids)
+    answer_cache.invalidate()
+    corpus_changed()
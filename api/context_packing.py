@@ -0,0 +1,159 @@
+from langchain_core.documents import Document
+from langchain_core.prompts import ChatPromptTemplate
+from api.bm25_index import tokenize
+from api.metrics import CONTEXT_PACKING_TOTAL, PACKED_CONTEXT_TOKENS, PROMPT_TOKENS
+from typing import Any, Dict, List, NamedTuple, Optional
+import logging
+import os
+import re
+
+# Context budget in tokens, overridable per model: OKOO_CONTEXT_TOKENS_BY_MODEL="qwen:0.5b=1200,llama3:8b=4000"
+CONTEXT_TOKENS = int(os.getenv("OKOO_CONTEXT_TOKENS", "1500"))
+CONTEXT_TOKENS_BY_MODEL = {
+    model.strip(): int(tokens)
+    for model, _, tokens in (item.rpartition("=") for item in os.getenv("OKOO_CONTEXT_TOKENS_BY_MODEL", "").split(",") if "=" in item)
+}
+DEDUP_JACCARD = float(os.getenv("OKOO_CONTEXT_DEDUP_JACCARD", "0.8"))
+# Passages are only truncated into the remaining budget when at least this many tokens are left
+MIN_PASSAGE_TOKENS = int(os.getenv("OKOO_CONTEXT_MIN_PASSAGE_TOKENS", "64"))
+# The splitter's chunk_overlap is 200 characters; look a little further to be safe
+MIN_OVERLAP_CHARS = 30
+MAX_OVERLAP_CHARS = 400
+CHARS_PER_TOKEN = 4
+
+_SENTENCE_END_RE = re.compile(r"[.!?](?=\s)|\n")
+
+class PackedContext(NamedTuple):
+    documents: List[Document]
+    tokens: int
+    stats: Dict[str, int]
+
+def context_budget(model: str) -> int:
+    return CONTEXT_TOKENS_BY_MODEL.get(model, CONTEXT_TOKENS)
+
+# ✅ Rough token count (about four characters per token) so no tokenizer has to be loaded
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def format_context(docs: List[Document]) -> str:
+    return "\n\n".join(doc.page_content for doc in docs)
+
+def _same_source(a: Document, b: Document) -> bool:
+    source = a.metadata.get("filename") or a.metadata.get("source")
+    return bool(source) and source == (b.metadata.get("filename") or b.metadata.get("source"))
+
+# ✅ Length of the longest suffix of left that is also a prefix of right (the splitter's overlap)
+def _overlap(left: str, right: str) -> int:
+    head = right[:MIN_OVERLAP_CHARS]
+    if len(head) < MIN_OVERLAP_CHARS:
+        return 0
+    tail = left[-MAX_OVERLAP_CHARS:]
+    start = tail.find(head)
+    while start != -1:
+        if right.startswith(tail[start:]):
+            return len(tail) - start
+        start = tail.find(head, start + 1)
+    return 0
+
+# ✅ Ids of the stored chunks a passage was built from, in text order
+def passage_chunk_ids(doc: Document) -> List[str]:
+    return doc.metadata.get("chunk_ids") or ([doc.id] if doc.id else [])
+
+# ✅ Join neighbouring chunks of the same file back into one passage, dropping the repeated overlap.
+# The merged passage keeps the rank and id of its best-ranked part and lists all its chunks in chunk_ids.
+def merge_neighbours(docs: List[Document]) -> List[Document]:
+    passages = [Document(id=doc.id, page_content=doc.page_content, metadata=dict(doc.metadata)) for doc in docs]
+    merged = True
+    while merged:
+        merged = False
+        for i, left in enumerate(passages):
+            for j, right in enumerate(passages):
+                if i == j or not _same_source(left, right):
+                    continue
+                overlap = _overlap(left.page_content, right.page_content)
+                if not overlap:
+                    continue
+                first = min(i, j)
+                passages[first] = Document(
+                    id=passages[first].id,
+                    page_content=left.page_content + right.page_content[overlap:],
+                    metadata={**passages[first].metadata, "chunk_ids": passage_chunk_ids(left) + passage_chunk_ids(right)}
+                )
+                del passages[max(i, j)]
+                merged = True
+                break
+            if merged:
+                break
+    return passages
+
+def _jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+# ✅ Drop passages whose words largely repeat a better-ranked passage (or are contained in one)
+def drop_near_duplicates(docs: List[Document], threshold: float = DEDUP_JACCARD) -> List[Document]:
+    kept: List[Document] = []
+    kept_tokens: List[set] = []
+    for doc in docs:
+        tokens = set(tokenize(doc.page_content))
+        if any(_jaccard(tokens, other) >= threshold or tokens <= other for other in kept_tokens):
+            continue
+        kept.append(doc)
+        kept_tokens.append(tokens)
+    return kept
+
+def _truncate(text: str, max_tokens: int) -> str:
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    ends = [match.end() for match in _SENTENCE_END_RE.finditer(cut)]
+    # Prefer ending on a sentence unless that would throw away most of the room
+    if ends and ends[-1] >= limit // 2:
+        cut = cut[:ends[-1]]
+    return cut.rstrip()
+
+# ✅ Merge overlapping neighbours, remove near-duplicates, then fill the model's token budget
+# in relevance order (retrievers return their best chunks first)
+def pack_context(docs: List[Document], model: str, budget: Optional[int] = None) -> PackedContext:
+    budget = context_budget(model) if budget is None else budget
+    merged = merge_neighbours(docs)
+    unique = drop_near_duplicates(merged)
+
+    packed: List[Document] = []
+    used = truncated = dropped = 0
+    for doc in unique:
+        tokens = estimate_tokens(doc.page_content)
+        remaining = budget - used
+        if tokens <= remaining:
+            packed.append(doc)
+            used += tokens
+        elif remaining >= MIN_PASSAGE_TOKENS:
+            text = _truncate(doc.page_content, remaining)
+            packed.append(Document(id=doc.id, page_content=text, metadata=dict(doc.metadata)))
+            used += estimate_tokens(text)
+            truncated += 1
+        else:
+            dropped += 1
+
+    stats = {
+        "retrieved": len(docs),
+        "merged": len(docs) - len(merged),
+        "duplicates": len(merged) - len(unique),
+        "truncated": truncated,
+        "dropped": dropped
+    }
+    for outcome, count in stats.items():
+        if outcome != "retrieved" and count:
+            CONTEXT_PACKING_TOTAL.inc(count, outcome=outcome)
+    PACKED_CONTEXT_TOKENS.observe(used, model=model)
+    logging.info(f"📦 Packed {len(packed)} of {len(docs)} chunks into {used}/{budget} context tokens {stats}")
+    return PackedContext(packed, used, stats)
+
+# ✅ Estimated size of the prompt actually sent to the model, recorded per chain
+def measure_prompt(prompt: ChatPromptTemplate, inputs: Dict[str, Any], name: str, model: str) -> int:
+    values = dict(inputs)
+    if isinstance(values.get("context"), list):
+        values["context"] = format_context(values["context"])
+    tokens = sum(estimate_tokens(str(message.content)) for message in prompt.format_messages(**values))
+    PROMPT_TOKENS.observe(tokens, chain=name, model=model)
+    return tokens
@@ -0,0 +1,124 @@
+from contextlib import contextmanager
+from filelock import FileLock, Timeout
+from api.answer_cache import answer_cache
+from api.bm25_index import catch_up_bm25_index, reload_bm25_index, save_bm25_index
+from api.gazetteer import reload_place_index
+from api.vector_store import CHROMA_DIR
+from typing import Dict, Iterator, Optional
+import logging
+import os
+import threading
+
+# ✅ Several API processes can share one corpus (see gunicorn.conf.py). Writes take a lock file so
+# exactly one of them changes Chroma, the BM25 index and the link tables at a time, and bump a
+# version file that the others compare against before serving a query
+LOCK_PATH = os.path.join(CHROMA_DIR, "corpus.lock")
+VERSION_PATH = os.path.join(CHROMA_DIR, "corpus.version")
+# Request handlers wait at most this long for the write lock (ingestion can hold it for minutes)
+REQUEST_LOCK_TIMEOUT = float(os.getenv("OKOO_CORPUS_LOCK_TIMEOUT", "5"))
+
+class CorpusBusy(Exception):
+    def __init__(self, retry_after: int = 10):
+        super().__init__(f"Another process is writing to the document index, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+_thread_lock = threading.RLock()
+# Lock files can't be inherited across a fork, so each process creates its own
+_file_locks: Dict[int, FileLock] = {}
+_sync_lock = threading.Lock()
+_depth = 0
+_changed = False
+# Threads inside deferred_publish, and whether writes are waiting for their save
+_deferring = threading.local()
+_unsaved = False
+
+def read_corpus_version() -> int:
+    try:
+        with open(VERSION_PATH, encoding="utf-8") as f:
+            return int(f.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+# Everything this process loads after import reflects at least this version
+_seen: Optional[int] = read_corpus_version()
+
+def _publish() -> None:
+    global _seen
+    version = read_corpus_version() + 1
+    tmp_path = f"{VERSION_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(str(version))
+    os.replace(tmp_path, VERSION_PATH)
+    _seen = version
+
+# ✅ Reload the in-memory indexes when another process changed the corpus since we last looked
+def sync_corpus() -> bool:
+    global _seen
+    version = read_corpus_version()
+    if version == _seen:
+        return False
+    with _sync_lock:
+        if version == _seen:
+            return False
+        if not reload_bm25_index():
+            # Another process is mid-write; the next query (or its published version) retries
+            return False
+        reload_place_index()
+        answer_cache.invalidate()
+        _seen = version
+    logging.info(f"🔄 Reloaded the indexes for corpus version {version}")
+    return True
+
+# ✅ Held around every corpus write; re-entrant within a thread. The first holder catches up with
+# other processes' writes; on release, if anything was written, the BM25 index is saved and a new
+# version is published (once per write job, not per batch). Background writers wait for it;
+# request handlers pass a timeout and get CorpusBusy instead
+@contextmanager
+def corpus_write_lock(timeout: Optional[float] = None) -> Iterator[None]:
+    global _depth, _changed, _unsaved
+    os.makedirs(CHROMA_DIR, exist_ok=True)
+    if not _thread_lock.acquire(timeout=-1 if timeout is None else timeout):
+        raise CorpusBusy()
+    try:
+        try:
+            file_lock = _file_locks.setdefault(os.getpid(), FileLock(LOCK_PATH)).acquire(timeout=-1 if timeout is None else timeout)
+        except Timeout:
+            raise CorpusBusy()
+        with file_lock:
+            if _depth == 0:
+                sync_corpus()
+                catch_up_bm25_index()
+            _depth += 1
+            try:
+                yield
+            finally:
+                _depth -= 1
+                if _depth == 0 and _changed:
+                    _changed = False
+                    if getattr(_deferring, "depth", 0):
+                        _unsaved = True
+                    else:
+                        _unsaved = False
+                        save_bm25_index()
+                        _publish()
+    finally:
+        _thread_lock.release()
+
+# Called by the writers (under corpus_write_lock) once Chroma or the indexes changed
+def corpus_changed() -> None:
+    global _changed
+    _changed = True
+
+# ✅ For jobs that take the write lock many times (/data ingestion writes batch by batch): the BM25
+# index is saved and the version published once, when the job ends, instead of after every batch
+@contextmanager
+def deferred_publish() -> Iterator[None]:
+    _deferring.depth = getattr(_deferring, "depth", 0) + 1
+    try:
+        yield
+    finally:
+        _deferring.depth -= 1
+        if _deferring.depth == 0:
+            with corpus_write_lock():
+                if _unsaved:
+                    corpus_changed()
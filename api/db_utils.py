@@ -1,17 +1,15 @@
+import json
+import os
 import sqlite3
+import threading
 from datetime import datetime
-from typing import List, Dict
+from typing import Iterable, List, Dict, Optional, Set
 
 DB_NAME = "rag_app.db"
 
-def get_db_connection() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-def create_application_logs() -> None:
-    conn = get_db_connection()
-    conn.execute('''
+# ✅ Schema migrations, applied in order and tracked with PRAGMA user_version
+MIGRATIONS = [
+    '''
         CREATE TABLE IF NOT EXISTS application_logs (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             session_id TEXT,
@@ -19,81 +17,349 @@ def create_application_logs() -> None:
             gpt_response TEXT,
             model TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    conn.commit()
-    conn.close()
-
-def create_document_store() -> None:
-    conn = get_db_connection()
-    conn.execute('''
+        );
         CREATE TABLE IF NOT EXISTS document_store (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             filename TEXT,
             upload_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    conn.commit()
-    conn.close()
+        );
+    ''',
+    '''
+        CREATE INDEX IF NOT EXISTS idx_application_logs_session_created
+            ON application_logs (session_id, created_at, id);
+    ''',
+    '''
+        CREATE TABLE IF NOT EXISTS source_documents (
+            source TEXT PRIMARY KEY,
+            filename TEXT NOT NULL,
+            file_id INTEGER,
+            sha256 TEXT NOT NULL,
+            duplicate_of TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE INDEX IF NOT EXISTS idx_source_documents_sha256 ON source_documents (sha256);
+        CREATE TABLE IF NOT EXISTS chunk_links (
+            source TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            chunk_id TEXT NOT NULL,
+            PRIMARY KEY (source, position)
+        );
+        CREATE INDEX IF NOT EXISTS idx_chunk_links_chunk ON chunk_links (chunk_id);
+    ''',
+    '''
+        CREATE TABLE IF NOT EXISTS session_summaries (
+            session_id TEXT PRIMARY KEY,
+            summary TEXT NOT NULL,
+            turns_summarized INTEGER NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    ''',
+    '''
+        CREATE TABLE IF NOT EXISTS place_cards (
+            place TEXT PRIMARY KEY,
+            content_hash TEXT NOT NULL,
+            card TEXT NOT NULL,
+            sources TEXT NOT NULL,
+            model TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    ''',
+    '''
+        CREATE TABLE IF NOT EXISTS upload_jobs (
+            job_id TEXT PRIMARY KEY,
+            job TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    ''',
+    '''
+        ALTER TABLE upload_jobs ADD COLUMN owner_pid INTEGER;
+        ALTER TABLE upload_jobs ADD COLUMN finished INTEGER NOT NULL DEFAULT 0;
+        CREATE INDEX IF NOT EXISTS idx_upload_jobs_finished_updated ON upload_jobs (finished, updated_at);
+    ''',
+    '''
+        ALTER TABLE session_summaries ADD COLUMN summarized_through_id INTEGER NOT NULL DEFAULT 0;
+        UPDATE session_summaries SET summarized_through_id = COALESCE((
+            SELECT id FROM (
+                SELECT id, session_id, ROW_NUMBER() OVER (PARTITION BY session_id ORDER BY created_at, id) AS turn
+                FROM application_logs
+            ) AS turns
+            WHERE turns.session_id = session_summaries.session_id AND turns.turn = session_summaries.turns_summarized
+        ), 0);
+        CREATE INDEX IF NOT EXISTS idx_application_logs_session_id ON application_logs (session_id, id);
+    ''',
+]
+
+# ✅ One long-lived connection per thread, in WAL mode so readers never block the writer.
+# Connections are never reused across a fork: a worker forked from a preloaded master opens its own
+# and keeps the inherited one referenced, since closing it in the child could touch the parent's WAL
+_local = threading.local()
+_inherited: List[sqlite3.Connection] = []
+
+def get_db_connection() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.pid != os.getpid():
+        _inherited.append(conn)
+        conn = None
+    if conn is None:
+        conn = sqlite3.connect(DB_NAME, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA foreign_keys=ON')
+        _local.conn = conn
+        _local.pid = os.getpid()
+    return conn
+
+def migrate() -> None:
+    conn = get_db_connection()
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    for number, script in enumerate(MIGRATIONS[version:], start=version + 1):
+        conn.executescript(script)
+        conn.execute(f'PRAGMA user_version = {number}')
+        conn.commit()
 
 def insert_application_logs(session_id: str, user_query: str, gpt_response: str, model: str) -> None:
     conn = get_db_connection()
-    conn.execute(
-        'INSERT INTO application_logs (session_id, user_query, gpt_response, model) VALUES (?, ?, ?, ?)',
-        (session_id, user_query, gpt_response, model)
-    )
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute(
+            'INSERT INTO application_logs (session_id, user_query, gpt_response, model) VALUES (?, ?, ?, ?)',
+            (session_id, user_query, gpt_response, model)
+        )
+
+def insert_application_logs_batch(rows: List[tuple]) -> None:
+    conn = get_db_connection()
+    with conn:
+        conn.executemany(
+            'INSERT INTO application_logs (session_id, user_query, gpt_response, model) VALUES (?, ?, ?, ?)',
+            rows
+        )
 
 def get_chat_history(session_id: str) -> List[Dict]:
     conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        'SELECT user_query, gpt_response FROM application_logs WHERE session_id = ? ORDER BY created_at',
+    # ✅ Served by idx_application_logs_session_created: an index seek, not a table scan
+    rows = conn.execute(
+        'SELECT user_query, gpt_response FROM application_logs WHERE session_id = ? ORDER BY created_at, id',
         (session_id,)
-    )
+    ).fetchall()
     messages = []
-    for row in cursor.fetchall():
+    for row in rows:
         messages.extend([
             {"role": "human", "content": row['user_query']},
             {"role": "ai", "content": row['gpt_response']}
         ])
-    conn.close()
     return messages
 
+# ✅ Logged turns of a session after row `after_id`, oldest first
+def get_chat_turns(session_id: str, after_id: int = 0) -> List[Dict]:
+    conn = get_db_connection()
+    rows = conn.execute(
+        'SELECT id, user_query, gpt_response FROM application_logs WHERE session_id = ? AND id > ? ORDER BY id',
+        (session_id, after_id)
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+def count_chat_turns(session_id: str, after_id: int = 0) -> int:
+    conn = get_db_connection()
+    return conn.execute(
+        'SELECT COUNT(*) FROM application_logs WHERE session_id = ? AND id > ?', (session_id, after_id)
+    ).fetchone()[0]
+
+# ✅ Rolling summary of the turns a session has pushed out of its recent-turns window.
+# summarized_through_id is the last logged row folded into it; turns_summarized only counts them
+def get_session_summary(session_id: str) -> Optional[Dict]:
+    conn = get_db_connection()
+    row = conn.execute(
+        'SELECT summary, turns_summarized, summarized_through_id FROM session_summaries WHERE session_id = ?', (session_id,)
+    ).fetchone()
+    return dict(row) if row else None
+
+def upsert_session_summary(session_id: str, summary: str, turns_summarized: int, summarized_through_id: int) -> None:
+    conn = get_db_connection()
+    with conn:
+        conn.execute(
+            '''INSERT INTO session_summaries (session_id, summary, turns_summarized, summarized_through_id) VALUES (?, ?, ?, ?)
+                ON CONFLICT(session_id) DO UPDATE SET
+                    summary = excluded.summary,
+                    turns_summarized = excluded.turns_summarized,
+                    summarized_through_id = excluded.summarized_through_id,
+                    updated_at = CURRENT_TIMESTAMP''',
+            (session_id, summary, turns_summarized, summarized_through_id)
+        )
+
+# ✅ Per-destination summary cards, tagged with the hash of the chunks they were generated from
+def get_place_card(place: str) -> Optional[Dict]:
+    conn = get_db_connection()
+    row = conn.execute('SELECT * FROM place_cards WHERE place = ?', (place,)).fetchone()
+    if row is None:
+        return None
+    card = dict(row)
+    card['sources'] = json.loads(card['sources'])
+    return card
+
+def get_place_card_hashes() -> Dict[str, str]:
+    conn = get_db_connection()
+    return {row['place']: row['content_hash'] for row in conn.execute('SELECT place, content_hash FROM place_cards')}
+
+def upsert_place_card(place: str, content_hash: str, card: str, sources: List[str], model: str) -> None:
+    conn = get_db_connection()
+    with conn:
+        conn.execute(
+            'INSERT OR REPLACE INTO place_cards (place, content_hash, card, sources, model) VALUES (?, ?, ?, ?, ?)',
+            (place, content_hash, card, json.dumps(sources), model)
+        )
+
+def delete_place_cards(places: Iterable[str]) -> None:
+    conn = get_db_connection()
+    with conn:
+        conn.executemany('DELETE FROM place_cards WHERE place = ?', [(place,) for place in places])
+
+# ✅ Upload job progress, so any API process can answer /upload-status for a job another one runs.
+# owner_pid is the process running the job
+def upsert_upload_job(job: Dict) -> None:
+    conn = get_db_connection()
+    with conn:
+        conn.execute(
+            'INSERT OR REPLACE INTO upload_jobs (job_id, job, owner_pid, finished) VALUES (?, ?, ?, ?)',
+            (job["job_id"], json.dumps(job), os.getpid(), int(job.get("finished_at") is not None))
+        )
+
+def get_upload_job(job_id: str) -> Optional[Dict]:
+    conn = get_db_connection()
+    row = conn.execute(
+        'SELECT job, owner_pid FROM upload_jobs WHERE job_id = ?', (job_id,)
+    ).fetchone()
+    if row is None:
+        return None
+    return {"job": json.loads(row['job']), "owner_pid": row['owner_pid']}
+
+def prune_upload_jobs(max_age_seconds: float) -> int:
+    conn = get_db_connection()
+    with conn:
+        cursor = conn.execute(
+            "DELETE FROM upload_jobs WHERE finished = 1 AND updated_at < datetime('now', ?)", (f"-{int(max_age_seconds)} seconds",)
+        )
+    return cursor.rowcount
+
 def insert_document_record(filename: str) -> int:
     conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('INSERT INTO document_store (filename) VALUES (?)', (filename,))
-    file_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    return file_id
+    with conn:
+        cursor = conn.execute('INSERT INTO document_store (filename) VALUES (?)', (filename,))
+    return cursor.lastrowid
 
 def delete_document_record(file_id: int) -> bool:
     conn = get_db_connection()
-    conn.execute('DELETE FROM document_store WHERE id = ?', (file_id,))
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute('DELETE FROM document_store WHERE id = ?', (file_id,))
     return True
 
 def get_all_documents() -> List[Dict]:
     conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT id, filename, upload_timestamp FROM document_store ORDER BY upload_timestamp DESC')
-    documents = cursor.fetchall()
-    conn.close()
+    documents = conn.execute(
+        'SELECT id, filename, upload_timestamp FROM document_store ORDER BY upload_timestamp DESC'
+    ).fetchall()
     return [dict(doc) for doc in documents]
 
 # ✅ NEW: Lookup filename by file_id
 def get_filename_by_id(file_id: int) -> str | None:
     conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT filename FROM document_store WHERE id = ?', (file_id,))
-    row = cursor.fetchone()
-    conn.close()
+    row = conn.execute('SELECT filename FROM document_store WHERE id = ?', (file_id,)).fetchone()
     return row['filename'] if row else None
 
-# ✅ Initialize tables
-create_application_logs()
-create_document_store()
\ No newline at end of file
+# ✅ Content-addressed chunk store: every source (data/ file or upload) links its chunk
+# positions to shared chunk ids; a stored vector lives as long as something links to it
+def upsert_source_document(source: str, filename: str, file_id: Optional[int], sha256: str, duplicate_of: Optional[str] = None) -> None:
+    conn = get_db_connection()
+    with conn:
+        conn.execute(
+            'INSERT OR REPLACE INTO source_documents (source, filename, file_id, sha256, duplicate_of) VALUES (?, ?, ?, ?, ?)',
+            (source, filename, file_id, sha256, duplicate_of)
+        )
+
+def get_source_document(source: str) -> Optional[Dict]:
+    conn = get_db_connection()
+    row = conn.execute('SELECT * FROM source_documents WHERE source = ?', (source,)).fetchone()
+    return dict(row) if row else None
+
+def find_source_by_sha256(sha256: str) -> Optional[str]:
+    conn = get_db_connection()
+    row = conn.execute(
+        'SELECT source FROM source_documents WHERE sha256 = ? ORDER BY created_at, source LIMIT 1', (sha256,)
+    ).fetchone()
+    return row['source'] if row else None
+
+def insert_chunk_links(source: str, chunk_ids: List[str]) -> None:
+    conn = get_db_connection()
+    with conn:
+        conn.execute('DELETE FROM chunk_links WHERE source = ?', (source,))
+        conn.executemany(
+            'INSERT INTO chunk_links (source, position, chunk_id) VALUES (?, ?, ?)',
+            [(source, position, chunk_id) for position, chunk_id in enumerate(chunk_ids)]
+        )
+
+def get_source_chunk_ids(source: str) -> List[str]:
+    conn = get_db_connection()
+    rows = conn.execute('SELECT chunk_id FROM chunk_links WHERE source = ? ORDER BY position', (source,)).fetchall()
+    return [row['chunk_id'] for row in rows]
+
+def get_linked_chunk_ids(chunk_ids: Iterable[str]) -> Set[str]:
+    chunk_ids = list(set(chunk_ids))
+    conn = get_db_connection()
+    linked = set()
+    for start in range(0, len(chunk_ids), 500):
+        batch = chunk_ids[start:start + 500]
+        rows = conn.execute(
+            f'SELECT DISTINCT chunk_id FROM chunk_links WHERE chunk_id IN ({",".join("?" * len(batch))})', batch
+        ).fetchall()
+        linked.update(row['chunk_id'] for row in rows)
+    return linked
+
+def get_chunk_owners(chunk_ids: Iterable[str]) -> Dict[str, Dict]:
+    chunk_ids = list(set(chunk_ids))
+    conn = get_db_connection()
+    owners = {}
+    for start in range(0, len(chunk_ids), 500):
+        batch = chunk_ids[start:start + 500]
+        rows = conn.execute(
+            f'''SELECT l.chunk_id, d.source, d.filename, d.file_id FROM chunk_links l
+                JOIN source_documents d ON d.source = l.source
+                WHERE l.chunk_id IN ({",".join("?" * len(batch))}) ORDER BY d.created_at DESC, d.source DESC''', batch
+        ).fetchall()
+        owners.update({row['chunk_id']: dict(row) for row in rows})
+    return owners
+
+def delete_source(source: str) -> List[str]:
+    conn = get_db_connection()
+    with conn:
+        rows = conn.execute('SELECT DISTINCT chunk_id FROM chunk_links WHERE source = ?', (source,)).fetchall()
+        conn.execute('DELETE FROM chunk_links WHERE source = ?', (source,))
+        conn.execute('DELETE FROM source_documents WHERE source = ?', (source,))
+    return [row['chunk_id'] for row in rows]
+
+def get_dedup_summary(limit: int = 20) -> Dict:
+    conn = get_db_connection()
+    totals = conn.execute(
+        'SELECT COUNT(*) AS links, COUNT(DISTINCT chunk_id) AS unique_chunks, COUNT(DISTINCT source) AS sources FROM chunk_links'
+    ).fetchone()
+    duplicates = conn.execute(
+        'SELECT source, filename, duplicate_of FROM source_documents WHERE duplicate_of IS NOT NULL ORDER BY source'
+    ).fetchall()
+    repeated = conn.execute(
+        '''SELECT source, COUNT(*) - COUNT(DISTINCT chunk_id) AS repeated_chunks FROM chunk_links
+            GROUP BY source HAVING repeated_chunks > 0 ORDER BY repeated_chunks DESC LIMIT ?''', (limit,)
+    ).fetchall()
+    shared = conn.execute(
+        '''SELECT a.source AS source, b.source AS shares_with, COUNT(DISTINCT a.chunk_id) AS shared_chunks
+            FROM chunk_links a JOIN chunk_links b ON a.chunk_id = b.chunk_id AND a.source < b.source
+            GROUP BY a.source, b.source ORDER BY shared_chunks DESC LIMIT ?''', (limit,)
+    ).fetchall()
+    return {
+        "sources": totals['sources'],
+        "chunk_links": totals['links'],
+        "unique_chunks": totals['unique_chunks'],
+        "duplicate_documents": [dict(row) for row in duplicates],
+        "repeated_within_source": [dict(row) for row in repeated],
+        "shared_between_sources": [dict(row) for row in shared]
+    }
+
+# ✅ Initialize / upgrade schema
+migrate()
@@ -0,0 +1,232 @@
+from langchain_core.documents import Document
+from api.bm25_index import get_bm25_index
+from api.chroma_utils import load_and_split_document, store_chunks, delete_chunks
+from api.corpus_sync import REQUEST_LOCK_TIMEOUT, CorpusBusy, corpus_write_lock
+from api.near_duplicates import NearDuplicateIndex
+from api.vector_store import get_vectorstore
+from api.db_utils import (
+    delete_source,
+    find_source_by_sha256,
+    get_chunk_owners,
+    get_dedup_summary,
+    get_linked_chunk_ids,
+    get_source_chunk_ids,
+    insert_chunk_links,
+    upsert_source_document
+)
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+import hashlib
+import logging
+import os
+import re
+import threading
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# ✅ Link bookkeeping and Chroma writes happen under corpus_write_lock (shared by every API process)
+# so a chunk can't be released by one source while another is linking to it; _lock only guards the counters
+_lock = threading.Lock()
+_counters = {
+    "chunks_seen": 0, "chunks_embedded": 0, "chunks_reused": 0, "chunks_near_duplicate": 0,
+    "documents_linked": 0, "chunks_deleted": 0
+}
+# Near-duplicate index over the stored chunks, rebuilt from the BM25 index whenever that is swapped
+# for another process's save. Only used under corpus_write_lock
+_near: Optional[NearDuplicateIndex] = None
+_near_source = None
+
+class SourceChunks(NamedTuple):
+    source: str
+    filename: str
+    file_id: Optional[int]
+    sha256: str
+    splits: List[Document]
+
+def data_source(filename: str) -> str:
+    return f"data:{filename}"
+
+def upload_source(file_id: int) -> str:
+    return f"upload:{file_id}"
+
+def file_sha256(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+# ✅ Chunk ids are derived from the (whitespace- and case-normalised) text, so identical
+# chunks from any file map to one stored vector
+def content_chunk_id(text: str) -> str:
+    normalized = _WHITESPACE_RE.sub(" ", text).strip().lower()
+    return "c-" + hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:32]
+
+def _count(**amounts) -> None:
+    with _lock:
+        for name, amount in amounts.items():
+            _counters[name] += amount
+
+def _near_duplicates() -> NearDuplicateIndex:
+    global _near, _near_source
+    bm25_index = get_bm25_index()
+    if _near is None or _near_source is not bm25_index:
+        _near, _near_source = NearDuplicateIndex(), bm25_index
+        for chunk_id, text in bm25_index.texts():
+            _near.add(chunk_id, text)
+    return _near
+
+# ✅ Undo a failed store: chunks stored without link rows could never be released, so drop the
+# sources' links and every new chunk nothing else links to. Caller holds corpus_write_lock
+def _discard_partial(entries: List[SourceChunks], new_ids: List[str]) -> None:
+    try:
+        for entry in entries:
+            delete_source(entry.source)
+        still_linked = get_linked_chunk_ids(new_ids)
+        delete_chunks([chunk_id for chunk_id in new_ids if chunk_id not in still_linked])
+    except Exception as e:
+        logging.error(f"❌ Could not remove the chunks of a failed store: {e}")
+
+# ✅ Store the chunks of one or more sources; only chunk texts that nothing links to yet are embedded.
+# A chunk that is a near-duplicate of a stored one (or of one earlier in the batch) links to it instead.
+# progress(embedded, reused) is called before embedding and after every batch.
+def store_sources(entries: List[SourceChunks], progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, int]:
+    global _near
+    with corpus_write_lock():
+        source_ids = {entry.source: [content_chunk_id(split.page_content) for split in entry.splits] for entry in entries}
+        known = get_linked_chunk_ids(chunk_id for ids in source_ids.values() for chunk_id in ids)
+        near = _near_duplicates()
+        new_chunks: Dict[str, Document] = {}
+        near_linked = 0
+        for entry in entries:
+            ids = source_ids[entry.source]
+            for position, split in enumerate(entry.splits):
+                chunk_id = ids[position]
+                if chunk_id in known or chunk_id in new_chunks:
+                    continue
+                similar = near.find(split.page_content)
+                if similar is not None:
+                    ids[position] = similar
+                    near_linked += 1
+                    continue
+                near.add(chunk_id, split.page_content)
+                split.metadata.update({"filename": entry.filename, "source_key": entry.source, "content_hash": chunk_id[2:]})
+                if entry.file_id is not None:
+                    split.metadata["file_id"] = entry.file_id
+                new_chunks[chunk_id] = split
+
+        total = sum(len(ids) for ids in source_ids.values())
+        reused = total - len(new_chunks)
+        if progress:
+            progress(0, reused)
+        try:
+            if new_chunks:
+                store_chunks(
+                    list(new_chunks.values()), list(new_chunks),
+                    progress=(lambda embedded: progress(embedded, reused)) if progress else None
+                )
+            for entry in entries:
+                upsert_source_document(entry.source, entry.filename, entry.file_id, entry.sha256)
+                insert_chunk_links(entry.source, source_ids[entry.source])
+        except Exception:
+            _discard_partial(entries, list(new_chunks))
+            _near = None
+            raise
+        _count(chunks_seen=total, chunks_embedded=len(new_chunks), chunks_reused=reused, chunks_near_duplicate=near_linked)
+
+    if reused:
+        logging.info(
+            f"♻️ Reused {reused} of {total} chunks already stored ({near_linked} near-duplicates), embedded {len(new_chunks)}"
+        )
+    return {"chunks": total, "embedded": len(new_chunks), "reused": reused}
+
+def find_duplicate_document(sha256: str) -> Optional[str]:
+    return find_source_by_sha256(sha256)
+
+# ✅ A byte-identical document links to the canonical copy's chunks without being parsed
+def link_duplicate_document(source: str, filename: str, file_id: Optional[int], sha256: str, canonical: str) -> int:
+    with corpus_write_lock():
+        chunk_ids = get_source_chunk_ids(canonical)
+        upsert_source_document(source, filename, file_id, sha256, duplicate_of=canonical)
+        insert_chunk_links(source, chunk_ids)
+        _count(documents_linked=1, chunks_seen=len(chunk_ids), chunks_reused=len(chunk_ids))
+    logging.info(f"♻️ {filename} is identical to {canonical}, linked {len(chunk_ids)} chunks")
+    return len(chunk_ids)
+
+# ✅ Point chunks that outlive their first source at a source that still links to them
+def _reassign_owners(chunk_ids: List[str], released: set) -> None:
+    if not chunk_ids:
+        return
+    collection = get_vectorstore()._collection
+    data = collection.get(ids=chunk_ids, include=["metadatas"])
+    orphaned_owner = [chunk_id for chunk_id, meta in zip(data["ids"], data["metadatas"]) if (meta or {}).get("source_key") in released]
+    owners = get_chunk_owners(orphaned_owner)
+    if not owners:
+        return
+    collection.update(
+        ids=list(owners),
+        metadatas=[
+            {"filename": owner["filename"], "source": owner["filename"], "source_key": owner["source"], "file_id": owner["file_id"]}
+            for owner in owners.values()
+        ]
+    )
+
+# ✅ Unlink sources; chunks nothing links to any more are deleted. extra_chunk_ids are
+# candidates from before chunks were linked (legacy ids) and are deleted when unlinked.
+def release_sources(sources: Iterable[str], extra_chunk_ids: Iterable[str] = (), lock_timeout: Optional[float] = None) -> int:
+    released = set(sources)
+    with corpus_write_lock(lock_timeout):
+        candidates = set(extra_chunk_ids)
+        for source in released:
+            candidates.update(delete_source(source))
+        if not candidates:
+            return 0
+        still_linked = get_linked_chunk_ids(candidates)
+        orphans = list(candidates - still_linked)
+        delete_chunks(orphans)
+        if _near is not None:
+            _near.remove(orphans)
+        _reassign_owners(list(still_linked), released)
+        _count(chunks_deleted=len(orphans))
+    return len(orphans)
+
+def index_document_to_chroma(file_path: str, file_id: int | None = None, filename: Optional[str] = None) -> bool:
+    try:
+        filename = filename or os.path.basename(file_path)
+        source = upload_source(file_id) if file_id is not None else data_source(filename)
+        sha256 = file_sha256(file_path)
+        canonical = find_duplicate_document(sha256)
+        if canonical and canonical != source:
+            link_duplicate_document(source, filename, file_id, sha256, canonical)
+            return True
+        splits = load_and_split_document(file_path)
+        logging.info(f"🔍 Loaded {len(splits)} chunks from {file_path}")
+        result = store_sources([SourceChunks(source, filename, file_id, sha256, splits)])
+        logging.info(f"✅ Indexed {result['chunks']} chunks ({result['embedded']} embedded, {result['reused']} reused)")
+        return True
+    except Exception as e:
+        logging.error(f"❌ Error indexing {file_path}: {e}")
+        return False
+
+def delete_doc_from_chroma(file_id: int) -> bool:
+    try:
+        file_id = int(file_id)
+        # Uploads indexed before chunk links existed are still found through their metadata
+        legacy_ids = get_vectorstore().get(where={"file_id": file_id}, include=[])["ids"]
+        deleted = release_sources([upload_source(file_id)], legacy_ids, lock_timeout=REQUEST_LOCK_TIMEOUT)
+        logging.info(f"Deleted {deleted} chunks no longer used after removing file_id {file_id}")
+        return True
+    except CorpusBusy:
+        raise
+    except Exception as e:
+        logging.error(f"Error deleting document with file_id {file_id} from Chroma: {str(e)}")
+        return False
+
+def dedup_report() -> Dict:
+    summary = get_dedup_summary()
+    with _lock:
+        counters = dict(_counters)
+    return {
+        **summary,
+        "links_sharing_a_vector": summary["chunk_links"] - summary["unique_chunks"],
+        "since_start": counters
+    }
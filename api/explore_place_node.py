@@ -1,6 +1,10 @@
-from langchain_community.llms import Ollama
 from langchain_core.prompts import ChatPromptTemplate
-from api.adaptive_retriever import get_adaptive_retriever
+from api.adaptive_retriever import prefetched_or_retrieve, query_places
+from api.context_packing import format_context, measure_prompt, pack_context
+from api.metrics import PLACE_CARD_REQUESTS_TOTAL
+from api.model_registry import DEFAULT_MODEL, get_chain
+from api.place_cards import card_document, is_plain_exploration, place_cards
+from api.streaming import stream_answer, write_answer
 import logging
 
 explore_prompt = ChatPromptTemplate.from_messages([
@@ -13,19 +17,29 @@ If the context is insufficient, say 'I don't know based on the documents.'"""),
     ("human", "{input}")
 ])
 
+def get_explore_chain(model: str = DEFAULT_MODEL):
+    return get_chain(model, "explore", lambda llm: explore_prompt | llm)
+
+# ✅ A plain "explore <place>" request is answered with the place's precomputed card; other
+# questions about a single place get the card as compact context ahead of the retrieved chunks
 def explore_place(state):
     query = state["input"]
-    model = state.get("model", "qwen:0.5b")
-    retriever = get_adaptive_retriever(query)
-    docs = retriever.invoke(query)
+    model = state.get("model", DEFAULT_MODEL)
+    places = query_places(query)
+    card = place_cards.fresh_card(places[0]) if len(places) == 1 else None
+    if card and is_plain_exploration(query, places[0]):
+        PLACE_CARD_REQUESTS_TOTAL.inc(outcome="served")
+        logging.info(f"🪪 Served the place card for {places[0]}")
+        return {**state, "answer": write_answer(card["card"]), "source_documents": [card_document(card)], "prompt_tokens": 0}
 
-    llm = Ollama(model=model)
-    chain = explore_prompt | llm
+    PLACE_CARD_REQUESTS_TOTAL.inc(outcome="context" if card else "none")
+    retrieved = prefetched_or_retrieve(state)
+    docs = pack_context([card_document(card)] + retrieved if card else retrieved, model).documents
 
-    result = chain.invoke({
-        "input": query,
-        "context": "\n\n".join([doc.page_content for doc in docs])
-    })
+    chain = get_explore_chain(model)
+    inputs = {"input": query, "context": format_context(docs)}
+    prompt_tokens = measure_prompt(explore_prompt, inputs, "explore", model)
+    result = stream_answer(chain, inputs, name="explore", model=model)
 
     logging.info(f"🗺️ Exploration result: {result}")
-    return {**state, "answer": result, "source_documents": docs}
\ No newline at end of file
+    return {**state, "answer": result, "source_documents": docs, "prompt_tokens": prompt_tokens}
\ No newline at end of file
@@ -0,0 +1,211 @@
+from langchain_core.documents import Document
+from api.vector_store import get_vectorstore
+from typing import Dict, Iterable, List, Optional, Set
+import logging
+import os
+import re
+import threading
+
+# Bump when PLACES changes so stored chunks are re-tagged on the next start
+GAZETTEER_VERSION = 1
+PLACE_KEY_PREFIX = "place_"
+
+# ✅ Place slug → names and aliases found in queries, documents and file names
+PLACES: Dict[str, List[str]] = {
+    "addis_ababa": ["Addis Ababa", "Addis Abeba", "Addis", "Finfinne"],
+    "lalibela": ["Lalibela", "Roha"],
+    "gondar": ["Gondar", "Gonder", "Fasil Ghebbi", "Fasilides"],
+    "bahir_dar": ["Bahir Dar", "Bahar Dar", "Lake Tana", "Tana", "Blue Nile Falls", "Tis Abay", "Tis Issat"],
+    "aksum": ["Aksum", "Axum"],
+    "simien": ["Simien Mountains", "Semien Mountains", "Simien", "Semien", "Ras Dashen", "Ras Dejen"],
+    "danakil": ["Danakil Depression", "Danakil", "Afar Depression"],
+    "dallol": ["Dallol"],
+    "erta_ale": ["Erta Ale"],
+    "harar": ["Harar", "Harer", "Jugol", "Jegol"],
+    "dire_dawa": ["Dire Dawa"],
+    "omo_valley": ["Omo Valley", "Lower Omo", "South Omo", "Omo"],
+    "jinka": ["Jinka"],
+    "turmi": ["Turmi", "Hamar", "Hamer"],
+    "mago": ["Mago National Park", "Mago", "Mursi"],
+    "konso": ["Konso"],
+    "bale": ["Bale Mountains", "Bale", "Harenna", "Sanetti Plateau", "Sanetti"],
+    "sof_omar": ["Sof Omar"],
+    "arba_minch": ["Arba Minch", "Nech Sar", "Nechisar", "Neche Sar"],
+    "hawassa": ["Hawassa", "Awassa"],
+    "rift_valley": ["Rift Valley Lakes", "Rift Valley"],
+    "langano": ["Langano"],
+    "ziway": ["Ziway", "Batu"],
+    "abijatta_shalla": ["Abijatta", "Abijata", "Shalla", "Shala"],
+    "shashamane": ["Shashamane", "Shashemene"],
+    "bishoftu": ["Bishoftu", "Debre Zeyit"],
+    "adama": ["Adama", "Nazret", "Nazareth"],
+    "awash": ["Awash National Park", "Awash"],
+    "debre_damo": ["Debre Damo"],
+    "debre_libanos": ["Debre Libanos"],
+    "dessie": ["Dessie", "Lake Hayk", "Hayk"],
+    "jimma": ["Jimma", "Abba Jifar"],
+    "gambella": ["Gambella", "Gambela", "Anuak"],
+    "asosa": ["Asosa", "Assosa", "Benishangul"],
+    "mekelle": ["Mekelle", "Mekele"],
+    "tigray": ["Tigray"],
+    "gheralta": ["Gheralta", "Abuna Yemata"],
+    "yeha": ["Yeha"],
+    "blue_nile_gorge": ["Blue Nile Gorge"],
+    "yirgacheffe": ["Yirgacheffe", "Yirga Chefe"],
+    "sidama": ["Sidama"],
+}
+
+def _compile_matcher(places: Dict[str, List[str]]):
+    alias_places = {alias.lower(): slug for slug, aliases in places.items() for alias in aliases}
+    # Longest aliases first so "Lake Tana" / "Blue Nile Gorge" win over shorter names inside them
+    alternation = "|".join(
+        re.escape(alias).replace(r"\ ", r"[\s_\-]+")
+        for alias in sorted(alias_places, key=len, reverse=True)
+    )
+    return re.compile(rf"(?<![^\W_])({alternation})(?![^\W_])", re.IGNORECASE), alias_places
+
+_PLACE_RE, _ALIAS_PLACES = _compile_matcher(PLACES)
+_SPACES_RE = re.compile(r"[\s_\-]+")
+
+def match_places(text: str) -> List[str]:
+    slugs = []
+    for match in _PLACE_RE.finditer(text):
+        slug = _ALIAS_PLACES[_SPACES_RE.sub(" ", match.group(1).lower())]
+        if slug not in slugs:
+            slugs.append(slug)
+    return slugs
+
+def place_name(slug: str) -> str:
+    return PLACES[slug][0]
+
+def place_key(slug: str) -> str:
+    return PLACE_KEY_PREFIX + slug
+
+# ✅ Places named in the chunk text or in its file name
+def chunk_places(text: str, metadata: Optional[Dict]) -> List[str]:
+    filename = os.path.splitext((metadata or {}).get("filename", ""))[0]
+    return match_places(f"{filename}\n{text}")
+
+def tag_places(documents: Iterable[Document]) -> None:
+    for doc in documents:
+        for key in [key for key in doc.metadata if key.startswith(PLACE_KEY_PREFIX)]:
+            del doc.metadata[key]
+        doc.metadata.update({place_key(slug): True for slug in chunk_places(doc.page_content, doc.metadata)})
+        doc.metadata["gazetteer_version"] = GAZETTEER_VERSION
+
+# ✅ Chroma where-clause restricting a search to chunks tagged with any of the places
+def place_where(slugs: List[str]) -> Optional[Dict]:
+    if not slugs:
+        return None
+    if len(slugs) == 1:
+        return {place_key(slugs[0]): True}
+    return {"$or": [{place_key(slug): True} for slug in slugs]}
+
+# ✅ In-memory place → chunk ids / files map, derived from the chunks' place_* metadata
+class PlaceIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._chunks: Dict[str, Set[str]] = {}
+        self._chunk_places: Dict[str, List[str]] = {}
+        self._chunk_files: Dict[str, str] = {}
+
+    def add(self, ids: Iterable[str], metadatas: Iterable[Optional[Dict]]) -> None:
+        with self._lock:
+            for chunk_id, metadata in zip(ids, metadatas):
+                self._remove_one(chunk_id)
+                slugs = [key[len(PLACE_KEY_PREFIX):] for key, value in (metadata or {}).items()
+                         if key.startswith(PLACE_KEY_PREFIX) and value]
+                self._chunk_places[chunk_id] = slugs
+                self._chunk_files[chunk_id] = (metadata or {}).get("filename", "unknown")
+                for slug in slugs:
+                    self._chunks.setdefault(slug, set()).add(chunk_id)
+
+    def remove(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            for chunk_id in ids:
+                self._remove_one(chunk_id)
+
+    def _remove_one(self, chunk_id: str) -> None:
+        for slug in self._chunk_places.pop(chunk_id, []):
+            chunk_ids = self._chunks.get(slug)
+            if chunk_ids is not None:
+                chunk_ids.discard(chunk_id)
+                if not chunk_ids:
+                    del self._chunks[slug]
+        self._chunk_files.pop(chunk_id, None)
+
+    def known_places(self, slugs: Iterable[str]) -> List[str]:
+        with self._lock:
+            return [slug for slug in slugs if self._chunks.get(slug)]
+
+    def chunk_ids(self, slugs: Iterable[str]) -> Set[str]:
+        with self._lock:
+            return set().union(*(self._chunks.get(slug, set()) for slug in slugs))
+
+    def files(self, slug: str) -> List[str]:
+        with self._lock:
+            return sorted({self._chunk_files[chunk_id] for chunk_id in self._chunks.get(slug, ())})
+
+    def summary(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {
+                slug: {
+                    "chunks": len(chunk_ids),
+                    "files": sorted({self._chunk_files[chunk_id] for chunk_id in chunk_ids})
+                }
+                for slug, chunk_ids in sorted(self._chunks.items())
+            }
+
+    def __len__(self) -> int:
+        return len(self._chunk_places)
+
+_index: Optional[PlaceIndex] = None
+_index_lock = threading.Lock()
+
+# ✅ Tag chunks stored before the gazetteer existed (or under an older version) in place. This writes
+# to Chroma, so only the writer runs it, under corpus_write_lock (see bootstrap); loading the index only reads
+def backfill_place_tags(batch_size: int = 500) -> int:
+    collection = get_vectorstore()._collection
+    data = collection.get(include=["metadatas"])
+    stale = [chunk_id for chunk_id, meta in zip(data["ids"], data["metadatas"])
+             if (meta or {}).get("gazetteer_version") != GAZETTEER_VERSION]
+    for start in range(0, len(stale), batch_size):
+        batch = collection.get(ids=stale[start:start + batch_size], include=["documents", "metadatas"])
+        metadatas = []
+        for text, meta in zip(batch["documents"], batch["metadatas"]):
+            places = set(chunk_places(text, meta))
+            update = {key: None for key in (meta or {}) if key.startswith(PLACE_KEY_PREFIX) and key[len(PLACE_KEY_PREFIX):] not in places}
+            update.update({place_key(slug): True for slug in places})
+            update["gazetteer_version"] = GAZETTEER_VERSION
+            metadatas.append(update)
+        collection.update(ids=batch["ids"], metadatas=metadatas)
+        if _index is not None:
+            _index.add(batch["ids"], [{**(meta or {}), **update} for meta, update in zip(batch["metadatas"], metadatas)])
+    if stale:
+        logging.info(f"🗺️ Tagged {len(stale)} existing chunks with place metadata")
+    return len(stale)
+
+def _load() -> PlaceIndex:
+    data = get_vectorstore()._collection.get(include=["metadatas"])
+    index = PlaceIndex()
+    index.add(data["ids"], data["metadatas"])
+    logging.info(f"🗺️ Place index covers {len(index.summary())} places over {len(index)} chunks")
+    return index
+
+def get_place_index() -> PlaceIndex:
+    global _index
+    if _index is not None:
+        return _index
+    with _index_lock:
+        if _index is None:
+            _index = _load()
+    return _index
+
+# Only reads: called by sync_corpus in processes that don't hold the write lock
+def reload_place_index() -> None:
+    global _index
+    if _index is None:
+        return
+    index = _load()
+    with _index_lock:
+        _index = index
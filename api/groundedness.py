@@ -0,0 +1,108 @@
+from langchain_core.documents import Document
+from api.bm25_index import tokenize
+from api.context_packing import passage_chunk_ids
+from api.vector_store import get_embedding_model, get_vectorstore
+from api.metrics import EMBEDDING_SECONDS, GROUNDEDNESS_DECISIONS_TOTAL, GROUNDEDNESS_SECONDS, timed
+from typing import Dict, List, Tuple
+import numpy as np
+import logging
+import os
+import re
+import threading
+
+# Scores at or above ACCEPT skip the LLM critic; scores below REJECT return the strict fallback
+# without asking it. Only answers in between are sent to the critic.
+ACCEPT_THRESHOLD = float(os.getenv("OKOO_GROUNDED_ACCEPT", "0.6"))
+REJECT_THRESHOLD = float(os.getenv("OKOO_GROUNDED_REJECT", "0.2"))
+LEXICAL_WEIGHT = float(os.getenv("OKOO_GROUNDED_LEXICAL_WEIGHT", "0.4"))
+MAX_SENTENCES = 12
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+_REFUSALS = ("i do not know", "i don't know")
+_STOPWORDS = frozenset("""
+a an and are as at be been but by can do does for from has have he her his i if in into is it its
+me my no not of on or our she so than that the their them then there these they this to was we were
+what when where which who will with you your also more most very just about over such
+""".split())
+
+def _content_tokens(text: str) -> List[str]:
+    return [token for token in tokenize(text) if len(token) > 2 and token not in _STOPWORDS]
+
+# ✅ Share of the answer's content words that occur somewhere in the retrieved chunks
+def lexical_support(answer: str, docs: List[Document]) -> float:
+    answer_tokens = _content_tokens(answer)
+    if not answer_tokens:
+        return 0.0
+    context_tokens = {token for doc in docs for token in tokenize(doc.page_content)}
+    return sum(1 for token in answer_tokens if token in context_tokens) / len(answer_tokens)
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+# ✅ Chunk vectors are read back from Chroma by id; a merged passage contributes one vector per stored
+# chunk it was built from. Only passages with none of their chunks stored are embedded
+def _chunk_vectors(docs: List[Document]) -> np.ndarray:
+    ids = list(dict.fromkeys(chunk_id for doc in docs for chunk_id in passage_chunk_ids(doc)))
+    stored: Dict[str, List[float]] = {}
+    if ids:
+        data = get_vectorstore()._collection.get(ids=ids, include=["embeddings"])
+        stored = dict(zip(data["ids"], data["embeddings"]))
+    vectors = [stored[chunk_id] for chunk_id in ids if chunk_id in stored]
+    missing = [doc.page_content for doc in docs if not any(chunk_id in stored for chunk_id in passage_chunk_ids(doc))]
+    if missing:
+        with timed(EMBEDDING_SECONDS, "embedding.groundedness_chunks", purpose="groundedness"):
+            vectors.extend(get_embedding_model().embed_documents(missing))
+    return _normalize(np.asarray(vectors, dtype=np.float32))
+
+# ✅ Mean over answer sentences of the best cosine similarity to any retrieved chunk
+def semantic_support(answer: str, docs: List[Document]) -> float:
+    sentences = [s for s in _SENTENCE_RE.split(answer) if len(_content_tokens(s)) >= 2][:MAX_SENTENCES]
+    if not sentences or not docs:
+        return 0.0
+    with timed(EMBEDDING_SECONDS, "embedding.groundedness", purpose="groundedness"):
+        sentence_vectors = _normalize(np.asarray(get_embedding_model().embed_documents(sentences), dtype=np.float32))
+    similarities = sentence_vectors @ _chunk_vectors(docs).T
+    return float(np.clip(similarities.max(axis=1), 0.0, 1.0).mean())
+
+class GroundednessStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.decisions = {"accept": 0, "reject": 0, "critic": 0}
+
+    def record(self, decision: str) -> None:
+        with self._lock:
+            self.decisions[decision] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            decisions = dict(self.decisions)
+        total = sum(decisions.values())
+        return {
+            **decisions,
+            "accept_threshold": ACCEPT_THRESHOLD,
+            "reject_threshold": REJECT_THRESHOLD,
+            "critic_skip_rate": (decisions["accept"] + decisions["reject"]) / total if total else 0.0
+        }
+
+groundedness_stats = GroundednessStats()
+
+# ✅ Returns ("accept" | "reject" | "critic", score)
+def check_groundedness(model: str, answer: str, docs: List[Document]) -> Tuple[str, float]:
+    with timed(GROUNDEDNESS_SECONDS, "groundedness", model=model):
+        if not docs or answer.strip().lower().startswith(_REFUSALS):
+            # Nothing to check: the strict fallback is already grounded by definition
+            decision, score = "accept", 1.0
+        else:
+            score = LEXICAL_WEIGHT * lexical_support(answer, docs) + (1 - LEXICAL_WEIGHT) * semantic_support(answer, docs)
+            if score >= ACCEPT_THRESHOLD:
+                decision = "accept"
+            elif score < REJECT_THRESHOLD:
+                decision = "reject"
+            else:
+                decision = "critic"
+    groundedness_stats.record(decision)
+    GROUNDEDNESS_DECISIONS_TOTAL.inc(decision=decision, model=model)
+    logging.info(f"🔎 Groundedness {score:.2f} → {decision}")
+    return decision, score
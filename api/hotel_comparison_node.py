@@ -1,8 +1,10 @@
-from langchain_community.llms import Ollama
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.documents import Document
-from api.adaptive_retriever import get_adaptive_retriever
+from api.adaptive_retriever import prefetched_or_retrieve
+from api.context_packing import measure_prompt, pack_context
+from api.model_registry import DEFAULT_MODEL, get_chain
+from api.streaming import stream_answer
 from typing import List, Dict
 import logging
 
@@ -13,21 +15,23 @@ hotel_prompt = ChatPromptTemplate.from_messages([
     ("human", "{input}")
 ])
 
+def get_hotel_chain(model: str = DEFAULT_MODEL):
+    return get_chain(model, "hotel_comparison", lambda llm: create_stuff_documents_chain(llm=llm, prompt=hotel_prompt))
+
 # ✅ Node: Compare hotels with strict fallback
 def compare_hotels(state: Dict) -> Dict:
     query = state["input"]
-    retriever = get_adaptive_retriever(query)
-    docs: List[Document] = retriever.invoke(query)
+    docs: List[Document] = prefetched_or_retrieve(state)
 
     if not docs:
         logging.info("❌ No hotel documents found. Returning fallback.")
         return {**state, "answer": "I do not know", "source_documents": []}
 
-    llm = Ollama(model=state.get("model", "qwen:0.5b"))
-    chain = create_stuff_documents_chain(llm=llm, prompt=hotel_prompt)
-    result = chain.invoke({"input": query, "context": docs})
-
-    answer = result["answer"] if isinstance(result, dict) and "answer" in result else str(result)
+    model = state.get("model", DEFAULT_MODEL)
+    docs = pack_context(docs, model).documents
+    inputs = {"input": query, "context": docs}
+    prompt_tokens = measure_prompt(hotel_prompt, inputs, "hotel_comparison", model)
+    answer = stream_answer(get_hotel_chain(model), inputs, name="hotel_comparison", model=model)
     logging.info(f"🏨 Hotel comparison answer: {answer}")
 
-    return {**state, "answer": answer, "source_documents": docs}
\ No newline at end of file
+    return {**state, "answer": answer, "source_documents": docs, "prompt_tokens": prompt_tokens}
\ No newline at end of file
@@ -0,0 +1,176 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from filelock import FileLock
+from langchain_core.documents import Document
+from api.chroma_utils import EMBED_BATCH_SIZE, load_and_split_document
+from api.corpus_sync import corpus_write_lock, deferred_publish
+from api.dedup import SourceChunks, data_source, file_sha256, find_duplicate_document, link_duplicate_document, release_sources, store_sources
+from api.vector_store import CHROMA_DIR, get_vectorstore
+from typing import Callable, Dict, List, Optional, Tuple
+import multiprocessing
+import json
+import logging
+import os
+
+MANIFEST_PATH = os.path.join(CHROMA_DIR, "ingest_manifest.json")
+SUPPORTED_EXTENSIONS = ('.pdf', '.docx', '.html', '.csv')
+INGEST_PROCESSES = int(os.getenv("OKOO_INGEST_PROCESSES", str(max(1, (os.cpu_count() or 2) - 1))))
+# Version 2: chunks are content-addressed and linked per source; older entries are re-indexed once
+MANIFEST_VERSION = 2
+# ✅ One process ingests data/ at a time (it owns the manifest). It holds corpus_write_lock only while
+# writing, so uploads and deletes in other processes go through while files are parsed
+INGEST_LOCK_PATH = os.path.join(CHROMA_DIR, "ingest.lock")
+_ingest_locks: Dict[int, FileLock] = {}
+
+def load_manifest() -> Dict[str, Dict]:
+    if not os.path.exists(MANIFEST_PATH):
+        return {}
+    try:
+        with open(MANIFEST_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        logging.warning(f"⚠️ Could not read ingest manifest, starting fresh: {e}")
+        return {}
+
+def save_manifest(manifest: Dict[str, Dict]) -> None:
+    os.makedirs(os.path.dirname(MANIFEST_PATH), exist_ok=True)
+    tmp_path = f"{MANIFEST_PATH}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+# ✅ Runs in a worker process: parse and split one file
+def _parse_file(file_path: str) -> List[Document]:
+    return load_and_split_document(file_path)
+
+# ✅ Chunks of a data/ file that were indexed before the manifest existed (uploads carry a file_id)
+def _unmanaged_chunk_ids(filename: str) -> List[str]:
+    data = get_vectorstore().get(where={"filename": filename}, include=["metadatas"])
+    return [chunk_id for chunk_id, meta in zip(data["ids"], data["metadatas"]) if "file_id" not in (meta or {})]
+
+class _BulkWriter:
+    def __init__(self, manifest: Dict[str, Dict]):
+        self.manifest = manifest
+        self.pending: List[SourceChunks] = []
+        self.pending_chunks = 0
+
+    def add(self, filename: str, sha256: str, splits: List[Document]) -> None:
+        # ✅ Record the file as in-flight before writing so a crash leaves a resumable entry
+        self.manifest[filename] = {"sha256": sha256, "status": "indexing", "version": MANIFEST_VERSION}
+        self.pending.append(SourceChunks(data_source(filename), filename, None, sha256, splits))
+        self.pending_chunks += len(splits)
+        if self.pending_chunks >= EMBED_BATCH_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.pending:
+            return
+        with corpus_write_lock():
+            save_manifest(self.manifest)
+            result = store_sources(self.pending)
+            for entry in self.pending:
+                self.manifest[entry.filename]["status"] = "done"
+            save_manifest(self.manifest)
+        logging.info(
+            f"✅ Wrote {len(self.pending)} files to Chroma: {result['chunks']} chunks, "
+            f"{result['embedded']} embedded, {result['reused']} already stored"
+        )
+        self.pending, self.pending_chunks = [], 0
+
+# ✅ Index new or changed files in data_dir; unchanged files are skipped using content hashes
+# progress(counts) is called as files are skipped, parsed and stored.
+def ingest_directory(data_dir: str, progress: Optional[Callable[[Dict[str, int]], None]] = None) -> Dict[str, int]:
+    os.makedirs(CHROMA_DIR, exist_ok=True)
+    with _ingest_locks.setdefault(os.getpid(), FileLock(INGEST_LOCK_PATH)), deferred_publish():
+        return _ingest_directory(data_dir, progress)
+
+def _ingest_directory(data_dir: str, progress: Optional[Callable[[Dict[str, int]], None]]) -> Dict[str, int]:
+    manifest = load_manifest()
+    summary = {"indexed": 0, "skipped": 0, "removed": 0, "failed": 0}
+
+    files = {
+        filename: os.path.join(data_dir, filename)
+        for filename in sorted(os.listdir(data_dir))
+        if os.path.isfile(os.path.join(data_dir, filename)) and filename.lower().endswith(SUPPORTED_EXTENSIONS)
+    }
+    hashes = {filename: file_sha256(file_path) for filename, file_path in files.items()}
+
+    def report():
+        if progress:
+            done = summary["indexed"] + summary["skipped"] + summary["failed"]
+            progress({"files_total": len(files), "files_processed": done, **summary})
+
+    pending = []
+    with corpus_write_lock():
+        # Legacy entries list their chunk ids; newer ones are released through their chunk links
+        stale_sources, stale_ids = [], set()
+        for filename in [name for name in manifest if name not in files]:
+            logging.info(f"🗑️ {filename} is gone from /data, removing its chunks")
+            stale_ids.update(manifest.pop(filename).get("ids", []))
+            stale_sources.append(data_source(filename))
+            summary["removed"] += 1
+
+        for filename, file_path in files.items():
+            sha256 = hashes[filename]
+            entry = manifest.get(filename)
+            if (entry and entry.get("sha256") == sha256 and entry.get("status") == "done"
+                    and entry.get("version") == MANIFEST_VERSION):
+                summary["skipped"] += 1
+                continue
+            # ✅ Changed, new, interrupted or from an older layout: release what was stored for it first
+            stale_ids.update(entry.get("ids", []) if entry else [])
+            stale_ids.update(_unmanaged_chunk_ids(filename))
+            stale_sources.append(data_source(filename))
+            manifest.pop(filename, None)
+            pending.append((filename, file_path, sha256))
+        release_sources(stale_sources, stale_ids)
+        save_manifest(manifest)
+    report()
+
+    if not pending:
+        logging.info(f"🧠 All {summary['skipped']} files in /data are already indexed.")
+        return summary
+
+    # ✅ Byte-identical files link to an already stored copy instead of being parsed
+    to_parse, duplicates, first_by_sha = [], [], {}
+    for filename, file_path, sha256 in pending:
+        if find_duplicate_document(sha256) or sha256 in first_by_sha:
+            duplicates.append((filename, sha256, first_by_sha.get(sha256)))
+        else:
+            first_by_sha[sha256] = filename
+            to_parse.append((filename, file_path, sha256))
+
+    writer = _BulkWriter(manifest)
+    if to_parse:
+        logging.info(f"📦 Indexing {len(to_parse)} new or changed files with {INGEST_PROCESSES} processes")
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(INGEST_PROCESSES, len(to_parse)), mp_context=context) as pool:
+            futures = {pool.submit(_parse_file, file_path): (filename, sha256) for filename, file_path, sha256 in to_parse}
+            for future in as_completed(futures):
+                filename, sha256 = futures[future]
+                try:
+                    splits = future.result()
+                except Exception as e:
+                    logging.warning(f"❌ Failed to parse {filename}: {e}")
+                    summary["failed"] += 1
+                    report()
+                    continue
+                logging.info(f"📄 Parsed {filename} into {len(splits)} chunks")
+                writer.add(filename, sha256, splits)
+                summary["indexed"] += 1
+                report()
+    writer.flush()
+
+    with corpus_write_lock():
+        for filename, sha256, first_in_run in duplicates:
+            # Looked up again: the stored copy may have been deleted while files were parsed
+            canonical = find_duplicate_document(sha256)
+            if canonical is None and manifest.get(first_in_run, {}).get("status") != "done":
+                # The copy it duplicates failed to parse or is gone; retried on the next start
+                summary["failed"] += 1
+                continue
+            link_duplicate_document(data_source(filename), filename, None, sha256, canonical or data_source(first_in_run))
+            manifest[filename] = {"sha256": sha256, "status": "done", "version": MANIFEST_VERSION}
+            summary["indexed"] += 1
+        save_manifest(manifest)
+    report()
+    return summary
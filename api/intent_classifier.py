@@ -1,30 +1,68 @@
 # ✅ Keyword-based intent classification (no LLM required)
+from typing import Dict, List, Tuple
+import re
 
-# Intent keyword map
+# Intent keyword map (order breaks ties between equally scored intents). Keywords match whole
+# words only, so plurals are listed where they are meant to count ("plans" but not "planes")
 INTENT_MAP = {
     "ask_fact": [
-        "who", "what", "when", "where", "how", "fact", "information",
-        "tell me", "question", "history", "details", "background"
+        "who", "what", "when", "where", "how", "fact", "facts", "information",
+        "tell me", "question", "questions", "history", "details", "background"
     ],
     "plan_trip": [
-        "plan", "trip", "itinerary", "travel", "schedule", "days",
-        "visit", "route", "journey", "vacation", "holiday"
+        "plan", "plans", "trip", "trips", "itinerary", "itineraries", "travel", "schedule", "schedules", "days",
+        "visit", "visits", "route", "routes", "journey", "journeys", "vacation", "vacations", "holiday", "holidays"
     ],
     "compare_hotels": [
-        "compare", "hotel", "hotels", "accommodation", "stay",
-        "price", "rating", "location", "amenities"
+        "compare", "hotel", "hotels", "accommodation", "accommodations", "stay",
+        "price", "prices", "rating", "ratings", "location", "locations", "amenities"
     ],
     "explore_place": [
-        "explore", "location", "place", "overview", "learn about",
+        "explore", "location", "locations", "place", "places", "overview", "learn about",
         "discover", "attractions", "things to do", "sights"
     ]
 }
 
-def classify_intent(query: str, model: str = "qwen:0.5b") -> str:
-    query_lower = query.lower()
+# Question words show up in queries of every intent, so they count for less
+KEYWORD_WEIGHTS = {"who": 0.5, "what": 0.5, "when": 0.5, "where": 0.5, "how": 0.5}
+# Pseudo-score for "none of the intents": one full keyword gives 0.5 confidence, two give 0.67
+EVIDENCE_PRIOR = 1.0
+
+def _compile_matcher(intent_map: Dict[str, List[str]]):
+    keyword_intents: Dict[str, List[str]] = {}
+    for intent, keywords in intent_map.items():
+        for keyword in keywords:
+            keyword_intents.setdefault(keyword, []).append(intent)
+    # Longest keywords first so "things to do" wins over any keyword it starts with
+    alternation = "|".join(
+        re.escape(keyword).replace(r"\ ", r"\s+")
+        for keyword in sorted(keyword_intents, key=len, reverse=True)
+    )
+    return re.compile(rf"\b({alternation})\b", re.IGNORECASE), keyword_intents
+
+# ✅ One precompiled word-boundary regex: each query is scanned once for all intents
+_KEYWORD_RE, _KEYWORD_INTENTS = _compile_matcher(INTENT_MAP)
+_INTENT_ORDER = {intent: position for position, intent in enumerate(INTENT_MAP)}
 
-    for intent, keywords in INTENT_MAP.items():
-        if any(keyword in query_lower for keyword in keywords):
-            return intent
+def score_intents(query: str) -> Dict[str, float]:
+    scores: Dict[str, float] = {}
+    for match in _KEYWORD_RE.finditer(query):
+        keyword = " ".join(match.group(1).lower().split())
+        weight = KEYWORD_WEIGHTS.get(keyword, 1.0)
+        for intent in _KEYWORD_INTENTS[keyword]:
+            scores[intent] = scores.get(intent, 0.0) + weight
+    return scores
+
+def classify_intent_with_confidence(query: str) -> Tuple[str, float]:
+    scores = score_intents(query)
+    if not scores:
+        return "unsupported", 0.0
+    intent = min(scores, key=lambda name: (-scores[name], _INTENT_ORDER[name]))
+    # The winning share of the evidence, damped when there is little of it
+    return intent, scores[intent] / (sum(scores.values()) + EVIDENCE_PRIOR)
+
+def classify_intent(query: str, model: str = "qwen:0.5b") -> str:
+    return classify_intent_with_confidence(query)[0]
 
-    return "unsupported"
\ No newline at end of file
+def classify_batch(queries: List[str]) -> List[Tuple[str, float]]:
+    return [classify_intent_with_confidence(query) for query in queries]
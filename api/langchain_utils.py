@@ -1,9 +1,9 @@
-from langchain_community.llms import Ollama
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain.chains import create_history_aware_retriever, create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from api.adaptive_retriever import get_adaptive_retriever
 from api.self_reflective_rag import wrap_with_reflection
+from api.model_registry import DEFAULT_MODEL, get_llm, get_chain
 import logging
 
 # Prompt to reformulate user query based on chat history
@@ -22,8 +22,11 @@ Use ONLY the provided context to answer the question. If the context is insuffic
     ("human", "{input}")
 ])
 
-def get_rag_chain(model: str = "qwen:0.5b"):
-    llm = Ollama(model=model)
+def get_rag_chain(model: str = DEFAULT_MODEL):
+    llm = get_llm(model)
+    question_answer_chain = get_chain(
+        model, "rag_qa", lambda llm: create_stuff_documents_chain(llm=llm, prompt=qa_prompt)
+    )
 
     def wrapped_chain(inputs):
         query = inputs["input"]
@@ -39,12 +42,6 @@ def get_rag_chain(model: str = "qwen:0.5b"):
             prompt=contextualize_q_prompt
         )
 
-        # ✅ Build the QA chain
-        question_answer_chain = create_stuff_documents_chain(
-            llm=llm,
-            prompt=qa_prompt
-        )
-
         # ✅ Combine retriever + QA chain
         rag_chain = create_retrieval_chain(
             retriever=history_aware_retriever,
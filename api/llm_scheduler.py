@@ -0,0 +1,156 @@
+from langchain_community.llms import Ollama
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.outputs import GenerationChunk, LLMResult
+from api.metrics import LLM_QUEUE_WAIT_SECONDS, LLM_REJECTIONS_TOTAL
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+import heapq
+import itertools
+import logging
+import math
+import os
+import threading
+import time
+
+LLM_CONCURRENCY = int(os.getenv("OKOO_LLM_CONCURRENCY", "2"))
+LLM_QUEUE_SIZE = int(os.getenv("OKOO_LLM_QUEUE_SIZE", "32"))
+INTERACTIVE_DEADLINE_SECONDS = float(os.getenv("OKOO_LLM_INTERACTIVE_DEADLINE", "30"))
+BATCH_DEADLINE_SECONDS = float(os.getenv("OKOO_LLM_BATCH_DEADLINE", "120"))
+
+# Lower value is served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+_PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BATCH: "batch"}
+
+class SchedulerRejected(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"LLM is busy ({reason}), retry in {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+class _Waiter:
+    __slots__ = ("event", "granted", "cancelled")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.granted = False
+        self.cancelled = False
+
+# ✅ Admission control in front of the model host: at most `concurrency` calls run at once,
+# callers wait in a bounded priority queue until their deadline, and a full queue rejects at once
+class LLMScheduler:
+    def __init__(self, concurrency: int = LLM_CONCURRENCY, queue_size: int = LLM_QUEUE_SIZE):
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._heap: List = []
+        self._sequence = itertools.count()
+        self.active = 0
+        self.queued = 0
+        self.completed = 0
+        self.rejected = {"queue_full": 0, "deadline": 0}
+        self._avg_hold = 1.0
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self._avg_hold * (self.queued + 1) / self.concurrency))
+
+    def _reject(self, reason: str, priority: int) -> SchedulerRejected:
+        self.rejected[reason] += 1
+        LLM_REJECTIONS_TOTAL.inc(reason=reason, priority=_PRIORITY_NAMES.get(priority, str(priority)))
+        logging.warning(f"🚦 LLM request rejected ({reason}): {self.active} running, {self.queued} queued")
+        return SchedulerRejected(reason, self.retry_after())
+
+    def acquire(self, priority: int, deadline: float) -> None:
+        started = time.monotonic()
+        with self._lock:
+            if self.active < self.concurrency and self.queued == 0:
+                self.active += 1
+                LLM_QUEUE_WAIT_SECONDS.observe(0.0, priority=_PRIORITY_NAMES.get(priority, str(priority)))
+                return
+            if self.queued >= self.queue_size:
+                raise self._reject("queue_full", priority)
+            waiter = _Waiter()
+            heapq.heappush(self._heap, (priority, next(self._sequence), waiter))
+            self.queued += 1
+
+        waiter.event.wait(max(0.0, deadline - time.monotonic()))
+        with self._lock:
+            if not waiter.granted:
+                waiter.cancelled = True
+                self.queued -= 1
+                raise self._reject("deadline", priority)
+        LLM_QUEUE_WAIT_SECONDS.observe(time.monotonic() - started, priority=_PRIORITY_NAMES.get(priority, str(priority)))
+
+    def release(self, held_seconds: float) -> None:
+        with self._lock:
+            self.completed += 1
+            self._avg_hold = 0.9 * self._avg_hold + 0.1 * held_seconds
+            # Hand the slot straight to the best live waiter so nobody can jump the queue
+            while self._heap:
+                _, _, waiter = heapq.heappop(self._heap)
+                if waiter.cancelled:
+                    continue
+                waiter.granted = True
+                self.queued -= 1
+                waiter.event.set()
+                return
+            self.active -= 1
+
+    @contextmanager
+    def slot(self, priority: int = PRIORITY_BATCH, deadline: Optional[float] = None) -> Iterator[None]:
+        if deadline is None:
+            deadline = time.monotonic() + BATCH_DEADLINE_SECONDS
+        self.acquire(priority, deadline)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "concurrency": self.concurrency,
+                "queue_size": self.queue_size,
+                "active": self.active,
+                "queued": self.queued,
+                "completed": self.completed,
+                "rejected": dict(self.rejected),
+                "avg_call_seconds": round(self._avg_hold, 3)
+            }
+
+llm_scheduler = LLMScheduler()
+
+# ✅ Runnable config carrying a request's priority and queue deadline down to every LLM call
+# (metadata is inherited by nested chains and by the LLM run manager)
+def llm_request_config(interactive: bool) -> Dict[str, Any]:
+    priority = PRIORITY_INTERACTIVE if interactive else PRIORITY_BATCH
+    budget = INTERACTIVE_DEADLINE_SECONDS if interactive else BATCH_DEADLINE_SECONDS
+    return {"metadata": {"llm_priority": priority, "llm_deadline": time.monotonic() + budget}}
+
+def _slot_for(run_manager: Optional[CallbackManagerForLLMRun]):
+    metadata = (run_manager.metadata if run_manager else None) or {}
+    return llm_scheduler.slot(metadata.get("llm_priority", PRIORITY_BATCH), metadata.get("llm_deadline"))
+
+# ✅ Ollama client whose calls go through the scheduler
+class ScheduledOllama(Ollama):
+    def _generate(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]] = None,
+        images: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> LLMResult:
+        with _slot_for(run_manager):
+            return super()._generate(prompts, stop=stop, images=images, run_manager=run_manager, **kwargs)
+
+    def _stream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[GenerationChunk]:
+        with _slot_for(run_manager):
+            yield from super()._stream(prompt, stop=stop, run_manager=run_manager, **kwargs)
@@ -0,0 +1,129 @@
+from logging.handlers import QueueHandler, QueueListener
+from api.db_utils import insert_application_logs_batch
+from typing import Dict, List, Optional, Tuple
+import logging
+import os
+import queue
+import threading
+import time
+
+LOG_QUEUE_SIZE = int(os.getenv("OKOO_LOG_QUEUE_SIZE", "10000"))
+LOG_BATCH_SIZE = int(os.getenv("OKOO_LOG_BATCH_SIZE", "200"))
+LOG_FLUSH_INTERVAL = float(os.getenv("OKOO_LOG_FLUSH_INTERVAL", "0.5"))
+
+# ✅ Background writer that batches chat-log rows into grouped SQLite transactions
+class ChatLogWriter:
+    def __init__(self, max_queue: int = LOG_QUEUE_SIZE, batch_size: int = LOG_BATCH_SIZE,
+                 flush_interval: float = LOG_FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Tuple[str, str, str, str]]" = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        # Request threads count drops while the writer thread counts writes
+        self._counts_lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="chat-log-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, session_id: str, user_query: str, gpt_response: str, model: str) -> bool:
+        self.start()
+        try:
+            self._queue.put_nowait((session_id, user_query, gpt_response, model))
+            return True
+        except queue.Full:
+            with self._counts_lock:
+                self.dropped += 1
+            return False
+
+    def _drain(self, first) -> List[Tuple[str, str, str, str]]:
+        rows = [first]
+        while len(rows) < self.batch_size:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _run(self) -> None:
+        while not (self._stop.is_set() and self._queue.empty()):
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            rows = self._drain(first)
+            try:
+                insert_application_logs_batch(rows)
+                with self._counts_lock:
+                    self.written += len(rows)
+                    self.batches += 1
+            except Exception as e:
+                with self._counts_lock:
+                    self.failed += len(rows)
+                logging.error(f"❌ Failed to write {len(rows)} chat logs: {e}")
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self) -> Dict:
+        with self._counts_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "written": self.written,
+                "dropped": self.dropped,
+                "batches": self.batches,
+                "failed": self.failed
+            }
+
+# ✅ QueueHandler that never blocks the request thread and counts what it had to drop
+class _DroppingQueueHandler(QueueHandler):
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self._dropped_lock = threading.Lock()
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+class FileLogPipeline:
+    def __init__(self, filename: str = "app.log", level: int = logging.INFO, max_queue: int = LOG_QUEUE_SIZE):
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self.handler = _DroppingQueueHandler(self._queue)
+        file_handler = logging.FileHandler(filename)
+        file_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+        self._listener = QueueListener(self._queue, file_handler, respect_handler_level=True)
+        self._started = False
+        root = logging.getLogger()
+        root.setLevel(level)
+        root.addHandler(self.handler)
+
+    def start(self) -> None:
+        if not self._started:
+            self._listener.start()
+            self._started = True
+
+    def stop(self) -> None:
+        if self._started:
+            self._listener.stop()
+            self._started = False
+
+    def stats(self) -> Dict:
+        return {"queue_depth": self._queue.qsize(), "dropped": self.handler.dropped}
+
+chat_log_writer = ChatLogWriter()
@@ -1,114 +1,307 @@
 from fastapi import FastAPI, File, UploadFile, HTTPException, Form
-from api.pydantic_models import QueryInput, DocumentInfo, DeleteFileRequest
-from api.tourism_graph import get_tourism_graph
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
+from contextlib import asynccontextmanager
+from api.pydantic_models import QueryInput, DocumentInfo, DeleteFileRequest, TraceBatchInput, UploadJobStatus
+from api.tourism_graph import get_tourism_graph, get_compiled_graph
+from api.streaming import format_sse
+from api.model_registry import DEFAULT_MODEL, invalidate, warm_up
+from api.intent_classifier import classify_intent, classify_intent_with_confidence, classify_batch
+from api.answer_cache import answer_cache
+from api.groundedness import groundedness_stats
+from api.llm_scheduler import SchedulerRejected, llm_request_config, llm_scheduler
+from api.log_writer import FileLogPipeline, chat_log_writer
+from api.metrics import registry as metrics_registry, REQUEST_SECONDS, REQUESTS_TOTAL, collect_timings, summarize_timings
 from api.db_utils import (
-    insert_application_logs,
-    get_chat_history,
     get_all_documents,
     insert_document_record,
     delete_document_record,
     get_filename_by_id
 )
-from api.chroma_utils import index_document_to_chroma, delete_doc_from_chroma, vectorstore
+from api.dedup import delete_doc_from_chroma, dedup_report
+from api.upload_jobs import UploadQueueFull, upload_jobs
+from api.session_memory import session_memory
+from api.vector_store import get_embedding_model, get_vectorstore
+from api.bm25_index import get_bm25_index
+from api.gazetteer import get_place_index
+from api.place_cards import place_cards
 from api.bootstrap import preload_documents
-import os, uuid, shutil, logging
+from api.readiness import NotReady, readiness
+from api.corpus_sync import CorpusBusy, sync_corpus
+import os, uuid, shutil, logging, time, tempfile
 
-logging.basicConfig(filename='app.log', level=logging.INFO)
-app = FastAPI(title="OkooAI API", description="Tourism RAG assistant", version="1.0.0")
+# ✅ File logging goes through a queue; a listener thread does the disk writes
+file_log_pipeline = FileLogPipeline(filename='app.log', level=logging.INFO)
 
-# ✅ Chat endpoint
-@app.post("/chat")
-def chat(query_input: QueryInput):
-    session_id = query_input.session_id or str(uuid.uuid4())
-    model_name = query_input.model or "qwen:0.5b"
-    logging.info(f"Session ID: {session_id}, User Query: {query_input.question}, Model: {model_name}")
+# ✅ Bind the port at once; the embedding model, vector store, BM25 and place indexes, graph and
+# /data ingestion are loaded on a background thread that reports progress on /ready
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # ✅ Background threads start here rather than at import, so each worker forked from a
+    # preloaded gunicorn master (gunicorn.conf.py) runs its own
+    file_log_pipeline.start()
+    chat_log_writer.start()
+    upload_jobs.start()
+    readiness.start([
+        ("embedding_model", get_embedding_model),
+        ("vector_store", get_vectorstore),
+        ("bm25_index", get_bm25_index),
+        ("place_index", get_place_index),
+        ("llm_chains", lambda: warm_up([DEFAULT_MODEL])),
+        ("documents", lambda: preload_documents(progress=readiness.update_documents))
+    ])
+    yield
+    # ✅ Flush queued chat logs and log records before the process exits
+    upload_jobs.stop()
+    session_memory.stop()
+    chat_log_writer.stop()
+    file_log_pipeline.stop()
 
-    chat_history = get_chat_history(session_id)
-    rag_chain = get_tourism_graph(model=model_name)
+app = FastAPI(title="OkooAI API", description="Tourism RAG assistant", version="1.0.0", lifespan=lifespan)
 
-    result = rag_chain({
-        "input": query_input.question,
-        "chat_history": chat_history,
-        "model": model_name
-    })
+# ✅ LLM scheduler backpressure: tell clients when to come back instead of queueing forever
+@app.exception_handler(SchedulerRejected)
+def scheduler_rejected_handler(request, exc: SchedulerRejected):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "reason": exc.reason},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
 
-    answer = result["answer"]
-    source_docs = result.get("source_documents", [])
+# ✅ Queries that arrive while the models and indexes are still loading are turned away, not queued
+@app.exception_handler(NotReady)
+def not_ready_handler(request, exc: NotReady):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "stage": exc.stage},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+# ✅ A delete arriving while another process holds the corpus write lock (e.g. ingesting /data)
+@app.exception_handler(CorpusBusy)
+def corpus_busy_handler(request, exc: CorpusBusy):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": str(exc.retry_after)})
+
+# ✅ Component counters exposed on /metrics
+metrics_registry.counter_callback("okoo_answer_cache_hits_total", "Answer cache hits.", lambda: answer_cache.hits)
+metrics_registry.counter_callback("okoo_answer_cache_misses_total", "Answer cache misses.", lambda: answer_cache.misses)
+metrics_registry.gauge_callback("okoo_ready", "1 once warm-up and /data indexing have finished.", lambda: readiness.ready)
+metrics_registry.gauge_callback("okoo_answer_cache_entries", "Answers currently cached.", lambda: answer_cache.stats()["entries"])
+metrics_registry.gauge_callback("okoo_groundedness_critic_skip_rate", "Share of answers decided without the LLM critic.", lambda: groundedness_stats.stats()["critic_skip_rate"])
+metrics_registry.gauge_callback("okoo_llm_active_calls", "LLM calls holding a scheduler slot.", lambda: llm_scheduler.active)
+metrics_registry.gauge_callback("okoo_llm_queued_calls", "LLM calls waiting for a scheduler slot.", lambda: llm_scheduler.queued)
+metrics_registry.gauge_callback("okoo_chat_log_queue_depth", "Chat logs waiting to be written.", lambda: chat_log_writer.stats()["queue_depth"])
+metrics_registry.counter_callback("okoo_chat_log_dropped_total", "Chat logs dropped because the queue was full.", lambda: chat_log_writer.dropped)
+metrics_registry.counter_callback("okoo_file_log_dropped_total", "Log records dropped because the queue was full.", lambda: file_log_pipeline.handler.dropped)
 
+def observe_request(endpoint: str, intent, model_name: str, cached: bool, started: float) -> None:
+    labels = {"endpoint": endpoint, "intent": intent or "unknown", "model": model_name, "cached": str(cached).lower()}
+    REQUEST_SECONDS.observe(time.perf_counter() - started, **labels)
+    REQUESTS_TOTAL.inc(**labels)
+
+def format_source_chunks(source_docs) -> str:
     source_chunks = []
     for doc in source_docs:
         filename = doc.metadata.get("filename", "unknown")
         chunk_preview = doc.page_content.strip().replace("\n", " ")[:200]
         source_chunks.append(f"[{filename}] {chunk_preview}")
+    return "\n\n".join(source_chunks)
+
+# ✅ Semantic answer cache, consulted before the graph runs. ask_fact answers depend on chat
+# history, so they are only cached for the first turn of a session.
+def lookup_cached_answer(question: str, chat_history: list, model_name: str):
+    intent = classify_intent(question, model_name)
+    if intent == "unsupported" or (intent == "ask_fact" and chat_history):
+        return None, None
+    probe = {"intent": intent, "corpus_version": answer_cache.corpus_version, "vector": answer_cache.embed(question)}
+    return answer_cache.lookup(probe["vector"], model_name, intent), probe
 
-    source_text = "\n\n".join(source_chunks)
+def store_cached_answer(probe, model_name: str, answer: str, source_text: str) -> None:
+    if probe is not None:
+        answer_cache.store(probe["vector"], model_name, probe["intent"], answer, source_text, probe["corpus_version"])
 
-    insert_application_logs(session_id, query_input.question, answer, model_name)
+def run_tourism_graph(question: str, chat_history: list, model_name: str, endpoint: str, interactive: bool = False) -> dict:
+    readiness.require_serving()
+    sync_corpus()
+    started = time.perf_counter()
+    cached, probe = lookup_cached_answer(question, chat_history, model_name)
+    if cached:
+        observe_request(endpoint, probe["intent"], model_name, True, started)
+        return {"answer": cached["answer"], "source": cached["source"], "intent": probe["intent"], "cached": True, "prompt_tokens": 0}
+
+    rag_chain = get_tourism_graph(model=model_name)
+    result = rag_chain({
+        "input": question,
+        "chat_history": chat_history,
+        "model": model_name
+    }, config=llm_request_config(interactive))
+
+    answer = result["answer"]
+    source_text = format_source_chunks(result.get("source_documents") or [])
+    store_cached_answer(probe, model_name, answer, source_text)
+    observe_request(endpoint, result.get("intent"), model_name, False, started)
+    return {
+        "answer": answer,
+        "source": source_text,
+        "intent": result.get("intent"),
+        "cached": False,
+        "prompt_tokens": result.get("prompt_tokens") or 0
+    }
+
+# ✅ Chat endpoint
+@app.post("/chat")
+def chat(query_input: QueryInput):
+    session_id = query_input.session_id or str(uuid.uuid4())
+    model_name = query_input.model or DEFAULT_MODEL
+    logging.info(f"Session ID: {session_id}, User Query: {query_input.question}, Model: {model_name}")
+
+    with collect_timings() as timings:
+        chat_history = session_memory.get_history(session_id, model_name)
+        result = run_tourism_graph(query_input.question, chat_history, model_name, "/chat", interactive=True)
+    answer = result["answer"]
+    source_text = result["source"]
+
+    session_memory.add_turn(session_id, query_input.question, answer, model_name)
+    chat_log_writer.submit(session_id, query_input.question, answer, model_name)
     logging.info(f"Session ID: {session_id}, AI Response: {answer}")
     logging.info(f"Source Chunks:\n{source_text}")
 
-    return {
+    response = {
         "answer": answer,
         "session_id": session_id,
         "model": model_name,
-        "source": source_text
+        "source": source_text,
+        "cached": result["cached"],
+        "prompt_tokens": result["prompt_tokens"]
     }
+    if query_input.include_timings:
+        response["timings"] = summarize_timings(timings)
+    return response
+
+# ✅ Streaming chat endpoint (server-sent events): token*, sources, done
+@app.post("/chat/stream")
+def chat_stream(query_input: QueryInput):
+    readiness.require_serving()
+    sync_corpus()
+    session_id = query_input.session_id or str(uuid.uuid4())
+    model_name = query_input.model or DEFAULT_MODEL
+    logging.info(f"Session ID: {session_id}, User Query (stream): {query_input.question}, Model: {model_name}")
+
+    chat_history = session_memory.get_history(session_id, model_name)
+    graph = get_compiled_graph(model=model_name)
+
+    def event_stream():
+        started = time.perf_counter()
+        cached, probe = lookup_cached_answer(query_input.question, chat_history, model_name)
+        if cached:
+            observe_request("/chat/stream", probe["intent"], model_name, True, started)
+            session_memory.add_turn(session_id, query_input.question, cached["answer"], model_name)
+            chat_log_writer.submit(session_id, query_input.question, cached["answer"], model_name)
+            yield format_sse("token", {"text": cached["answer"]})
+            yield format_sse("sources", {"source": cached["source"]})
+            yield format_sse("done", {
+                "answer": cached["answer"],
+                "session_id": session_id,
+                "model": model_name,
+                "intent": probe["intent"],
+                "cached": True,
+                "prompt_tokens": 0
+            })
+            return
+
+        final_state = {}
+        try:
+            for mode, chunk in graph.stream({
+                "input": query_input.question,
+                "chat_history": chat_history,
+                "model": model_name
+            }, config=llm_request_config(True), stream_mode=["custom", "values"]):
+                if mode == "values":
+                    final_state = chunk
+                elif "token" in chunk:
+                    yield format_sse("token", {"text": chunk["token"]})
+                elif chunk.get("reset"):
+                    yield format_sse("reset", {})
+        except SchedulerRejected as e:
+            yield format_sse("error", {"detail": str(e), "retry_after": e.retry_after})
+            return
+        except Exception as e:
+            logging.error(f"❌ Streaming chat failed for session {session_id}: {e}")
+            yield format_sse("error", {"detail": str(e)})
+            return
+
+        answer = final_state.get("answer", "")
+        source_text = format_source_chunks(final_state.get("source_documents") or [])
+        store_cached_answer(probe, model_name, answer, source_text)
+        observe_request("/chat/stream", final_state.get("intent"), model_name, False, started)
+
+        session_memory.add_turn(session_id, query_input.question, answer, model_name)
+        chat_log_writer.submit(session_id, query_input.question, answer, model_name)
+        logging.info(f"Session ID: {session_id}, AI Response: {answer}")
+        logging.info(f"Source Chunks:\n{source_text}")
+
+        yield format_sse("sources", {"source": source_text})
+        yield format_sse("done", {
+            "answer": answer,
+            "session_id": session_id,
+            "model": model_name,
+            "intent": final_state.get("intent"),
+            "cached": False,
+            "prompt_tokens": final_state.get("prompt_tokens") or 0
+        })
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 # ✅ Explore Place endpoint
 @app.post("/explore-place")
 def explore_place_route(input: str = Form(...), session_id: str = Form(None)):
-    model_name = "qwen:0.5b"
-    rag_chain = get_tourism_graph(model=model_name)
-    result = rag_chain({"input": input, "chat_history": [], "model": model_name})
-
-    answer = result["answer"]
-    source_docs = result.get("source_documents", [])
-    source_chunks = [
-        f"[{doc.metadata.get('filename', 'unknown')}] {doc.page_content.strip().replace('\n', ' ')[:200]}"
-        for doc in source_docs
-    ]
+    result = run_tourism_graph(input, [], DEFAULT_MODEL, "/explore-place")
 
     return {
-        "answer": answer,
-        "source": "\n\n".join(source_chunks),
-        "intent": "explore_place"
+        "answer": result["answer"],
+        "source": result["source"],
+        "intent": "explore_place",
+        "prompt_tokens": result["prompt_tokens"]
     }
 
 # ✅ Plan Trip endpoint
 @app.post("/plan-trip")
 def plan_trip_route(input: str = Form(...), session_id: str = Form(None)):
-    model_name = "qwen:0.5b"
-    rag_chain = get_tourism_graph(model=model_name)
-    result = rag_chain({"input": input, "chat_history": [], "model": model_name})
-    return {"answer": result["answer"], "intent": "plan_trip"}
+    result = run_tourism_graph(input, [], DEFAULT_MODEL, "/plan-trip")
+    return {"answer": result["answer"], "intent": "plan_trip", "prompt_tokens": result["prompt_tokens"]}
 
 # ✅ Compare Hotels endpoint
 @app.post("/compare-hotels")
 def compare_hotels_route(input: str = Form(...), session_id: str = Form(None)):
-    model_name = "qwen:0.5b"
-    rag_chain = get_tourism_graph(model=model_name)
-    result = rag_chain({"input": input, "chat_history": [], "model": model_name})
-
-    answer = result["answer"]
-    source_docs = result.get("source_documents", [])
-    source_chunks = [
-        f"[{doc.metadata.get('filename', 'unknown')}] {doc.page_content.strip().replace('\n', ' ')[:200]}"
-        for doc in source_docs
-    ]
+    result = run_tourism_graph(input, [], DEFAULT_MODEL, "/compare-hotels")
 
     return {
-        "answer": answer,
-        "source": "\n\n".join(source_chunks),
-        "intent": "compare_hotels"
+        "answer": result["answer"],
+        "source": result["source"],
+        "intent": "compare_hotels",
+        "prompt_tokens": result["prompt_tokens"]
     }
 
 # ✅ Trace endpoint
 @app.post("/trace")
 def trace_route(input: str = Form(...)):
-    from api.intent_classifier import classify_intent
-    model_name = "qwen:0.5b"
-    intent = classify_intent(input, model=model_name)
-    return {"intent": intent}
+    intent, confidence = classify_intent_with_confidence(input)
+    return {"intent": intent, "confidence": confidence}
+
+# ✅ Batch trace endpoint for offline routing analysis
+@app.post("/trace-batch")
+def trace_batch_route(batch: TraceBatchInput):
+    results = classify_batch(batch.queries)
+    counts = {}
+    for intent, _ in results:
+        counts[intent] = counts.get(intent, 0) + 1
+    return {
+        "results": [{"intent": intent, "confidence": confidence} for intent, confidence in results],
+        "counts": counts
+    }
 
 # ✅ Upload document
 @app.post("/upload-doc")
@@ -119,23 +312,33 @@ def upload_and_index_document(file: UploadFile = File(...)):
     if file_extension not in allowed_extensions:
         raise HTTPException(status_code=400, detail=f"Unsupported file type. Allowed types are: {', '.join(allowed_extensions)}")
 
-    temp_file_path = f"temp_{file.filename}"
+    # ✅ Save to a private temp file; parsing and embedding happen on the upload job queue
+    fd, temp_file_path = tempfile.mkstemp(prefix="okoo_upload_", suffix=file_extension)
+    with os.fdopen(fd, "wb") as buffer:
+        shutil.copyfileobj(file.file, buffer)
 
+    file_id = insert_document_record(file.filename)
     try:
-        with open(temp_file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        job = upload_jobs.submit(temp_file_path, file.filename, file_id)
+    except UploadQueueFull as e:
+        delete_document_record(file_id)
+        os.remove(temp_file_path)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
 
-        file_id = insert_document_record(file.filename)
-        success = index_document_to_chroma(temp_file_path, file_id)
+    return {
+        "message": f"File {file.filename} has been uploaded and queued for indexing.",
+        "file_id": file_id,
+        "job_id": job["job_id"],
+        "status": job["status"]
+    }
 
-        if success:
-            return {"message": f"File {file.filename} has been successfully uploaded and indexed.", "file_id": file_id}
-        else:
-            delete_document_record(file_id)
-            raise HTTPException(status_code=500, detail=f"Failed to index {file.filename}.")
-    finally:
-        if os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
+# ✅ Upload job progress
+@app.get("/upload-status/{job_id}", response_model=UploadJobStatus)
+def upload_status(job_id: str):
+    job = upload_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown upload job {job_id}.")
+    return job
 
 # ✅ List documents
 @app.get("/list-docs", response_model=list[DocumentInfo])
@@ -149,6 +352,7 @@ def delete_document(request: DeleteFileRequest):
 
     if chroma_delete_success:
         db_delete_success = delete_document_record(request.file_id)
+        place_cards.schedule_refresh()
         if db_delete_success:
             return {"message": f"Successfully deleted document with file_id {request.file_id} from the system."}
         else:
@@ -156,19 +360,65 @@ def delete_document(request: DeleteFileRequest):
     else:
         return {"error": f"Failed to delete document with file_id {request.file_id} from Chroma."}
 
-# ✅ Ping
+# ✅ What content hashing deduplicated: identical documents, repeated and shared chunks
+@app.get("/dedup-report")
+def get_dedup_report():
+    return dedup_report()
+
+# ✅ Places the gazetteer found in the corpus, with the chunks and files covering each
+@app.get("/places")
+def get_places():
+    sync_corpus()
+    return get_place_index().summary()
+
+# ✅ Precomputed destination cards and whether each still matches its place's chunks
+@app.get("/place-cards")
+def get_place_cards():
+    return place_cards.summary()
+
+# ✅ Drop cached LLM clients, chains and graphs (e.g. after pulling a new model)
+@app.post("/invalidate-models")
+def invalidate_models(model: str = Form(None)):
+    removed = invalidate(model)
+    return {"message": f"Invalidated {removed} cached objects.", "model": model}
+
+# ✅ Runtime statistics
+@app.get("/stats")
+def stats():
+    return {
+        "answer_cache": answer_cache.stats(),
+        "groundedness": groundedness_stats.stats(),
+        "llm_scheduler": llm_scheduler.stats(),
+        "upload_jobs": upload_jobs.stats(),
+        "chat_log_writer": chat_log_writer.stats(),
+        "session_memory": session_memory.stats(),
+        "place_cards": place_cards.stats(),
+        "file_log": file_log_pipeline.stats()
+    }
+
+# ✅ Prometheus scrape endpoint
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+# ✅ Ping (liveness: the process is up, even while warming up; 503 once warm-up has failed for good)
 @app.get("/ping")
 def ping():
+    if not readiness.alive:
+        return JSONResponse(status_code=503, content={"status": "failed", "stages": readiness.report()["stages"]})
     return {"status": "ok"}
 
+# ✅ Readiness: 503 with warm-up progress until the models, indexes and /data are loaded
+@app.get("/ready")
+def ready():
+    report = readiness.report()
+    return JSONResponse(status_code=200 if report["ready"] else 503, content=report)
+
 # ✅ Debug chunks
 @app.get("/debug-chunks")
 def debug_chunks():
-    docs = vectorstore.get()
+    docs = get_vectorstore().get()
     return {
         "total_chunks": len(docs["documents"]),
-        "sample": [doc.page_content[:200] for doc in docs["documents"][:3]]
-    }
-
-# ✅ Preload documents on startup
-preload_documents()
\ No newline at end of file
+        "sample": [doc[:200] for doc in docs["documents"][:3]]
+    }
\ No newline at end of file
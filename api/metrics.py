@@ -0,0 +1,179 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import bisect
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 1536, 2048, 3072, 4096, 8192)
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in labels.values())
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(dict(zip(self.label_names, key)))} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            if position < len(self.buckets):
+                series[0][position] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (bucket_counts, total, count) in sorted(self._series.items()):
+                labels = dict(zip(self.label_names, key))
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, bucket_counts):
+                    cumulative += bucket_count
+                    lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': repr(bound)})} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+# ✅ Values owned by other components (cache, queues) are read when /metrics is scraped
+class CallbackMetric:
+    def __init__(self, name: str, help_text: str, metric_type: str, callback: Callable[[], float]):
+        self.name = name
+        self.help_text = help_text
+        self.metric_type = metric_type
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} {self.metric_type}",
+            f"{self.name} {float(self.callback())}"
+        ]
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, label_names))
+
+    def histogram(self, name: str, help_text: str, label_names: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, label_names, buckets))
+
+    def gauge_callback(self, name: str, help_text: str, callback: Callable[[], float]) -> None:
+        self._register(CallbackMetric(name, help_text, "gauge", callback))
+
+    def counter_callback(self, name: str, help_text: str, callback: Callable[[], float]) -> None:
+        self._register(CallbackMetric(name, help_text, "counter", callback))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+NODE_SECONDS = registry.histogram("okoo_graph_node_seconds", "Time spent in each LangGraph node.", ("node", "model"))
+RETRIEVAL_SECONDS = registry.histogram("okoo_retrieval_seconds", "Time spent in retrieval stages.", ("stage",))
+EMBEDDING_SECONDS = registry.histogram("okoo_embedding_seconds", "Time spent embedding text on the request path.", ("purpose",))
+LLM_SECONDS = registry.histogram("okoo_llm_seconds", "Wall time of LLM calls.", ("chain", "model"))
+LLM_FIRST_TOKEN_SECONDS = registry.histogram("okoo_llm_first_token_seconds", "Time to first streamed token.", ("chain", "model"))
+REQUEST_SECONDS = registry.histogram("okoo_request_seconds", "End-to-end request latency.", ("endpoint", "intent", "model", "cached"))
+REQUESTS_TOTAL = registry.counter("okoo_requests_total", "Requests served.", ("endpoint", "intent", "model", "cached"))
+REFLECTION_VERDICTS_TOTAL = registry.counter("okoo_reflection_verdicts_total", "Reflection verdicts.", ("verdict", "model"))
+RETRIES_TOTAL = registry.counter("okoo_generation_retries_total", "Answers regenerated after reflection.", ("model",))
+PLACE_FILTER_TOTAL = registry.counter("okoo_place_filter_total", "Place-filtered retrievals by outcome.", ("outcome",))
+PACKED_CONTEXT_TOKENS = registry.histogram("okoo_context_tokens", "Estimated tokens of packed context per generation.", ("model",), TOKEN_BUCKETS)
+PROMPT_TOKENS = registry.histogram("okoo_prompt_tokens", "Estimated prompt tokens sent to the model.", ("chain", "model"), TOKEN_BUCKETS)
+CONTEXT_PACKING_TOTAL = registry.counter("okoo_context_packing_total", "Retrieved chunks merged, deduplicated, truncated or dropped while packing.", ("outcome",))
+PLACE_CARD_REQUESTS_TOTAL = registry.counter(
+    "okoo_place_card_requests_total", "Exploration requests by place-card use (served, context, none).", ("outcome",)
+)
+LLM_QUEUE_WAIT_SECONDS = registry.histogram("okoo_llm_queue_wait_seconds", "Time LLM calls waited for a scheduler slot.", ("priority",))
+LLM_REJECTIONS_TOTAL = registry.counter("okoo_llm_rejections_total", "LLM calls rejected by the scheduler.", ("reason", "priority"))
+GROUNDEDNESS_SECONDS = registry.histogram("okoo_groundedness_seconds", "Time spent scoring answer groundedness.", ("model",))
+GROUNDEDNESS_DECISIONS_TOTAL = registry.counter(
+    "okoo_groundedness_decisions_total", "Groundedness decisions (accept / reject skip the LLM critic).", ("decision", "model")
+)
+
+# ✅ Optional per-request timing breakdown, collected by every timer that runs inside the request
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("okoo_request_timings", default=None)
+
+@contextmanager
+def collect_timings() -> Iterator[List[Tuple[str, float]]]:
+    timings: List[Tuple[str, float]] = []
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+def summarize_timings(timings: List[Tuple[str, float]]) -> Dict[str, float]:
+    summary: Dict[str, float] = {}
+    for name, seconds in timings:
+        summary[name] = round(summary.get(name, 0.0) + seconds, 6)
+    return summary
+
+def record_timing(name: str, seconds: float) -> None:
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+@contextmanager
+def timed(histogram: Histogram, breakdown_name: str, **labels) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        histogram.observe(elapsed, **labels)
+        record_timing(breakdown_name, elapsed)
+
+def timed_node(name: str, node: Callable[[Dict], Dict]) -> Callable[[Dict], Dict]:
+    def wrapper(state: Dict) -> Dict:
+        with timed(NODE_SECONDS, f"node.{name}", node=name, model=state.get("model", "")):
+            return node(state)
+    wrapper.__name__ = getattr(node, "__name__", name)
+    return wrapper
@@ -0,0 +1,60 @@
+from langchain_core.runnables import Runnable
+from api.llm_scheduler import ScheduledOllama
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+import logging
+import os
+import threading
+
+DEFAULT_MODEL = "qwen:0.5b"
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+
+# ✅ Process-wide cache of LLM clients, chains and compiled graphs keyed by (model, kind, name)
+_registry: Dict[Tuple[str, str, str], Any] = {}
+_lock = threading.RLock()
+
+def get_or_create(model: str, kind: str, name: str, factory: Callable[[], Any]) -> Any:
+    key = (model, kind, name)
+    obj = _registry.get(key)
+    if obj is not None:
+        return obj
+    with _lock:
+        obj = _registry.get(key)
+        if obj is None:
+            obj = factory()
+            _registry[key] = obj
+            logging.info(f"🧩 Registered {kind} '{name}' for model {model}")
+    return obj
+
+# ✅ Every Ollama call goes through the shared LLM scheduler
+def get_llm(model: str = DEFAULT_MODEL) -> ScheduledOllama:
+    return get_or_create(model, "llm", "ollama", lambda: ScheduledOllama(model=model, base_url=OLLAMA_BASE_URL))
+
+def get_chain(model: str, name: str, build: Callable[[ScheduledOllama], Runnable]) -> Runnable:
+    return get_or_create(model, "chain", name, lambda: build(get_llm(model)))
+
+def invalidate(model: Optional[str] = None) -> int:
+    with _lock:
+        keys = [key for key in _registry if model is None or key[0] == model]
+        for key in keys:
+            del _registry[key]
+    logging.info(f"♻️ Invalidated {len(keys)} cached objects for model {model or 'all models'}")
+    return len(keys)
+
+# ✅ Build LLM clients, node chains and the compiled graph ahead of the first request
+def warm_up(models: Iterable[str] = (DEFAULT_MODEL,)) -> None:
+    from api.tourism_graph import get_compiled_graph, get_qa_chain
+    from api.self_reflective_rag import get_reflection_chain
+    from api.planner_node import get_planner_chain
+    from api.hotel_comparison_node import get_hotel_chain
+    from api.explore_place_node import get_explore_chain
+    from api.session_memory import get_summary_chain
+    from api.place_cards import get_card_chain
+
+    for model in models:
+        for chain_getter in (
+            get_qa_chain, get_reflection_chain, get_planner_chain, get_hotel_chain, get_explore_chain, get_summary_chain,
+            get_card_chain
+        ):
+            chain_getter(model)
+        get_compiled_graph(model)
+        logging.info(f"🔥 Warmed up graph and chains for model {model}")
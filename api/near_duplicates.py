@@ -0,0 +1,80 @@
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+import numpy as np
+import os
+import re
+import zlib
+
+# ✅ Chunks whose word 5-gram shingles overlap at least this much (Jaccard) are stored once. The data/
+# guides repeat templated paragraphs that differ only in the place name; at 0.9 only those that are
+# otherwise word for word the same are merged. 1 or more turns near-duplicate linking off
+NEAR_DUPLICATE_JACCARD = float(os.getenv("OKOO_DEDUP_NEAR_JACCARD", "0.9"))
+SHINGLE_WORDS = 5
+# 32 MinHash values in 8 bands of 4: pairs at 0.9 Jaccard share a band with probability > 0.999
+NUM_PERM = 32
+BANDS = 8
+
+_WORD_RE = re.compile(r"\w+")
+_PRIME = np.uint64((1 << 61) - 1)
+_rng = np.random.RandomState(17)
+_A = _rng.randint(1, 1 << 31, size=NUM_PERM).astype(np.uint64)
+_B = _rng.randint(0, 1 << 31, size=NUM_PERM).astype(np.uint64)
+
+def shingles(text: str) -> FrozenSet[int]:
+    words = _WORD_RE.findall(text.lower())
+    return frozenset(
+        zlib.crc32(" ".join(words[start:start + SHINGLE_WORDS]).encode("utf-8"))
+        for start in range(max(1, len(words) - SHINGLE_WORDS + 1))
+    )
+
+def _band_keys(shingle_set: FrozenSet[int]) -> List[Tuple[int, bytes]]:
+    values = np.fromiter(shingle_set, dtype=np.uint64, count=len(shingle_set))
+    signature = ((np.outer(_A, values) % _PRIME + _B[:, None]) % _PRIME).min(axis=1)
+    rows = NUM_PERM // BANDS
+    return [(band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(BANDS)]
+
+# ✅ MinHash LSH over the shingles of stored chunks: bands give candidates, exact Jaccard decides
+class NearDuplicateIndex:
+    def __init__(self, threshold: float = NEAR_DUPLICATE_JACCARD):
+        self.threshold = threshold
+        self._shingles: Dict[str, FrozenSet[int]] = {}
+        self._keys: Dict[str, List[Tuple[int, bytes]]] = {}
+        self._buckets: Dict[Tuple[int, bytes], Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._shingles)
+
+    def add(self, chunk_id: str, text: str) -> None:
+        self.remove([chunk_id])
+        shingle_set = shingles(text)
+        if not shingle_set:
+            return
+        self._shingles[chunk_id] = shingle_set
+        self._keys[chunk_id] = _band_keys(shingle_set)
+        for key in self._keys[chunk_id]:
+            self._buckets.setdefault(key, set()).add(chunk_id)
+
+    def remove(self, ids: Iterable[str]) -> None:
+        for chunk_id in ids:
+            self._shingles.pop(chunk_id, None)
+            for key in self._keys.pop(chunk_id, []):
+                bucket = self._buckets.get(key)
+                if bucket is not None:
+                    bucket.discard(chunk_id)
+                    if not bucket:
+                        del self._buckets[key]
+
+    # Most similar stored chunk at or above the threshold
+    def find(self, text: str) -> Optional[str]:
+        if self.threshold >= 1:
+            return None
+        shingle_set = shingles(text)
+        if not shingle_set:
+            return None
+        candidates = set().union(*(self._buckets.get(key, ()) for key in _band_keys(shingle_set)))
+        best, best_score = None, self.threshold
+        for chunk_id in candidates:
+            other = self._shingles[chunk_id]
+            score = len(shingle_set & other) / len(shingle_set | other)
+            if score >= best_score:
+                best, best_score = chunk_id, score
+        return best
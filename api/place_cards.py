@@ -0,0 +1,172 @@
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.documents import Document
+from api.adaptive_retriever import HybridRetriever
+from api.bm25_index import tokenize
+from api.context_packing import format_context, pack_context
+from api.corpus_sync import sync_corpus
+from api.db_utils import delete_place_cards, get_place_card, get_place_card_hashes, upsert_place_card
+from api.gazetteer import PLACES, get_place_index, place_name
+from api.llm_scheduler import llm_request_config
+from api.model_registry import DEFAULT_MODEL, get_chain
+from api.vector_store import CHROMA_DIR
+from filelock import FileLock, Timeout
+from typing import Dict, Optional
+import hashlib
+import logging
+import os
+import threading
+import time
+
+CARD_MODEL = os.getenv("OKOO_PLACE_CARD_MODEL", DEFAULT_MODEL)
+CARD_CHUNKS = int(os.getenv("OKOO_PLACE_CARD_CHUNKS", "8"))
+# Corpus changes arrive in bursts (ingestion batches); wait this long after the last one before refreshing
+REFRESH_QUIET_SECONDS = float(os.getenv("OKOO_PLACE_CARD_QUIET_SECONDS", "5"))
+# Only one API process refreshes cards at a time; the others retry after it
+REFRESH_LOCK_PATH = os.path.join(CHROMA_DIR, "place_cards.lock")
+
+CARD_SECTIONS = ("Overview", "Geography", "History", "Culture", "Attractions", "Travel tips")
+
+card_prompt = ChatPromptTemplate.from_messages([
+    ("system", """You write a destination card for {place}, Ethiopia, using ONLY the provided context.
+Use exactly these sections, each on its own line followed by one or two sentences:
+{sections}
+If the context does not cover a section, write 'Not covered in the documents.' for it."""),
+    ("system", "Context: {context}"),
+    ("human", "Write the destination card for {place}.")
+])
+
+# Words that make up a plain "tell me about <place>" request; anything else is a specific question
+_GENERIC_WORDS = frozenset("""
+a an the and of in at to for me us about please can could you i we would like want tell show give
+explore exploring overview place location learn discover attractions sights things do see visit
+is are there what whats info information guide ethiopia
+""".split())
+
+def get_card_chain(model: str = DEFAULT_MODEL):
+    return get_chain(model, "place_card", lambda llm: card_prompt | llm)
+
+# ✅ Cards are tied to the set of chunks covering the place; chunk ids are content hashes,
+# so any change to the place's documents changes this value
+def place_content_hash(place: str) -> str:
+    chunk_ids = sorted(get_place_index().chunk_ids([place]))
+    return hashlib.sha256("\n".join(chunk_ids).encode("utf-8")).hexdigest()
+
+# ✅ A query is a plain exploration when nothing but the place name and generic words is left
+def is_plain_exploration(query: str, place: str) -> bool:
+    alias_tokens = {token for alias in PLACES[place] for token in tokenize(alias)}
+    return all(token in _GENERIC_WORDS or token in alias_tokens for token in tokenize(query))
+
+def card_document(card: Dict) -> Document:
+    return Document(
+        page_content=card["card"],
+        metadata={"filename": f"place card: {place_name(card['place'])}", "sources": ", ".join(card["sources"])}
+    )
+
+# ✅ Materialised destination cards: generated off the request path at batch LLM priority whenever
+# the chunks covering a place change, then served by explore_place
+class PlaceCardBuilder:
+    def __init__(self, model: str = CARD_MODEL, quiet_seconds: float = REFRESH_QUIET_SECONDS):
+        self.model = model
+        self.quiet_seconds = quiet_seconds
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_change = 0.0
+        self.refreshing = False
+        self.generated = 0
+        self.failed = 0
+        self.removed = 0
+
+    def schedule_refresh(self) -> None:
+        self._last_change = time.monotonic()
+        self._wakeup.set()
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="place-cards", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        refresh_lock = FileLock(REFRESH_LOCK_PATH)
+        while True:
+            self._wakeup.wait()
+            while (remaining := self._last_change + self.quiet_seconds - time.monotonic()) > 0:
+                time.sleep(remaining)
+            self._wakeup.clear()
+            try:
+                with refresh_lock.acquire(timeout=0):
+                    self.refresh()
+            except Timeout:
+                logging.info("🪪 Another process is refreshing the place cards, retrying later")
+                self.schedule_refresh()
+            except Exception as e:
+                logging.error(f"❌ Place card refresh failed: {e}")
+
+    def generate(self, place: str, content_hash: str) -> None:
+        name = place_name(place)
+        retriever = HybridRetriever(places=[place], k=CARD_CHUNKS)
+        docs = pack_context(retriever.invoke(f"{name} geography history culture attractions travel tips"), self.model).documents
+        card = get_card_chain(self.model).invoke({
+            "place": name,
+            "sections": "\n".join(f"{section}:" for section in CARD_SECTIONS),
+            "context": format_context(docs)
+        }, config=llm_request_config(False))
+        upsert_place_card(place, content_hash, card.strip(), get_place_index().files(place), self.model)
+
+    # ✅ (Re)generate cards whose place's chunks changed and drop cards of places no chunk covers any more
+    def refresh(self) -> Dict[str, int]:
+        self.refreshing = True
+        try:
+            sync_corpus()
+            stored = get_place_card_hashes()
+            places = [place for place in PLACES if get_place_index().known_places([place])]
+            gone = [place for place in stored if place not in places]
+            if gone:
+                delete_place_cards(gone)
+                self.removed += len(gone)
+            generated = failed = 0
+            for place in places:
+                content_hash = place_content_hash(place)
+                if stored.get(place) == content_hash:
+                    continue
+                try:
+                    self.generate(place, content_hash)
+                    generated += 1
+                except Exception as e:
+                    failed += 1
+                    logging.warning(f"⚠️ Could not generate the place card for {place_name(place)}: {e}")
+            self.generated += generated
+            self.failed += failed
+            if generated or failed or gone:
+                logging.info(f"🪪 Place cards: {generated} generated, {failed} failed, {len(gone)} removed")
+            return {"generated": generated, "failed": failed, "removed": len(gone)}
+        finally:
+            self.refreshing = False
+
+    # ✅ The stored card for a place, only while it still matches the place's chunks
+    def fresh_card(self, place: str) -> Optional[Dict]:
+        card = get_place_card(place)
+        if card is None or card["content_hash"] != place_content_hash(place):
+            return None
+        return card
+
+    def stats(self) -> Dict:
+        stored = get_place_card_hashes()
+        fresh = sum(1 for place, content_hash in stored.items() if content_hash == place_content_hash(place))
+        return {
+            "model": self.model,
+            "cards": len(stored),
+            "fresh": fresh,
+            "stale": len(stored) - fresh,
+            "generated": self.generated,
+            "failed": self.failed,
+            "removed": self.removed,
+            "refreshing": self.refreshing or self._wakeup.is_set()
+        }
+
+    def summary(self) -> Dict[str, Dict]:
+        return {
+            place: {"name": place_name(place), "fresh": content_hash == place_content_hash(place)}
+            for place, content_hash in sorted(get_place_card_hashes().items())
+        }
+
+place_cards = PlaceCardBuilder()
@@ -1,8 +1,24 @@
-from langchain_community.llms import Ollama
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.documents import Document
 from langchain.chains.combine_documents import create_stuff_documents_chain
-from api.adaptive_retriever import get_adaptive_retriever
+from api.adaptive_retriever import HybridRetriever, get_adaptive_retriever, query_places
+from api.context_packing import measure_prompt, pack_context
+from api.gazetteer import PLACES, place_name
+from api.metrics import RETRIEVAL_SECONDS, timed
+from api.model_registry import DEFAULT_MODEL, get_chain
+from api.streaming import stream_answer
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+import contextvars
 import logging
+import os
+import re
+
+FANOUT_WORKERS = int(os.getenv("OKOO_PLANNER_FANOUT_WORKERS", "4"))
+PER_DESTINATION_CHUNKS = int(os.getenv("OKOO_PLANNER_PER_DESTINATION", "3"))
+LOGISTICS_CHUNKS = int(os.getenv("OKOO_PLANNER_LOGISTICS_CHUNKS", "2"))
+
+_fanout_pool = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix="planner-fanout")
 
 # ✅ Prompt for grounded itinerary generation
 planner_prompt = ChatPromptTemplate.from_messages([
@@ -14,13 +30,83 @@ If the context does not contain enough information, respond exactly with:
     ("human", "{input}")
 ])
 
+def get_planner_chain(model: str = DEFAULT_MODEL):
+    return get_chain(model, "planner", lambda llm: create_stuff_documents_chain(llm=llm, prompt=planner_prompt))
+
+_JOINER = r"(?:,|&|\band\b|\bor\b)"
+
+def _without_places(query: str, places: List[str]) -> str:
+    for place in places:
+        for alias in PLACES[place]:
+            name = rf"(?:\bthe\s+)?\b{re.escape(alias)}\b"
+            # Drop the joining word too: the one before the name ("Lalibela and Gondar" -> "Lalibela"),
+            # or after it when the name starts the list ("Lalibela, Gondar" -> "Gondar")
+            query = re.sub(rf"\s*{_JOINER}\s*{name}", " ", query, flags=re.IGNORECASE)
+            query = re.sub(rf"{name}\s*{_JOINER}?", " ", query, flags=re.IGNORECASE)
+    return re.sub(r"\s+", " ", query).strip(" ,;&")
+
+# ✅ One sub-query per destination (restricted to that place's chunks) plus one for logistics. Each
+# destination's sub-query keeps the user's own terms (dates, interests) with the other places removed
+def plan_sub_queries(query: str, places: List[str]) -> List[Tuple[str, List[str], int]]:
+    sub_queries = [
+        (
+            f"{place_name(place)}: {_without_places(query, [other for other in places if other != place])}. "
+            f"Attractions, things to do, how to get there and where to stay",
+            [place], PER_DESTINATION_CHUNKS
+        )
+        for place in places
+    ]
+    names = ", ".join(place_name(place) for place in places)
+    sub_queries.append((f"travel logistics, transport and best season for {names}: {query}", [], LOGISTICS_CHUNKS))
+    return sub_queries
+
+# ✅ Interleave the sub-query results rank by rank, each capped at its quota, so every destination
+# is represented before any one of them gets its lower-ranked chunks
+def merge_with_quota(results: List[List[Document]], quotas: List[int]) -> List[Document]:
+    merged, seen = [], set()
+    for rank in range(max(quotas, default=0)):
+        for docs, quota in zip(results, quotas):
+            if rank >= min(quota, len(docs)):
+                continue
+            key = docs[rank].id or docs[rank].page_content
+            if key not in seen:
+                seen.add(key)
+                merged.append(docs[rank])
+    return merged
+
+def is_factual_query(query: str) -> bool:
+    return any(kw in query.lower() for kw in ["who", "won", "what", "when", "where", "how"])
+
+# ✅ Whether plan_trip reads the graph's prefetched retrieval: factual queries are refused before
+# retrieving and multi-destination requests run their own fan-out
+def uses_prefetch(query: str) -> bool:
+    return not is_factual_query(query) and len(query_places(query)) < 2
+
+# ✅ Multi-destination requests fan out into concurrent sub-queries; single-destination ones use
+# the graph's prefetched retrieval when there is one
+def retrieve_for_itinerary(query: str, prefetched: Optional[List[Document]] = None) -> List[Document]:
+    places = query_places(query)
+    if len(places) < 2:
+        return prefetched if prefetched is not None else get_adaptive_retriever(query, filter_places=True).invoke(query)
+
+    sub_queries = plan_sub_queries(query, places)
+    with timed(RETRIEVAL_SECONDS, "retrieval.planner_fanout", stage="planner_fanout"):
+        futures = [
+            _fanout_pool.submit(contextvars.copy_context().run, HybridRetriever(places=sub_places).invoke, sub_query)
+            for sub_query, sub_places, _ in sub_queries
+        ]
+        results = [future.result() for future in futures]
+    docs = merge_with_quota(results, [quota for _, _, quota in sub_queries])
+    logging.info(f"🧭 Planner fan-out over {len(places)} destinations: {[len(result) for result in results]} → {len(docs)} chunks")
+    return docs
+
 # ✅ Grounded itinerary planner with retrieval
 def plan_trip(state):
     query = state["input"].lower()
-    model = state.get("model", "qwen:0.5b")
+    model = state.get("model", DEFAULT_MODEL)
 
     # ✅ Block factual queries from being processed here
-    if any(kw in query for kw in ["who", "won", "what", "when", "where", "how"]):
+    if is_factual_query(query):
         logging.info("🚫 Detected factual query inside plan_trip. Returning strict fallback.")
         return {
             **state,
@@ -29,8 +115,7 @@ def plan_trip(state):
         }
 
     # ✅ Retrieve relevant chunks from Chroma
-    retriever = get_adaptive_retriever(query)
-    docs = retriever.invoke(query)
+    docs = retrieve_for_itinerary(query, state.get("retrieved"))
     logging.info(f"📚 Retrieved {len(docs)} chunks for itinerary")
 
     if not docs:
@@ -41,16 +126,17 @@ def plan_trip(state):
             "source_documents": []
         }
 
-    # ✅ Generate itinerary using retrieved context
-    llm = Ollama(model=model)
-    chain = create_stuff_documents_chain(llm=llm, prompt=planner_prompt)
-    result = chain.invoke({"input": query, "context": docs})
-
-    answer = result["answer"] if isinstance(result, dict) else str(result)
+    # ✅ Generate itinerary using retrieved context, packed into the model's token budget
+    docs = pack_context(docs, model).documents
+    chain = get_planner_chain(model)
+    inputs = {"input": query, "context": docs}
+    prompt_tokens = measure_prompt(planner_prompt, inputs, "planner", model)
+    answer = stream_answer(chain, inputs, name="planner", model=model)
     logging.info(f"🧳 Grounded itinerary: {answer}")
 
     return {
         **state,
         "answer": answer,
-        "source_documents": docs
+        "source_documents": docs,
+        "prompt_tokens": prompt_tokens
     }
\ No newline at end of file
@@ -1,14 +1,32 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
 
 class QueryInput(BaseModel):
     session_id: Optional[str]
     question: str
     model: Optional[str] = "qwen:0.5b"  # ✅ Added for model selection
+    include_timings: bool = False  # ✅ Return a per-stage timing breakdown
 
 class DocumentInfo(BaseModel):
     file_id: str
     filename: str
 
 class DeleteFileRequest(BaseModel):
-    file_id: str
\ No newline at end of file
+    file_id: str
+
+class TraceBatchInput(BaseModel):
+    queries: List[str] = Field(..., max_length=50000)
+
+class UploadJobStatus(BaseModel):
+    job_id: str
+    file_id: int
+    filename: str
+    status: str  # queued | parsing | embedding | done | failed
+    pages_parsed: int
+    chunks_total: int
+    chunks_embedded: int
+    chunks_reused: int = 0
+    duplicate_of: Optional[str] = None
+    error: Optional[str] = None
+    created_at: float
+    finished_at: Optional[float] = None
@@ -0,0 +1,132 @@
+from typing import Callable, Dict, List, Optional, Tuple
+import logging
+import os
+import threading
+import time
+
+# Stages that must finish before queries are served; "documents" (indexing /data) only gates /ready
+CORE_STAGES = ("embedding_model", "vector_store", "bm25_index", "place_index", "llm_chains")
+STAGES = CORE_STAGES + ("documents",)
+# A failed core stage (e.g. the Chroma server not reachable yet) is retried this many times with
+# exponential backoff before the process reports itself failed on /ping
+CORE_STAGE_RETRIES = int(os.getenv("OKOO_WARMUP_RETRIES", "5"))
+RETRY_BACKOFF_SECONDS = float(os.getenv("OKOO_WARMUP_BACKOFF_SECONDS", "2"))
+MAX_BACKOFF_SECONDS = 60.0
+
+class NotReady(Exception):
+    def __init__(self, stage: Optional[str], retry_after: int = 5):
+        super().__init__(f"Service is warming up ({stage or 'starting'}), retry in {retry_after}s")
+        self.stage = stage
+        self.retry_after = retry_after
+
+# ✅ Warm-up progress of this process: the port is bound at once and the slow work (model load,
+# index load, /data ingestion) runs on a background thread that reports each stage here
+class Readiness:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.started_at = time.time()
+        self.stages: Dict[str, Dict] = {name: {"status": "pending", "seconds": None, "error": None} for name in STAGES}
+        self.documents: Dict[str, int] = {}
+
+    def _set(self, name: str, **fields) -> None:
+        with self._lock:
+            self.stages[name].update(fields)
+
+    def run_stage(self, name: str, step: Callable[[], object]) -> bool:
+        self._set(name, status="running")
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            self._set(name, status="failed", seconds=round(time.perf_counter() - started, 3), error=str(e))
+            logging.error(f"❌ Warm-up stage {name} failed: {e}")
+            return False
+        self._set(name, status="done", seconds=round(time.perf_counter() - started, 3), error=None)
+        logging.info(f"🌡️ Warm-up stage {name} done in {time.perf_counter() - started:.1f}s")
+        return True
+
+    def update_documents(self, progress: Dict[str, int]) -> None:
+        with self._lock:
+            self.documents = dict(progress)
+
+    def _run_core_stage(self, name: str, step: Callable[[], object]) -> bool:
+        for attempt in range(CORE_STAGE_RETRIES + 1):
+            if self.run_stage(name, step):
+                return True
+            if attempt == CORE_STAGE_RETRIES:
+                return False
+            delay = min(MAX_BACKOFF_SECONDS, RETRY_BACKOFF_SECONDS * 2 ** attempt)
+            # "retrying" keeps /ready at warming_up and /ping healthy while we wait
+            self._set(name, status="retrying", attempts=attempt + 2)
+            logging.warning(f"⚠️ Retrying warm-up stage {name} in {delay:.0f}s ({attempt + 1}/{CORE_STAGE_RETRIES})")
+            time.sleep(delay)
+        return False
+
+    # ✅ Run the stages in order on a daemon thread; a core stage that still fails after its retries
+    # stops the warm-up and marks the process failed
+    def start(self, steps: List[Tuple[str, Callable[[], object]]]) -> None:
+        def run():
+            for position, (name, step) in enumerate(steps):
+                if name not in CORE_STAGES:
+                    self.run_stage(name, step)
+                elif not self._run_core_stage(name, step):
+                    for remaining, _ in steps[position + 1:]:
+                        self._set(remaining, status="skipped")
+                    return
+            logging.info(f"✅ Warm-up finished in {time.time() - self.started_at:.1f}s")
+
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=run, name="warm-up", daemon=True)
+            self._thread.start()
+
+    def _status(self, name: str) -> str:
+        return self.stages[name]["status"]
+
+    @property
+    def serving(self) -> bool:
+        with self._lock:
+            return all(self._status(name) == "done" for name in CORE_STAGES)
+
+    @property
+    def ready(self) -> bool:
+        return self.report()["ready"]
+
+    # ✅ False once a core stage has failed for good: the process can't recover and should be restarted
+    @property
+    def alive(self) -> bool:
+        with self._lock:
+            return not any(self._status(name) == "failed" for name in CORE_STAGES)
+
+    # ✅ Raised on query paths while the core stages are still loading
+    def require_serving(self) -> None:
+        if self.serving:
+            return
+        with self._lock:
+            waiting = next((name for name in CORE_STAGES if self._status(name) != "done"), None)
+        raise NotReady(waiting)
+
+    def report(self) -> Dict:
+        with self._lock:
+            stages = {name: dict(stage) for name, stage in self.stages.items()}
+            documents = dict(self.documents)
+        core = [stages[name]["status"] for name in CORE_STAGES]
+        if "failed" in core:
+            status = "failed"
+        elif any(state != "done" for state in core) or stages["documents"]["status"] in ("pending", "running"):
+            status = "warming_up"
+        elif stages["documents"]["status"] == "failed":
+            status = "degraded"
+        else:
+            status = "ready"
+        return {
+            "ready": status in ("ready", "degraded"),
+            "status": status,
+            "elapsed_seconds": round(time.time() - self.started_at, 1),
+            "stages": stages,
+            "documents": documents
+        }
+
+readiness = Readiness()
@@ -1,5 +1,6 @@
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_community.llms import Ollama
+from api.model_registry import DEFAULT_MODEL, get_chain
+from api.metrics import LLM_SECONDS, REFLECTION_VERDICTS_TOTAL, timed
 from typing import Callable, Dict
 import logging
 
@@ -14,22 +15,24 @@ Question: {question}
 Answer: {answer}""")
 ])
 
-def reflect_on_answer(llm: Ollama, question: str, answer: str) -> str:
-    reflection_chain = reflection_prompt | llm
-    result = reflection_chain.invoke({"question": question, "answer": answer})
+def get_reflection_chain(model: str = DEFAULT_MODEL):
+    return get_chain(model, "reflection", lambda llm: reflection_prompt | llm)
+
+def reflect_on_answer(model: str, question: str, answer: str) -> str:
+    with timed(LLM_SECONDS, "llm.reflection", chain="reflection", model=model):
+        result = get_reflection_chain(model).invoke({"question": question, "answer": answer})
     verdict = result.strip().lower()
+    REFLECTION_VERDICTS_TOTAL.inc(verdict=verdict if verdict in ("good", "retry", "unknown") else "other", model=model)
     logging.info(f"🧠 Reflection verdict: {verdict}")
     return verdict
 
-def wrap_with_reflection(rag_chain: Callable[[Dict], Dict], model: str = "qwen:0.5b") -> Callable:
-    llm = Ollama(model=model)
-
+def wrap_with_reflection(rag_chain: Callable[[Dict], Dict], model: str = DEFAULT_MODEL) -> Callable:
     def wrapped(inputs: Dict) -> Dict:
         result = rag_chain(inputs)
         answer = result["answer"]
         question = inputs["input"]
 
-        verdict = reflect_on_answer(llm, question, answer)
+        verdict = reflect_on_answer(model, question, answer)
 
         if verdict == "retry":
             logging.info("🔁 Retrying RAG query due to weak answer...")
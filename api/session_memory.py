@@ -0,0 +1,206 @@
+from langchain_core.prompts import ChatPromptTemplate
+from api.db_utils import count_chat_turns, get_chat_turns, get_session_summary, upsert_session_summary
+from api.llm_scheduler import llm_request_config
+from api.model_registry import DEFAULT_MODEL, get_chain
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import logging
+import os
+import threading
+import time
+
+RECENT_TURNS = int(os.getenv("OKOO_MEMORY_RECENT_TURNS", "4"))
+# Turns pushed out of the window are folded into the summary once this many are waiting
+SUMMARY_EVERY = int(os.getenv("OKOO_MEMORY_SUMMARY_EVERY", "2"))
+# At most this many turns go into one summarization call (long legacy sessions take several)
+SUMMARY_BATCH_TURNS = int(os.getenv("OKOO_MEMORY_SUMMARY_BATCH_TURNS", "8"))
+SUMMARY_CHARS = int(os.getenv("OKOO_MEMORY_SUMMARY_CHARS", "1200"))
+TURN_CHARS = int(os.getenv("OKOO_MEMORY_TURN_CHARS", "1500"))
+CACHED_SESSIONS = int(os.getenv("OKOO_MEMORY_CACHED_SESSIONS", "1024"))
+# With several API processes a session's turns can be served by any of them, so cached sessions are
+# checked against the chat log and reloaded when another process logged turns they don't have
+SHARED_SESSIONS = int(os.getenv("OKOO_WORKERS", "1")) > 1
+# A cached session is checked at most this often, so a hot session doesn't count its log rows on every access
+SHARED_SESSION_RECHECK_SECONDS = float(os.getenv("OKOO_MEMORY_RECHECK_SECONDS", "2"))
+
+summary_prompt = ChatPromptTemplate.from_messages([
+    ("system", """You maintain a short running summary of a conversation between a traveller and an Ethiopia tourism assistant.
+Update the summary with the new turns. Keep places, dates, budgets, preferences and open questions; drop small talk.
+Answer with the updated summary only, in at most {max_words} words."""),
+    ("human", "Current summary:\n{summary}\n\nNew turns:\n{turns}")
+])
+
+def get_summary_chain(model: str = DEFAULT_MODEL):
+    return get_chain(model, "session_summary", lambda llm: summary_prompt | llm)
+
+def _clip(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit].rstrip() + "…"
+
+def _format_turns(turns: List[Tuple[str, str]]) -> str:
+    return "\n".join(f"Traveller: {_clip(q, 300)}\nAssistant: {_clip(a, 300)}" for q, a in turns)
+
+# ✅ Keep the tail when a summary outgrows its budget: the newest facts matter most
+def _bound_summary(summary: str) -> str:
+    summary = summary.strip()
+    return summary if len(summary) <= SUMMARY_CHARS else "…" + summary[-SUMMARY_CHARS:].lstrip()
+
+# ✅ Used when the LLM is busy or fails, so the summary still advances and pending turns stay bounded
+def _extractive_summary(summary: str, turns: List[Tuple[str, str]]) -> str:
+    asked = "; ".join(_clip(q.strip(), 120) for q, _ in turns)
+    return _bound_summary(f"{summary} The traveller asked: {asked}.".strip())
+
+# ✅ Id of the last logged row among the folded turns. Rows are matched in order by content because
+# turns are logged asynchronously: a dropped log row is skipped, not counted, so the stored position
+# never drifts past turns that were not summarized
+def _summarized_through(rows: List[Dict], batch: List[Tuple[str, str]], after_id: int) -> int:
+    through, position = after_id, 0
+    for turn in batch:
+        for index in range(position, len(rows)):
+            if (rows[index]["user_query"], rows[index]["gpt_response"]) == turn:
+                through, position = rows[index]["id"], index + 1
+                break
+    return through
+
+class _Session:
+    __slots__ = ("summary", "summarized", "summarized_through", "turns", "summarizing", "model", "checked_at")
+
+    def __init__(self, summary: str, summarized: int, summarized_through: int, turns: List[Tuple[str, str]], model: str):
+        self.summary = summary
+        self.summarized = summarized
+        self.summarized_through = summarized_through
+        # Turns not yet folded into the summary, oldest first
+        self.turns = turns
+        self.summarizing = False
+        self.model = model
+        self.checked_at = time.monotonic()
+
+# ✅ Per-session chat memory: the last RECENT_TURNS turns verbatim plus a rolling summary of
+# everything older, so the history sent with each prompt stays bounded however long a session runs.
+# Hot sessions are served from an LRU; summaries are folded in on a background worker at batch priority.
+class SessionMemory:
+    def __init__(self, max_sessions: int = CACHED_SESSIONS):
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.hits = 0
+        self.misses = 0
+        self.summaries = 0
+        self.fallback_summaries = 0
+
+    def stop(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _load(self, session_id: str, model: str) -> _Session:
+        session = self._sessions.get(session_id)
+        if session is not None and SHARED_SESSIONS and not session.summarizing \
+                and time.monotonic() - session.checked_at >= SHARED_SESSION_RECHECK_SECONDS:
+            session.checked_at = time.monotonic()
+            if count_chat_turns(session_id, session.summarized_through) > len(session.turns):
+                session = None
+        if session is not None:
+            self._sessions.move_to_end(session_id)
+            self.hits += 1
+            return session
+        self.misses += 1
+        stored = get_session_summary(session_id) or {"summary": "", "turns_summarized": 0, "summarized_through_id": 0}
+        rows = get_chat_turns(session_id, stored["summarized_through_id"])
+        session = _Session(
+            stored["summary"], stored["turns_summarized"], stored["summarized_through_id"],
+            [(row["user_query"], row["gpt_response"]) for row in rows], model
+        )
+        self._sessions[session_id] = session
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        return session
+
+    def get_history(self, session_id: str, model: str = DEFAULT_MODEL) -> List[Dict]:
+        with self._lock:
+            session = self._load(session_id, model)
+            summary = session.summary
+            recent = session.turns[-RECENT_TURNS:] if RECENT_TURNS > 0 else []
+            self._schedule(session_id, session)
+        messages = []
+        if summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation: {summary}"})
+        for user_query, answer in recent:
+            messages.extend([
+                {"role": "human", "content": _clip(user_query, TURN_CHARS)},
+                {"role": "ai", "content": _clip(answer, TURN_CHARS)}
+            ])
+        return messages
+
+    def add_turn(self, session_id: str, user_query: str, answer: str, model: str = DEFAULT_MODEL) -> None:
+        with self._lock:
+            session = self._load(session_id, model)
+            session.turns.append((user_query, answer))
+            session.model = model
+            self._schedule(session_id, session)
+
+    # Caller holds self._lock
+    def _schedule(self, session_id: str, session: _Session) -> None:
+        pending = len(session.turns) - RECENT_TURNS
+        if session.summarizing or pending < SUMMARY_EVERY:
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-summary")
+        session.summarizing = True
+        self._executor.submit(self._fold, session_id, session)
+
+    def _fold(self, session_id: str, session: _Session) -> None:
+        while True:
+            with self._lock:
+                pending = len(session.turns) - RECENT_TURNS
+                if pending < SUMMARY_EVERY:
+                    session.summarizing = False
+                    return
+                batch = session.turns[:min(pending, SUMMARY_BATCH_TURNS)]
+                summary, model, after_id = session.summary, session.model, session.summarized_through
+            try:
+                updated = get_summary_chain(model).invoke({
+                    "summary": summary or "(none yet)",
+                    "turns": _format_turns(batch),
+                    "max_words": SUMMARY_CHARS // 6
+                }, config=llm_request_config(False))
+                updated = _bound_summary(updated) or _extractive_summary(summary, batch)
+                self.summaries += 1
+            except Exception as e:
+                logging.warning(f"⚠️ Could not summarize session {session_id} with the LLM, keeping an extract: {e}")
+                updated = _extractive_summary(summary, batch)
+                self.fallback_summaries += 1
+            try:
+                through = _summarized_through(get_chat_turns(session_id, after_id), batch, after_id)
+            except Exception as e:
+                logging.error(f"❌ Could not read the chat log of session {session_id}: {e}")
+                through = after_id
+            with self._lock:
+                del session.turns[:len(batch)]
+                session.summary = updated
+                session.summarized += len(batch)
+                session.summarized_through = through
+                summarized = session.summarized
+            try:
+                upsert_session_summary(session_id, updated, summarized, through)
+            except Exception as e:
+                logging.error(f"❌ Could not store the summary of session {session_id}: {e}")
+            logging.info(f"🧠 Folded {len(batch)} turns into the summary of session {session_id} ({summarized} summarized)")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            pending = sum(max(0, len(session.turns) - RECENT_TURNS) for session in self._sessions.values())
+            return {
+                "cached_sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "recent_turns": RECENT_TURNS,
+                "hits": self.hits,
+                "misses": self.misses,
+                "summaries": self.summaries,
+                "fallback_summaries": self.fallback_summaries,
+                "turns_awaiting_summary": pending
+            }
+
+session_memory = SessionMemory()
@@ -0,0 +1,33 @@
+from langgraph.config import get_stream_writer
+from langchain_core.runnables import Runnable
+from api.metrics import LLM_FIRST_TOKEN_SECONDS, LLM_SECONDS, record_timing, timed
+from typing import Any, Dict
+import json
+import time
+
+# ✅ Stream a chain's output through LangGraph's custom stream channel while collecting the full answer
+def stream_answer(chain: Runnable, inputs: Dict[str, Any], name: str = "generate", model: str = "") -> str:
+    writer = get_stream_writer()
+    tokens = []
+    start = time.perf_counter()
+    with timed(LLM_SECONDS, f"llm.{name}", chain=name, model=model):
+        for token in chain.stream(inputs):
+            if not tokens:
+                first_token = time.perf_counter() - start
+                LLM_FIRST_TOKEN_SECONDS.observe(first_token, chain=name, model=model)
+                record_timing(f"llm.{name}.first_token", first_token)
+            tokens.append(token)
+            writer({"token": token})
+    return "".join(tokens)
+
+# ✅ Send a precomputed answer to streaming clients as a single token
+def write_answer(text: str) -> str:
+    get_stream_writer()({"token": text})
+    return text
+
+# ✅ Tell streaming clients to discard the tokens sent so far (retry or strict fallback)
+def reset_answer() -> None:
+    get_stream_writer()({"reset": True})
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
@@ -1,17 +1,21 @@
-from langgraph.graph import StateGraph, END
+from langgraph.graph import StateGraph, START, END
 from langchain_core.runnables import RunnableLambda
-from langchain_community.llms import Ollama
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.documents import Document
 from typing import TypedDict, List, Optional
 
 from api.intent_classifier import classify_intent
-from api.adaptive_retriever import get_adaptive_retriever
+from api.adaptive_retriever import get_adaptive_retriever, prefetched_or_retrieve
 from api.self_reflective_rag import reflect_on_answer
-from api.planner_node import plan_trip
+from api.groundedness import check_groundedness
+from api.context_packing import measure_prompt, pack_context
+from api.planner_node import plan_trip, uses_prefetch
 from api.hotel_comparison_node import compare_hotels
 from api.explore_place_node import explore_place
+from api.model_registry import DEFAULT_MODEL, get_chain, get_or_create
+from api.streaming import stream_answer, reset_answer
+from api.metrics import RETRIES_TOTAL, timed_node
 
 import logging
 
@@ -24,6 +28,8 @@ class TourismState(TypedDict):
     answer: Optional[str]
     source_documents: Optional[List[Document]]
     intent: Optional[str]
+    retrieved: Optional[List[Document]]
+    prompt_tokens: Optional[int]
 
 # ✅ Strict prompt for grounded answers only
 qa_prompt = ChatPromptTemplate.from_messages([
@@ -35,21 +41,47 @@ You must answer ONLY using the provided context. If the context does not contain
     ("human", "{input}")
 ])
 
-# ✅ Node: Classify user intent
+def get_qa_chain(model: str = DEFAULT_MODEL):
+    return get_chain(model, "qa", lambda llm: create_stuff_documents_chain(llm=llm, prompt=qa_prompt))
+
+# ✅ Node: Classify user intent (runs in parallel with prefetch, so it returns only its own key)
 def classify_node(state: TourismState) -> TourismState:
     query = state["input"]
     model = state.get("model", "qwen:0.5b")
     intent = classify_intent(query, model)
     logging.info(f"🧭 Classified intent: {intent}")
-    return {**state, "intent": intent}
-
-# ✅ Node: Retrieve relevant context
-def retrieve_context(state: TourismState) -> TourismState:
+    return {"intent": intent}
+
+# ✅ Whether the intent node will read the prefetched chunks. The keyword classifier is cheap enough
+# to run here too, so unsupported queries and planner fan-outs skip the speculative retrieval
+def should_prefetch(query: str) -> bool:
+    intent = classify_intent(query)
+    if intent == "plan_trip":
+        return uses_prefetch(query)
+    return intent in ("ask_fact", "compare_hotels", "explore_place")
+
+# ✅ Node: Retrieve speculatively while the intent is classified; intent nodes reuse or refine it.
+# Retrieval is restricted to the places the query names (with a whole-corpus fallback) for every
+# intent, ask_fact included
+def prefetch_context(state: TourismState) -> TourismState:
     query = state["input"]
-    retriever = get_adaptive_retriever(query)
-    docs = retriever.invoke(query)
-    logging.info(f"📚 Retrieved {len(docs)} chunks")
-    return {**state, "context": docs}
+    if not should_prefetch(query):
+        logging.info("⏭️ Skipped prefetch: the intent node does not use it")
+        return {"retrieved": None}
+    docs = get_adaptive_retriever(query, filter_places=True).invoke(query)
+    logging.info(f"📚 Prefetched {len(docs)} chunks")
+    return {"retrieved": docs}
+
+# ✅ Node: Join point of classify and prefetch
+def dispatch_node(state: TourismState) -> TourismState:
+    return {}
+
+# ✅ Node: Pack the prefetched context for a factual answer. Like the other intents, ask_fact
+# searches only the chunks about places named in the question, falling back to the whole corpus
+def retrieve_context(state: TourismState) -> TourismState:
+    docs = prefetched_or_retrieve(state)
+    packed = pack_context(docs, state.get("model", DEFAULT_MODEL))
+    return {**state, "context": packed.documents}
 
 # ✅ Node: Generate answer from context
 def generate_answer(state: TourismState) -> TourismState:
@@ -63,33 +95,41 @@ def generate_answer(state: TourismState) -> TourismState:
         }
 
     # ✅ Proceed only if context exists
-    llm = Ollama(model=state.get("model", "qwen:0.5b"))
-    qa_chain = create_stuff_documents_chain(llm=llm, prompt=qa_prompt)
-    result = qa_chain.invoke({
+    model = state.get("model", DEFAULT_MODEL)
+    inputs = {
         "input": state["input"],
         "context": state["context"],
         "chat_history": state.get("chat_history", [])
-    })
-
-    answer = result["answer"] if isinstance(result, dict) and "answer" in result else str(result)
+    }
+    # A retry after reflection sends the prompt again, so its tokens add up
+    prompt_tokens = (state.get("prompt_tokens") or 0) + measure_prompt(qa_prompt, inputs, "qa", model)
+    answer = stream_answer(get_qa_chain(model), inputs, name="qa", model=model)
     logging.info(f"🗣️ Generated answer: {answer}")
 
     return {
         **state,
         "answer": answer,
-        "source_documents": state["context"]
+        "source_documents": state["context"],
+        "prompt_tokens": prompt_tokens
     }
 
-# ✅ Node: Reflect and retry if needed
+# ✅ Node: Reflect and retry if needed. A cheap groundedness score decides clear cases;
+# the LLM critic only runs when the score is ambiguous.
 def reflect_and_retry(state: TourismState) -> TourismState:
-    llm = Ollama(model=state.get("model", "qwen:0.5b"))
-    verdict = reflect_on_answer(llm, state["input"], state["answer"])
+    model = state.get("model", DEFAULT_MODEL)
+    decision, _ = check_groundedness(model, state["answer"], state.get("context") or [])
+    if decision == "accept":
+        return state
+    verdict = "unknown" if decision == "reject" else reflect_on_answer(model, state["input"], state["answer"])
 
     if verdict == "retry":
         logging.info("🔁 Retrying answer generation...")
+        RETRIES_TOTAL.inc(model=model)
+        reset_answer()
         return generate_answer(state)
     elif verdict == "unknown":
         logging.info("🤷‍♂️ Answer unsupported. Returning strict fallback.")
+        reset_answer()
         state["answer"] = "I do not know and it is not in the data and context provided to me"
 
     return state
@@ -106,22 +146,27 @@ def unsupported_node(state: TourismState) -> TourismState:
 def route_by_intent(state: TourismState) -> str:
     return state["intent"]
 
-# ✅ Build the LangGraph workflow
-def get_tourism_graph(model: str = "qwen:0.5b"):
+# ✅ Build and compile the LangGraph workflow
+def _build_graph(model: str):
     builder = StateGraph(TourismState)
 
-    builder.add_node("classify", RunnableLambda(classify_node))
-    builder.add_node("retrieve", RunnableLambda(retrieve_context))
-    builder.add_node("answer", RunnableLambda(generate_answer))
-    builder.add_node("reflect", RunnableLambda(reflect_and_retry))
-    builder.add_node("plan", RunnableLambda(plan_trip))
-    builder.add_node("compare", RunnableLambda(compare_hotels))
-    builder.add_node("explore", RunnableLambda(explore_place))
-    builder.add_node("unsupported", RunnableLambda(unsupported_node))
-
-    builder.set_entry_point("classify")
-
-    builder.add_conditional_edges("classify", route_by_intent, {
+    builder.add_node("classify", RunnableLambda(timed_node("classify", classify_node)))
+    builder.add_node("prefetch", RunnableLambda(timed_node("prefetch", prefetch_context)))
+    builder.add_node("dispatch", RunnableLambda(timed_node("dispatch", dispatch_node)))
+    builder.add_node("retrieve", RunnableLambda(timed_node("retrieve", retrieve_context)))
+    builder.add_node("answer", RunnableLambda(timed_node("answer", generate_answer)))
+    builder.add_node("reflect", RunnableLambda(timed_node("reflect", reflect_and_retry)))
+    builder.add_node("plan", RunnableLambda(timed_node("plan", plan_trip)))
+    builder.add_node("compare", RunnableLambda(timed_node("compare", compare_hotels)))
+    builder.add_node("explore", RunnableLambda(timed_node("explore", explore_place)))
+    builder.add_node("unsupported", RunnableLambda(timed_node("unsupported", unsupported_node)))
+
+    # ✅ Classification and retrieval start together; dispatch waits for both, then routes by intent
+    builder.add_edge(START, "classify")
+    builder.add_edge(START, "prefetch")
+    builder.add_edge(["classify", "prefetch"], "dispatch")
+
+    builder.add_conditional_edges("dispatch", route_by_intent, {
         "ask_fact": "retrieve",
         "explore_place": "explore",
         "compare_hotels": "compare",
@@ -137,5 +182,12 @@ def get_tourism_graph(model: str = "qwen:0.5b"):
     builder.add_edge("explore", END)
     builder.add_edge("unsupported", END)
 
-    graph = builder.compile()
-    return lambda inputs: graph.invoke({**inputs, "model": model})
\ No newline at end of file
+    return builder.compile()
+
+# ✅ Compiled once per model and reused across requests
+def get_compiled_graph(model: str = DEFAULT_MODEL):
+    return get_or_create(model, "graph", "tourism", lambda: _build_graph(model))
+
+def get_tourism_graph(model: str = DEFAULT_MODEL):
+    graph = get_compiled_graph(model)
+    return lambda inputs, config=None: graph.invoke({**inputs, "model": model}, config=config)
\ No newline at end of file
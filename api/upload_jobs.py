@@ -0,0 +1,189 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from collections import OrderedDict
+from api.chroma_utils import load_document, text_splitter
+from api.dedup import SourceChunks, file_sha256, find_duplicate_document, link_duplicate_document, store_sources, upload_source
+from api.db_utils import delete_document_record, get_upload_job, prune_upload_jobs, upsert_upload_job
+from api.place_cards import place_cards
+from typing import Dict, Optional, Tuple
+import logging
+import os
+import threading
+import time
+import uuid
+
+UPLOAD_WORKERS = int(os.getenv("OKOO_UPLOAD_WORKERS", "1"))
+UPLOAD_QUEUE_SIZE = int(os.getenv("OKOO_UPLOAD_QUEUE_SIZE", "16"))
+UPLOAD_JOB_HISTORY = int(os.getenv("OKOO_UPLOAD_JOB_HISTORY", "200"))
+# Finished jobs are kept in the database this long for /upload-status
+UPLOAD_JOB_RETENTION_SECONDS = float(os.getenv("OKOO_UPLOAD_JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+
+class UploadQueueFull(Exception):
+    pass
+
+def _process_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+# ✅ Background indexing of uploaded files. A small fixed pool bounds how much CPU
+# parsing and embedding can take away from chat traffic; progress is kept per job.
+class UploadJobQueue:
+    def __init__(self, workers: int = UPLOAD_WORKERS, max_pending: int = UPLOAD_QUEUE_SIZE, history: int = UPLOAD_JOB_HISTORY):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.history = history
+        self._jobs: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Jobs not picked up by a worker thread yet: job_id -> (future, job, temp file)
+        self._queued: Dict[str, Tuple[Future, Dict, str]] = {}
+        self.pending = 0
+
+    def start(self) -> None:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="upload-job")
+
+    # ✅ Jobs still waiting are cancelled and cleaned up like failed ones; a running job finishes on its own
+    def stop(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+            queued, self._queued = list(self._queued.values()), {}
+        for future, job, file_path in queued:
+            if future.cancel():
+                delete_document_record(job["file_id"])
+                self._finish(job, file_path, status="failed", error="Cancelled: the server shut down before indexing started")
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def submit(self, file_path: str, filename: str, file_id: int) -> Dict:
+        self.start()
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "file_id": file_id,
+            "filename": filename,
+            "status": "queued",
+            "pages_parsed": 0,
+            "chunks_total": 0,
+            "chunks_embedded": 0,
+            "chunks_reused": 0,
+            "duplicate_of": None,
+            "error": None,
+            "created_at": time.time(),
+            "finished_at": None
+        }
+        with self._lock:
+            if self.pending >= self.max_pending:
+                raise UploadQueueFull(f"{self.pending} uploads are already waiting to be indexed")
+            self.pending += 1
+            self._jobs[job["job_id"]] = job
+            self._forget_finished()
+            self._queued[job["job_id"]] = (self._executor.submit(self._run, job, file_path), job, file_path)
+        self._persist(job)
+        try:
+            prune_upload_jobs(UPLOAD_JOB_RETENTION_SECONDS)
+        except Exception as e:
+            logging.warning(f"⚠️ Could not prune old upload jobs: {e}")
+        logging.info(f"📥 Queued upload {filename} as job {job['job_id']}")
+        return dict(job)
+
+    # ✅ Jobs run by another API process (or forgotten from history) are looked up in the database
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                return dict(job)
+        stored = get_upload_job(job_id)
+        if stored is None:
+            return None
+        job = stored["job"]
+        # A queued job can wait behind long uploads, so only its process going away abandons it. Unfinished
+        # jobs of this pid that this process doesn't know were left by an earlier process with the same pid
+        if job["finished_at"] is None and (
+            not _process_alive(stored["owner_pid"]) or stored["owner_pid"] == os.getpid()
+        ):
+            # The process running it crashed or was restarted mid-job
+            logging.warning(f"⚠️ Upload job {job_id} was abandoned while {job['status']}, marking it failed")
+            delete_document_record(job["file_id"])
+            job.update(status="failed", error="Abandoned: the process indexing it stopped", finished_at=time.time())
+            upsert_upload_job(job)
+        return job
+
+    def _persist(self, job: Dict) -> None:
+        with self._lock:
+            snapshot = dict(job)
+        try:
+            upsert_upload_job(snapshot)
+        except Exception as e:
+            logging.warning(f"⚠️ Could not store the status of upload job {job['job_id']}: {e}")
+
+    def _update(self, job: Dict, **fields) -> None:
+        with self._lock:
+            job.update(fields)
+        self._persist(job)
+
+    def _forget_finished(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job["finished_at"] is not None]
+        for job_id in finished[:max(0, len(self._jobs) - self.history)]:
+            del self._jobs[job_id]
+
+    # ✅ The final status and finished_at are stored together, so a job is never seen done but unfinished
+    def _finish(self, job: Dict, file_path: str, **fields) -> None:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        with self._lock:
+            self.pending -= 1
+            job.update(fields, finished_at=time.time())
+        self._persist(job)
+
+    def _run(self, job: Dict, file_path: str) -> None:
+        with self._lock:
+            self._queued.pop(job["job_id"], None)
+        outcome: Dict = {}
+        try:
+            source = upload_source(job["file_id"])
+            sha256 = file_sha256(file_path)
+            canonical = find_duplicate_document(sha256)
+            if canonical:
+                reused = link_duplicate_document(source, job["filename"], job["file_id"], sha256, canonical)
+                outcome = {"status": "done", "duplicate_of": canonical, "chunks_total": reused, "chunks_reused": reused}
+                return
+
+            self._update(job, status="parsing")
+            pages = load_document(file_path)
+            self._update(job, pages_parsed=len(pages))
+            splits = text_splitter.split_documents(pages)
+            for split in splits:
+                split.metadata["source"] = job["filename"]
+            self._update(job, status="embedding", chunks_total=len(splits))
+            result = store_sources(
+                [SourceChunks(source, job["filename"], job["file_id"], sha256, splits)],
+                progress=lambda embedded, reused: self._update(job, chunks_embedded=embedded, chunks_reused=reused)
+            )
+            outcome = {"status": "done"}
+            place_cards.schedule_refresh()
+            logging.info(
+                f"✅ Upload job {job['job_id']}: indexed {result['chunks']} chunks from {job['filename']} "
+                f"({result['embedded']} embedded, {result['reused']} reused)"
+            )
+        except Exception as e:
+            logging.error(f"❌ Upload job {job['job_id']} failed for {job['filename']}: {e}")
+            delete_document_record(job["file_id"])
+            outcome = {"status": "failed", "error": str(e)}
+        finally:
+            self._finish(job, file_path, **outcome)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            statuses: Dict[str, int] = {}
+            for job in self._jobs.values():
+                statuses[job["status"]] = statuses.get(job["status"], 0) + 1
+            return {"workers": self.workers, "max_pending": self.max_pending, "pending": self.pending, "jobs": statuses}
+
+upload_jobs = UploadJobQueue()
@@ -0,0 +1,43 @@
+from langchain_chroma import Chroma
+from langchain_huggingface import HuggingFaceEmbeddings
+from typing import Optional
+import chromadb
+import logging
+import os
+import threading
+
+CHROMA_DIR = "./chroma_db"
+# ✅ When set, the collection is served by a Chroma server (`chroma run --path ./chroma_db`) shared
+# by every API process instead of being opened in-process
+CHROMA_HOST = os.getenv("OKOO_CHROMA_HOST")
+CHROMA_PORT = int(os.getenv("OKOO_CHROMA_PORT", "8001"))
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+# ✅ One embedding model and one Chroma client per process, created on first use
+_embedding_model: Optional[HuggingFaceEmbeddings] = None
+_vectorstore: Optional[Chroma] = None
+_lock = threading.Lock()
+
+def get_embedding_model() -> HuggingFaceEmbeddings:
+    global _embedding_model
+    if _embedding_model is None:
+        with _lock:
+            if _embedding_model is None:
+                _embedding_model = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+                logging.info(f"🧮 Loaded embedding model {EMBEDDING_MODEL_NAME}")
+    return _embedding_model
+
+def get_vectorstore() -> Chroma:
+    global _vectorstore
+    if _vectorstore is None:
+        embedding_model = get_embedding_model()
+        with _lock:
+            if _vectorstore is None:
+                if CHROMA_HOST:
+                    client = chromadb.HttpClient(host=CHROMA_HOST, port=CHROMA_PORT)
+                    _vectorstore = Chroma(client=client, embedding_function=embedding_model)
+                    logging.info(f"🗄️ Connected to the Chroma server at {CHROMA_HOST}:{CHROMA_PORT}")
+                else:
+                    _vectorstore = Chroma(persist_directory=CHROMA_DIR, embedding_function=embedding_model)
+                    logging.info(f"🗄️ Opened Chroma collection at {CHROMA_DIR}")
+    return _vectorstore
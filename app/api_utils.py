@@ -1,6 +1,7 @@
 import requests
 import streamlit as st
-from typing import Optional, List
+import json
+from typing import Optional, List, Iterator, Tuple
 
 API_BASE_URL = "http://localhost:8000"
 
@@ -19,6 +20,31 @@ def get_api_response(question: str, session_id: Optional[str]) -> Optional[dict]
         st.error(f"Error during API request: {str(e)}")
         return None
 
+def stream_api_response(question: str, session_id: Optional[str]) -> Iterator[Tuple[str, dict]]:
+    url = f"{API_BASE_URL}/chat/stream"
+    headers = {'accept': 'text/event-stream', 'Content-Type': 'application/json'}
+    payload = {
+        "question": question,
+        "model": "qwen:0.5b",  # 🔒 Locked model
+        "session_id": session_id
+    }
+    try:
+        with requests.post(url, headers=headers, json=payload, stream=True) as response:
+            if response.status_code != 200:
+                yield "error", {"detail": f"HTTP {response.status_code}"}
+                return
+            event, data = "message", []
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    data.append(line[len("data:"):].strip())
+                elif not line and data:
+                    yield event, json.loads("\n".join(data))
+                    event, data = "message", []
+    except Exception as e:
+        st.error(f"Error during API request: {str(e)}")
+
 def upload_document(file) -> Optional[dict]:
     url = f"{API_BASE_URL}/upload-doc"
     try:
@@ -30,6 +56,15 @@ def upload_document(file) -> Optional[dict]:
         st.error(f"Error uploading file: {str(e)}")
         return None
 
+def get_upload_status(job_id: str) -> Optional[dict]:
+    url = f"{API_BASE_URL}/upload-status/{job_id}"
+    try:
+        response = requests.get(url)
+        return response.json() if response.status_code == 200 else None
+    except Exception as e:
+        st.error(f"Error fetching upload status: {str(e)}")
+        return None
+
 def list_documents() -> List[dict]:
     url = f"{API_BASE_URL}/list-docs"
     try:
@@ -1,5 +1,5 @@
 import streamlit as st
-from api_utils import get_api_response
+from api_utils import stream_api_response
 from typing import Dict
 
 def display_chat_interface():
@@ -12,18 +12,38 @@ def display_chat_interface():
         with st.chat_message("human"):
             st.markdown(prompt)
 
-        with st.spinner("Generating response..."):
-            session_id = st.session_state.get("session_id")
-            response: Dict | None = get_api_response(prompt, session_id)
+        session_id = st.session_state.get("session_id")
+        with st.chat_message("ai"):
+            placeholder = st.empty()
+            placeholder.markdown("_Generating response..._")
+            response: Dict | None = _render_stream(prompt, session_id, placeholder)
 
-            if response:
-                st.session_state.session_id = response.get("session_id")
-                st.session_state.messages.append({"role": "ai", "content": response["answer"]})
-                with st.chat_message("ai"):
-                    st.markdown(response["answer"])
-                _display_response_details(response)
-            else:
-                st.error("Failed to get a response from the API.")
+        if response:
+            st.session_state.session_id = response.get("session_id")
+            st.session_state.messages.append({"role": "ai", "content": response["answer"]})
+            _display_response_details(response)
+        else:
+            st.error("Failed to get a response from the API.")
+
+# ✅ Render tokens as they arrive; the final "done" event carries the authoritative answer
+def _render_stream(prompt: str, session_id: str | None, placeholder) -> Dict | None:
+    answer, source = "", ""
+    for event, data in stream_api_response(prompt, session_id):
+        if event == "token":
+            answer += data["text"]
+            placeholder.markdown(answer + "▌")
+        elif event == "reset":
+            answer = ""
+            placeholder.markdown("_Refining answer..._")
+        elif event == "sources":
+            source = data["source"]
+        elif event == "done":
+            placeholder.markdown(data["answer"])
+            return {**data, "source": source}
+        elif event == "error":
+            placeholder.empty()
+            return None
+    return None
 
 def _display_response_details(response: Dict):
     with st.expander("Details"):
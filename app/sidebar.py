@@ -1,5 +1,5 @@
 import streamlit as st
-from api_utils import upload_document, list_documents, delete_document
+from api_utils import upload_document, get_upload_status, list_documents, delete_document
 from typing import List, Dict
 
 def display_sidebar():
@@ -9,8 +9,11 @@ def display_sidebar():
         with st.spinner("Uploading..."):
             upload_response = upload_document(uploaded_file)
             if upload_response:
-                st.sidebar.success(f"File uploaded with ID {upload_response['file_id']}")
-                st.session_state.documents = list_documents()
+                st.sidebar.success(f"File uploaded with ID {upload_response['file_id']}, indexing in the background")
+                st.session_state.setdefault("upload_jobs", []).append(upload_response["job_id"])
+
+    # ⏳ Indexing progress (refreshed on every rerun, never blocks the page)
+    _display_upload_jobs()
 
     # 📜 Document list
     st.sidebar.header("Uploaded Documents")
@@ -19,6 +22,31 @@ def display_sidebar():
 
     _display_document_list(st.session_state.get("documents", []))
 
+def _display_upload_jobs():
+    job_ids = st.session_state.get("upload_jobs", [])
+    if not job_ids:
+        return
+
+    st.sidebar.header("Indexing")
+    still_running = []
+    for job_id in job_ids:
+        job = get_upload_status(job_id)
+        if not job:
+            continue
+        if job["status"] == "done":
+            st.sidebar.success(f"{job['filename']}: indexed {job['chunks_total']} chunks")
+            st.session_state.documents = list_documents()
+        elif job["status"] == "failed":
+            st.sidebar.error(f"{job['filename']}: {job['error']}")
+        else:
+            done = (job["chunks_embedded"] + job["chunks_reused"]) / job["chunks_total"] if job["chunks_total"] else 0.0
+            st.sidebar.progress(done, text=f"{job['filename']}: {job['status']} "
+                                           f"({job['pages_parsed']} pages, {job['chunks_embedded'] + job['chunks_reused']}/{job['chunks_total']} chunks)")
+            still_running.append(job_id)
+    st.session_state.upload_jobs = still_running
+    if still_running:
+        st.sidebar.button("Refresh Indexing Status")
+
 def _display_document_list(documents: List[Dict]):
     if not documents:
         st.sidebar.info("No documents uploaded yet.")
@@ -0,0 +1,140 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from datetime import datetime, timezone
+import argparse
+import json
+import logging
+import threading
+import time
+
+ANSWER_TEXT = (
+    "Based on the documents, Lalibela is best visited between October and March, "
+    "when the rock-hewn churches host the main festivals and the highland roads are dry. "
+    "Plan at least two days to see both church clusters and the Bete Giyorgis cross."
+)
+REFLECTION_MARKER = "critical evaluator"
+
+# ✅ Stand-in for the Ollama HTTP API with a fixed time to first token and token rate,
+# so the app can be benchmarked without a real model
+class FakeOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, first_token_latency: float = 0.2, tokens_per_second: float = 50.0,
+                 answer_tokens: int = 60, reflection_verdict: str = "good"):
+        super().__init__(address, FakeOllamaHandler)
+        self.first_token_latency = first_token_latency
+        self.tokens_per_second = tokens_per_second
+        self.answer_tokens = answer_tokens
+        self.reflection_verdict = reflection_verdict
+        self.requests_served = 0
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def tokens_for(self, prompt: str):
+        if REFLECTION_MARKER in prompt:
+            return [self.reflection_verdict]
+        words = ANSWER_TEXT.split()
+        return [f"{words[i % len(words)]} " for i in range(self.answer_tokens)]
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict) -> None:
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json(200, {"models": []})
+        elif self.path == "/api/version":
+            self._send_json(200, {"version": "fake"})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path not in ("/api/generate", "/api/chat"):
+            self._send_json(404, {"error": "not found"})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if self.path == "/api/chat":
+            prompt = "\n".join(message.get("content", "") for message in request.get("messages", []))
+        else:
+            prompt = request.get("prompt") or ""
+
+        server: FakeOllamaServer = self.server
+        with server._lock:
+            server.requests_served += 1
+        tokens = server.tokens_for(prompt)
+        interval = 1.0 / server.tokens_per_second if server.tokens_per_second > 0 else 0.0
+        model = request.get("model", "")
+        started = time.perf_counter()
+
+        time.sleep(server.first_token_latency)
+        if request.get("stream", True):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i, token in enumerate(tokens):
+                if i:
+                    time.sleep(interval)
+                self._write_chunk(self._message(model, token, done=False))
+            self._write_chunk(self._message(model, "", done=True, eval_count=len(tokens),
+                                            total_duration=int((time.perf_counter() - started) * 1e9)))
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            time.sleep(interval * max(len(tokens) - 1, 0))
+            self._send_json(200, self._message(model, "".join(tokens), done=True, eval_count=len(tokens),
+                                                total_duration=int((time.perf_counter() - started) * 1e9)))
+
+    def _message(self, model: str, text: str, done: bool, **extra) -> dict:
+        message = {"model": model, "created_at": datetime.now(timezone.utc).isoformat(), "done": done}
+        if self.path == "/api/chat":
+            message["message"] = {"role": "assistant", "content": text}
+        else:
+            message["response"] = text
+        message.update(extra)
+        return message
+
+    def _write_chunk(self, body: dict) -> None:
+        line = json.dumps(body).encode("utf-8") + b"\n"
+        self.wfile.write(f"{len(line):X}\r\n".encode("ascii") + line + b"\r\n")
+        self.wfile.flush()
+
+def start_fake_ollama(host: str = "127.0.0.1", port: int = 0, **options) -> FakeOllamaServer:
+    server = FakeOllamaServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, name="fake-ollama", daemon=True).start()
+    logging.info(f"🤖 Fake Ollama listening on {server.base_url}")
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a fake Ollama API for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--first-token-latency", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--answer-tokens", type=int, default=60)
+    parser.add_argument("--reflection-verdict", default="good", choices=["good", "retry", "unknown"])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = FakeOllamaServer(
+        (args.host, args.port),
+        first_token_latency=args.first_token_latency,
+        tokens_per_second=args.tokens_per_second,
+        answer_tokens=args.answer_tokens,
+        reflection_verdict=args.reflection_verdict
+    )
+    logging.info(f"🤖 Fake Ollama listening on {server.base_url}")
+    server.serve_forever()
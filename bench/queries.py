@@ -0,0 +1,20 @@
+# ✅ Fixed benchmark workload: the same queries in the same order on every run
+# (endpoint, intent, question). /chat routes by intent; the intent endpoints force theirs.
+QUERY_SET = [
+    ("/chat", "ask_fact", "What is the history of the Aksum stelae?"),
+    ("/chat", "ask_fact", "When is the Timket festival celebrated?"),
+    ("/chat", "ask_fact", "Who built the castles in Gondar?"),
+    ("/chat", "ask_fact", "Tell me the background of the Harar walled city"),
+    ("/chat", "plan_trip", "Plan a 5 days trip to Lalibela and Gondar"),
+    ("/chat", "plan_trip", "Give me an itinerary for a holiday in the Simien Mountains"),
+    ("/chat", "compare_hotels", "Compare hotels in Bahir Dar by price and rating"),
+    ("/chat", "compare_hotels", "Which accommodation has the best amenities in Hawassa?"),
+    ("/chat", "explore_place", "Explore the attractions of the Danakil Depression"),
+    ("/chat", "explore_place", "Things to do around Lake Langano"),
+    ("/plan-trip", "plan_trip", "Plan a week-long journey through the Omo Valley"),
+    ("/plan-trip", "plan_trip", "Schedule a 3 days route from Addis Ababa to Bale Mountains"),
+    ("/compare-hotels", "compare_hotels", "Compare hotels near the Lalibela churches"),
+    ("/compare-hotels", "compare_hotels", "Compare accommodation prices in Addis Ababa"),
+    ("/explore-place", "explore_place", "Explore Debre Damo monastery"),
+    ("/explore-place", "explore_place", "Discover the sights of Jinka and South Omo"),
+]
@@ -0,0 +1,226 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from bench.fake_ollama import start_fake_ollama
+from bench.queries import QUERY_SET
+import argparse
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import requests
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_SAMPLE_RE = re.compile(r"^([a-zA-Z_:][\w:]*)(?:\{(.*)\})? (\S+)$")
+_LABEL_RE = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+# ✅ Prometheus text → {(metric name, frozenset(labels)): value}
+def scrape_metrics(base_url: str) -> Dict[Tuple[str, frozenset], float]:
+    samples = {}
+    for line in requests.get(f"{base_url}/metrics", timeout=30).text.splitlines():
+        match = _SAMPLE_RE.match(line)
+        if not line or line.startswith("#") or not match:
+            continue
+        name, labels, value = match.groups()
+        samples[(name, frozenset(_LABEL_RE.findall(labels or "")))] = float(value)
+    return samples
+
+def node_breakdown(before: Dict, after: Dict) -> Dict[str, Dict[str, float]]:
+    nodes: Dict[str, Dict[str, float]] = {}
+    for (name, labels), value in after.items():
+        if name not in ("okoo_graph_node_seconds_sum", "okoo_graph_node_seconds_count"):
+            continue
+        node = dict(labels).get("node", "")
+        field = "seconds" if name.endswith("_sum") else "calls"
+        stats = nodes.setdefault(node, {"seconds": 0.0, "calls": 0.0})
+        stats[field] += value - before.get((name, labels), 0.0)
+    return {
+        node: {"calls": int(stats["calls"]), "total_s": stats["seconds"], "mean_s": stats["seconds"] / stats["calls"]}
+        for node, stats in sorted(nodes.items()) if stats["calls"]
+    }
+
+def send_query(base_url: str, endpoint: str, question: str, session_id: str) -> Tuple[float, bool, bool]:
+    started = time.perf_counter()
+    try:
+        if endpoint == "/chat":
+            response = requests.post(f"{base_url}/chat", json={"session_id": session_id, "question": question}, timeout=600)
+        else:
+            response = requests.post(f"{base_url}{endpoint}", data={"input": question, "session_id": session_id}, timeout=600)
+        ok = response.status_code == 200
+        cached = ok and bool(response.json().get("cached", False))
+    except requests.RequestException:
+        ok, cached = False, False
+    return time.perf_counter() - started, ok, cached
+
+def run_level(base_url: str, concurrency: int, rounds: int) -> Dict:
+    workload = [
+        (endpoint, intent, question, f"bench-c{concurrency}-{i}")
+        for i, (endpoint, intent, question) in enumerate(QUERY_SET * rounds)
+    ]
+    before = scrape_metrics(base_url)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda item: (item[0], item[1], *send_query(base_url, item[0], item[2], item[3])), workload))
+    wall = time.perf_counter() - started
+    after = scrape_metrics(base_url)
+
+    latencies = [latency for _, _, latency, ok, _ in results if ok]
+    by_endpoint: Dict[str, List[float]] = {}
+    by_intent: Dict[str, List[float]] = {}
+    for endpoint, intent, latency, ok, _ in results:
+        if ok:
+            by_endpoint.setdefault(endpoint, []).append(latency)
+            by_intent.setdefault(intent, []).append(latency)
+    summarize = lambda values: {
+        "count": len(values), "p50": percentile(values, 50), "p95": percentile(values, 95), "p99": percentile(values, 99)
+    }
+    return {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "errors": sum(1 for result in results if not result[3]),
+        "cached": sum(1 for result in results if result[4]),
+        "wall_s": wall,
+        "rps": len(latencies) / wall if wall else 0.0,
+        "latency": summarize(latencies),
+        "endpoints": {endpoint: summarize(values) for endpoint, values in sorted(by_endpoint.items())},
+        "intents": {intent: summarize(values) for intent, values in sorted(by_intent.items())},
+        "nodes": node_breakdown(before, after)
+    }
+
+def print_report(levels: List[Dict]) -> None:
+    print(f"\n{'conc':>5} {'reqs':>5} {'err':>4} {'cached':>6} {'rps':>7} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8}")
+    for level in levels:
+        latency = level["latency"]
+        print(f"{level['concurrency']:>5} {level['requests']:>5} {level['errors']:>4} {level['cached']:>6} "
+              f"{level['rps']:>7.2f} {latency['p50']:>8.3f} {latency['p95']:>8.3f} {latency['p99']:>8.3f}")
+    for level in levels:
+        print(f"\n── concurrency {level['concurrency']} ──")
+        for group in ("endpoints", "intents"):
+            for name, stats in level[group].items():
+                print(f"  {name:<18} n={stats['count']:<4} p50={stats['p50']:.3f}s p95={stats['p95']:.3f}s p99={stats['p99']:.3f}s")
+        for node, stats in level["nodes"].items():
+            print(f"  node {node:<13} calls={stats['calls']:<4} mean={stats['mean_s']:.3f}s total={stats['total_s']:.2f}s")
+
+def wait_until_up(base_url: str, timeout: float, process: Optional[subprocess.Popen]) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"API server exited with code {process.returncode}")
+        try:
+            if requests.get(f"{base_url}/ready", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"API at {base_url} was not up after {timeout:.0f}s")
+
+# ✅ A throwaway copy of data/, so a run never writes chat logs, summaries or place cards made by the
+# fake LLM into the real chroma_db/ and rag_app.db; the API indexes it on startup
+def make_workdir() -> str:
+    workdir = tempfile.mkdtemp(prefix="okoo_bench_")
+    shutil.copytree(os.path.join(REPO_ROOT, "data"), os.path.join(workdir, "data"))
+    return workdir
+
+def start_api(port: int, ollama_url: str, cache: bool, workdir: str, log_path: str, workers: int = 1) -> subprocess.Popen:
+    env = dict(os.environ, OLLAMA_BASE_URL=ollama_url, ANONYMIZED_TELEMETRY="False")
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [REPO_ROOT, env.get("PYTHONPATH")]))
+    if not cache:
+        # A similarity above 1.0 never matches, so every request runs the full graph
+        env["OKOO_CACHE_SIMILARITY"] = "2.0"
+    log_file = open(log_path, "w")
+    if workers > 1:
+        env["OKOO_WORKERS"] = str(workers)
+        command = [
+            sys.executable, "-m", "gunicorn", "-c", os.path.join(REPO_ROOT, "gunicorn.conf.py"),
+            "--bind", f"127.0.0.1:{port}", "api.main:app"
+        ]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "api.main:app", "--host", "127.0.0.1", "--port", str(port)]
+    return subprocess.Popen(command, cwd=workdir, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Latency/throughput benchmark for the OkooAI API against a fake LLM")
+    parser.add_argument("--concurrency", default="1,4,8", help="comma-separated concurrency levels")
+    parser.add_argument("--rounds", type=int, default=2, help="passes over the query set per level")
+    parser.add_argument("--first-token-latency", type=float, default=0.2)
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--answer-tokens", type=int, default=60)
+    parser.add_argument("--ollama-port", type=int, default=0, help="fake Ollama port (0 picks a free one)")
+    parser.add_argument("--cache", action="store_true", help="leave the semantic answer cache enabled")
+    parser.add_argument("--workers", type=int, default=1, help="API processes (more than one runs gunicorn.conf.py)")
+    parser.add_argument("--no-warmup", action="store_true", help="skip the unmeasured pass over the query set")
+    parser.add_argument("--base-url", help="benchmark an already running API instead of starting one")
+    parser.add_argument(
+        "--workdir", help="directory holding data/, chroma_db/ and rag_app.db (default: a temporary copy of data/)"
+    )
+    parser.add_argument("--startup-timeout", type=float, default=900.0)
+    parser.add_argument("--server-log", default="bench_server.log")
+    parser.add_argument("--json", dest="json_path", help="also write the results to this file")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    fake = start_fake_ollama(
+        port=args.ollama_port,
+        first_token_latency=args.first_token_latency,
+        tokens_per_second=args.tokens_per_second,
+        answer_tokens=args.answer_tokens
+    )
+    process = None
+    temp_workdir = None
+    base_url = args.base_url
+    if base_url is None:
+        port = _free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        if args.workdir is None:
+            temp_workdir = make_workdir()
+            logging.info(f"📁 Running against a temporary copy of data/ in {temp_workdir}")
+        process = start_api(port, fake.base_url, args.cache, args.workdir or temp_workdir, args.server_log, args.workers)
+        logging.info(f"🚀 Starting API on {base_url} (log: {args.server_log})")
+    else:
+        logging.info(f"⚠️ Using running API at {base_url}; it must point OLLAMA_BASE_URL at {fake.base_url}")
+
+    try:
+        wait_until_up(base_url, args.startup_timeout, process)
+        if not args.no_warmup:
+            logging.info("🔥 Warm-up pass")
+            for i, (endpoint, _, question) in enumerate(QUERY_SET):
+                send_query(base_url, endpoint, question, f"bench-warmup-{i}")
+
+        levels = []
+        for concurrency in (int(level) for level in args.concurrency.split(",")):
+            logging.info(f"⏱️ Concurrency {concurrency}: {len(QUERY_SET) * args.rounds} requests")
+            levels.append(run_level(base_url, concurrency, args.rounds))
+        print_report(levels)
+
+        if args.json_path:
+            config = {key: value for key, value in vars(args).items() if key != "json_path"}
+            with open(args.json_path, "w") as f:
+                json.dump({"config": config, "llm_requests": fake.requests_served, "levels": levels}, f, indent=2)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=60)
+        if temp_workdir is not None:
+            shutil.rmtree(temp_workdir, ignore_errors=True)
+        fake.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# ✅ Multi-process serving: gunicorn -c gunicorn.conf.py api.main:app
+#
+# The app is imported once in the master and the embedding model is loaded there before the workers
+# are forked, so its weights are shared copy-on-write. With more than one worker the Chroma collection
+# is served by a single `chroma run` process that every worker talks to; corpus writes (/upload-doc,
+# /delete-doc, /data ingestion) are serialized across workers by api/corpus_sync.py.
+import os
+import shutil
+import subprocess
+import time
+import urllib.request
+
+workers = int(os.getenv("OKOO_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Read by the app: per-process caches that can go stale check the shared database when this is > 1
+os.environ["OKOO_WORKERS"] = str(workers)
+# ✅ OKOO_LLM_CONCURRENCY and OKOO_LLM_QUEUE_SIZE are budgets for the one Ollama host; each worker runs
+# its own scheduler, so it gets an equal share (at least 1). The totals are kept in OKOO_LLM_TOTAL_*
+# so reloading this file does not split them again
+for _setting, _default in (("CONCURRENCY", "2"), ("QUEUE_SIZE", "32")):
+    _total = int(os.environ.setdefault(f"OKOO_LLM_TOTAL_{_setting}", os.getenv(f"OKOO_LLM_{_setting}", _default)))
+    os.environ[f"OKOO_LLM_{_setting}"] = str(max(1, _total // workers))
+# Tokenizer thread pools do not survive a fork
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("OKOO_WORKER_TIMEOUT", "180"))
+graceful_timeout = 30
+
+# Same directory as api.vector_store.CHROMA_DIR (not imported here: it reads OKOO_CHROMA_HOST at import)
+CHROMA_DIR = "./chroma_db"
+INDEX_SERVER_TIMEOUT = float(os.getenv("OKOO_CHROMA_START_TIMEOUT", "60"))
+
+_index_server = None
+
+# ✅ Start the shared Chroma server unless one is configured; runs when the config is loaded, before
+# the app is preloaded, so every module sees OKOO_CHROMA_HOST
+def _start_index_server() -> None:
+    global _index_server
+    port = os.environ.setdefault("OKOO_CHROMA_PORT", "8001")
+    _index_server = subprocess.Popen(
+        [shutil.which("chroma") or "chroma", "run", "--path", CHROMA_DIR, "--host", "127.0.0.1", "--port", port],
+        stdout=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + INDEX_SERVER_TIMEOUT
+    while time.monotonic() < deadline:
+        if _index_server.poll() is not None:
+            raise RuntimeError(f"Chroma server exited with code {_index_server.returncode}")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/api/v2/heartbeat", timeout=1)
+            os.environ["OKOO_CHROMA_HOST"] = "127.0.0.1"
+            return
+        except OSError:
+            time.sleep(0.25)
+    _index_server.terminate()
+    raise RuntimeError(f"Chroma server did not answer on port {port} within {INDEX_SERVER_TIMEOUT:.0f}s")
+
+if workers > 1 and not os.getenv("OKOO_CHROMA_HOST"):
+    _start_index_server()
+
+# ✅ Load the embedding model in the master so the workers share it
+def when_ready(server):
+    from api.vector_store import get_embedding_model
+    get_embedding_model()
+    server.log.info("Embedding model loaded before forking workers")
+
+def on_exit(server):
+    if _index_server is not None and _index_server.poll() is None:
+        _index_server.terminate()
+        try:
+            _index_server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            _index_server.kill()
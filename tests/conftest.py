@@ -0,0 +1,18 @@
+import os
+import sys
+import tempfile
+import pytest
+
+# ✅ Tests import api/ from the checkout but run in a scratch directory, so they never touch the
+# checkout's rag_app.db, chroma_db/ or app.log
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(tempfile.mkdtemp(prefix="okoo_tests_"))
+
+# ✅ Deterministic stand-in for MiniLM so tests that write to the scratch Chroma collection
+# don't download or load a model
+@pytest.fixture(scope="session")
+def fake_embeddings():
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from api import vector_store
+    vector_store._embedding_model = DeterministicFakeEmbedding(size=64)
+    return vector_store._embedding_model
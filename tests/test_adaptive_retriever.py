@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+from langchain_core.documents import Document
+from api import adaptive_retriever
+from api.adaptive_retriever import HybridRetriever, reciprocal_rank_fusion
+
+def test_fusion_orders_by_summed_reciprocal_rank():
+    positions, scores = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a", "d"]], [1.0, 1.0], rrf_k=60, top_k=10)
+    pool = ["a", "b", "c", "c", "a", "d"]
+    assert [pool[p] for p in positions] == ["a", "c", "b", "d"]
+    assert scores[0] == 1 / 61 + 1 / 62
+    assert list(scores) == sorted(scores, reverse=True)
+
+def test_fusion_returns_first_occurrence_of_each_id():
+    positions, _ = reciprocal_rank_fusion([["a", "b"], ["b", "c"]], [1.0, 1.0], rrf_k=60, top_k=10)
+    assert sorted(positions) == [0, 1, 3]
+
+def test_fusion_ties_keep_first_seen_order():
+    positions, scores = reciprocal_rank_fusion([["x", "y"], ["y", "x"]], [1.0, 1.0], rrf_k=60, top_k=10)
+    assert scores[0] == scores[1]
+    assert list(positions) == [0, 1]
+
+def test_fusion_applies_weights_and_top_k():
+    positions, _ = reciprocal_rank_fusion([["a", "b"], ["c", "d"]], [1.0, 2.0], rrf_k=60, top_k=3)
+    pool = ["a", "b", "c", "d"]
+    assert [pool[p] for p in positions] == ["c", "d", "a"]
+
+def test_fusion_of_empty_lists_is_empty():
+    positions, scores = reciprocal_rank_fusion([[], []], [1.0, 1.0])
+    assert len(positions) == 0 and len(scores) == 0
+
+def test_dense_threshold_filters_only_the_dense_leg(monkeypatch):
+    docs = {chunk_id: Document(id=chunk_id, page_content=chunk_id) for chunk_id in ("lex", "close", "far")}
+    index = SimpleNamespace(
+        search=lambda query, k, allowed=None: [("lex", 1.0), ("far", 0.5)],
+        get_documents=lambda ids: [docs[chunk_id] for chunk_id in ids]
+    )
+    monkeypatch.setattr(adaptive_retriever, "get_bm25_index", lambda: index)
+    monkeypatch.setattr(adaptive_retriever, "dense_search", lambda query, k, where=None: [
+        ("close", docs["close"], 0.9), ("far", docs["far"], 0.4)
+    ])
+    assert [doc.id for doc in HybridRetriever().invoke("compare hotels")] == ["far", "lex", "close"]
+    # "far" is still found by BM25, it only loses its dense rank
+    assert [doc.id for doc in HybridRetriever(dense_threshold=0.7).invoke("compare hotels")] == ["lex", "close", "far"]
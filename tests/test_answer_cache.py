@@ -0,0 +1,45 @@
+import numpy as np
+from api.answer_cache import SemanticAnswerCache
+
+def _unit(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+def test_near_duplicate_query_hits_within_its_scope():
+    cache = SemanticAnswerCache(similarity_threshold=0.95)
+    cache.store(_unit(1, 0, 0), "qwen", "explore_place", "Lalibela answer", "sources", cache.corpus_version)
+
+    hit = cache.lookup(_unit(1, 0.1, 0), "qwen", "explore_place")
+    assert hit["answer"] == "Lalibela answer" and hit["similarity"] >= 0.95
+    assert cache.lookup(_unit(1, 0.1, 0), "qwen", "plan_trip") is None
+    assert cache.lookup(_unit(1, 0.1, 0), "llama", "explore_place") is None
+    assert cache.lookup(_unit(0, 1, 0), "qwen", "explore_place") is None
+    assert (cache.hits, cache.misses) == (1, 3)
+
+def test_invalidate_clears_entries_and_bumps_corpus_version():
+    cache = SemanticAnswerCache()
+    version = cache.corpus_version
+    cache.store(_unit(1, 0), "qwen", "plan_trip", "answer", "sources", version)
+    cache.invalidate()
+    assert cache.corpus_version == version + 1
+    assert cache.lookup(_unit(1, 0), "qwen", "plan_trip") is None
+    assert cache.stats()["entries"] == 0
+
+def test_answer_computed_before_an_invalidation_is_not_stored():
+    cache = SemanticAnswerCache()
+    version = cache.corpus_version
+    cache.invalidate()
+    cache.store(_unit(1, 0), "qwen", "plan_trip", "stale answer", "sources", version)
+    assert cache.lookup(_unit(1, 0), "qwen", "plan_trip") is None
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticAnswerCache(max_entries=2)
+    for position, axis in enumerate((_unit(1, 0, 0), _unit(0, 1, 0), _unit(0, 0, 1))):
+        if position == 2:
+            # Touch the first entry so the second one is the oldest
+            assert cache.lookup(_unit(1, 0, 0), "qwen", "compare_hotels") is not None
+        cache.store(axis, "qwen", "compare_hotels", f"answer {position}", "sources", cache.corpus_version)
+    assert cache.evictions == 1
+    assert cache.lookup(_unit(0, 1, 0), "qwen", "compare_hotels") is None
+    assert cache.lookup(_unit(1, 0, 0), "qwen", "compare_hotels")["answer"] == "answer 0"
+    assert cache.lookup(_unit(0, 0, 1), "qwen", "compare_hotels")["answer"] == "answer 2"
@@ -0,0 +1,46 @@
+from api.bm25_index import BM25Index
+
+def _index():
+    index = BM25Index()
+    index.add(
+        ["lalibela", "gondar", "simien"],
+        [
+            "Lalibela is famous for its rock-hewn churches carved from a single block",
+            "Gondar has the royal castles of Fasil Ghebbi",
+            "Trekking in the Simien Mountains passes gelada baboons and deep valleys"
+        ],
+        [{"filename": "lalibela.pdf"}, {"filename": "gondar.pdf"}, None]
+    )
+    return index
+
+def test_search_ranks_matching_chunk_first():
+    hits = _index().search("rock-hewn churches of Lalibela", k=2)
+    assert hits[0][0] == "lalibela"
+    assert all(chunk_id != "simien" for chunk_id, _ in hits)
+
+def test_remove_drops_chunk_and_its_terms():
+    index = _index()
+    index.remove(["lalibela", "missing"])
+    assert len(index) == 2
+    assert index.search("churches") == []
+    assert [chunk_id for chunk_id, _ in index.search("castles")] == ["gondar"]
+
+def test_adding_an_existing_id_replaces_it():
+    index = _index()
+    index.add(["gondar"], ["Bahir Dar sits on Lake Tana"], [{"filename": "tana.pdf"}])
+    assert len(index) == 3
+    assert index.search("castles") == []
+    assert [chunk_id for chunk_id, _ in index.search("Lake Tana")] == ["gondar"]
+
+def test_save_and_load_round_trip(tmp_path):
+    index = _index()
+    index.remove(["simien"])
+    path = str(tmp_path / "bm25_index.json")
+    index.save(path)
+
+    loaded = BM25Index.load(path)
+    assert len(loaded) == 2
+    assert loaded.search("royal castles Lalibela", k=5) == index.search("royal castles Lalibela", k=5)
+    [doc] = loaded.get_documents(["gondar"])
+    assert doc.page_content.startswith("Gondar has")
+    assert doc.metadata == {"filename": "gondar.pdf"}
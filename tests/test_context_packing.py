@@ -0,0 +1,64 @@
+from types import SimpleNamespace
+from langchain_core.documents import Document
+from api import groundedness
+from api.context_packing import MIN_PASSAGE_TOKENS, estimate_tokens, merge_neighbours, pack_context, passage_chunk_ids
+
+def _doc(doc_id, source, text):
+    return Document(id=doc_id, page_content=text, metadata={"source": source})
+
+# A passage of exactly `tokens` estimated tokens whose words share nothing with other prefixes
+def _passage(prefix, tokens):
+    return " ".join(f"{prefix}{n}" for n in range(tokens))[:tokens * 4]
+
+def test_neighbouring_chunks_are_joined_without_the_repeated_overlap():
+    text = _passage("omo", 150)
+    left, right = _doc("left", "omo.pdf", text[:400]), _doc("right", "omo.pdf", text[200:])
+    other = _doc("other", "konso.pdf", text[200:])
+    merged = merge_neighbours([right, other, left])
+    assert [doc.page_content for doc in merged] == [text, text[200:]]
+
+def test_packed_passages_keep_the_ids_of_their_chunks(monkeypatch):
+    text = _passage("omo", 150)
+    left, right = _doc("left", "omo.pdf", text[:400]), _doc("right", "omo.pdf", text[200:])
+    [merged] = merge_neighbours([right, left])
+    assert merged.id == "right" and passage_chunk_ids(merged) == ["left", "right"]
+
+    packed = pack_context([right, left], "test", budget=MIN_PASSAGE_TOKENS + 10)
+    assert packed.stats["truncated"] == 1
+    assert passage_chunk_ids(packed.documents[0]) == ["left", "right"]
+
+    # Groundedness reads the stored vectors of both chunks instead of embedding the passage again
+    stored = {"left": [1.0, 0.0], "right": [0.0, 1.0]}
+    collection = SimpleNamespace(get=lambda ids, include: {"ids": ids, "embeddings": [stored[i] for i in ids]})
+    monkeypatch.setattr(groundedness, "get_vectorstore", lambda: SimpleNamespace(_collection=collection))
+    monkeypatch.setattr(groundedness, "get_embedding_model", lambda: None)
+    assert groundedness._chunk_vectors(packed.documents).tolist() == [[1.0, 0.0], [0.0, 1.0]]
+
+def test_pack_context_keeps_whole_passages_within_budget():
+    docs = [_doc(prefix, f"{prefix}.pdf", _passage(prefix, 100)) for prefix in ("alpha", "beta", "gamma")]
+    assert all(estimate_tokens(doc.page_content) == 100 for doc in docs)
+
+    packed = pack_context(docs, "test", budget=300)
+    assert [doc.page_content for doc in packed.documents] == [doc.page_content for doc in docs]
+    assert packed.tokens == 300
+
+    packed = pack_context(docs, "test", budget=250)
+    assert [doc.page_content for doc in packed.documents] == [docs[0].page_content, docs[1].page_content]
+    assert packed.tokens == 200
+    assert packed.stats["dropped"] == 1
+
+def test_pack_context_truncates_into_remaining_budget():
+    docs = [_doc(prefix, f"{prefix}.pdf", _passage(prefix, 100)) for prefix in ("alpha", "beta")]
+    budget = 100 + MIN_PASSAGE_TOKENS + 10
+    packed = pack_context(docs, "test", budget=budget)
+    assert len(packed.documents) == 2
+    assert packed.stats["truncated"] == 1
+    assert docs[1].page_content.startswith(packed.documents[1].page_content)
+    assert packed.tokens <= budget
+
+def test_pack_context_drops_near_duplicates():
+    text = _passage("delta", 50)
+    docs = [_doc("one", "one.pdf", text), _doc("two", "two.pdf", text)]
+    packed = pack_context(docs, "test", budget=1000)
+    assert len(packed.documents) == 1
+    assert packed.stats["duplicates"] == 1
@@ -0,0 +1,94 @@
+from api import corpus_sync, gazetteer
+from api.answer_cache import answer_cache
+from api.bm25_index import get_bm25_index
+from api.corpus_sync import CorpusBusy, corpus_changed, corpus_write_lock, read_corpus_version, sync_corpus
+from api.gazetteer import GAZETTEER_VERSION, backfill_place_tags, get_place_index, reload_place_index
+from api.vector_store import get_embedding_model, get_vectorstore
+import os
+import threading
+import pytest
+
+@pytest.fixture
+def reloads(monkeypatch):
+    calls = []
+    monkeypatch.setattr(corpus_sync, "reload_bm25_index", lambda: calls.append("bm25") or True)
+    monkeypatch.setattr(corpus_sync, "reload_place_index", lambda: calls.append("places"))
+    sync_corpus()
+    calls.clear()
+    return calls
+
+def test_nested_writes_publish_one_version_on_release(reloads):
+    version = read_corpus_version()
+    with corpus_write_lock():
+        with corpus_write_lock():
+            corpus_changed()
+        assert read_corpus_version() == version
+    assert read_corpus_version() == version + 1
+    with corpus_write_lock():
+        pass
+    assert read_corpus_version() == version + 1
+    # The writer's own version is not reloaded
+    assert not sync_corpus() and reloads == []
+
+def test_another_process_version_reloads_the_indexes_once(reloads):
+    cache_version, version = answer_cache.corpus_version, read_corpus_version() + 1
+    os.makedirs(os.path.dirname(corpus_sync.VERSION_PATH), exist_ok=True)
+    with open(corpus_sync.VERSION_PATH, "w", encoding="utf-8") as f:
+        f.write(str(version))
+    assert sync_corpus()
+    assert reloads == ["bm25", "places"]
+    assert answer_cache.corpus_version == cache_version + 1
+    assert not sync_corpus() and reloads == ["bm25", "places"]
+
+def test_request_waiting_for_a_busy_lock_gets_corpus_busy(reloads):
+    held, done = threading.Event(), threading.Event()
+    def writer():
+        with corpus_write_lock():
+            held.set()
+            done.wait(5)
+    thread = threading.Thread(target=writer)
+    thread.start()
+    held.wait(5)
+    try:
+        with pytest.raises(CorpusBusy) as busy:
+            with corpus_write_lock(timeout=0.05):
+                pass
+        assert busy.value.retry_after > 0
+    finally:
+        done.set()
+        thread.join(5)
+
+def test_reloading_the_place_index_only_reads(fake_embeddings):
+    collection = get_vectorstore()._collection
+    text = "Konso terraces and waga statues"
+    collection.upsert(
+        ids=["legacy-konso"], embeddings=get_embedding_model().embed_documents([text]),
+        documents=[text], metadatas=[{"filename": "konso.txt", "gazetteer_version": 0}]
+    )
+    get_place_index()
+    reload_place_index()
+    assert collection.get(ids=["legacy-konso"])["metadatas"][0] == {"filename": "konso.txt", "gazetteer_version": 0}
+    assert "legacy-konso" not in get_place_index().chunk_ids(["konso"])
+
+    with corpus_write_lock():
+        assert backfill_place_tags() == 1
+    meta = collection.get(ids=["legacy-konso"])["metadatas"][0]
+    assert meta["place_konso"] is True and meta["gazetteer_version"] == GAZETTEER_VERSION
+    # The writer's own index is updated in place
+    assert "legacy-konso" in gazetteer.get_place_index().chunk_ids(["konso"])
+    collection.delete(ids=["legacy-konso"])
+    get_place_index().remove(["legacy-konso"])
+
+def test_writer_catches_up_with_chroma_written_without_a_bm25_save(fake_embeddings):
+    # Another process's ingestion batch: stored in Chroma, BM25 file saved only when its job ends
+    bm25 = get_bm25_index()
+    collection = get_vectorstore()._collection
+    text = "Sof Omar caves along the Web River"
+    collection.upsert(ids=["other-process"], embeddings=get_embedding_model().embed_documents([text]), documents=[text])
+    assert len(bm25) == collection.count() - 1
+    with corpus_write_lock():
+        assert len(get_bm25_index()) == collection.count()
+        assert get_bm25_index().search("Sof Omar caves")[0][0] == "other-process"
+    collection.delete(ids=["other-process"])
+    with corpus_write_lock():
+        assert len(get_bm25_index()) == collection.count()
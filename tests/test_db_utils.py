@@ -0,0 +1,49 @@
+import sqlite3
+import pytest
+from api import db_utils
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "rag_app.db")
+    monkeypatch.setattr(db_utils, "DB_NAME", path)
+    previous = getattr(db_utils._local, "conn", None)
+    db_utils._local.conn = None
+    yield path
+    db_utils._local.conn.close()
+    db_utils._local.conn = previous
+
+def _user_version(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def test_fresh_database_gets_every_migration(db_path):
+    db_utils.migrate()
+    assert _user_version(db_path) == len(db_utils.MIGRATIONS)
+    conn = db_utils.get_db_connection()
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert "idx_application_logs_session_created" in indexes
+
+def test_database_from_before_migrations_is_upgraded_in_place(db_path):
+    with sqlite3.connect(db_path) as conn:
+        conn.executescript(db_utils.MIGRATIONS[0])
+        conn.execute("INSERT INTO application_logs (session_id, user_query, gpt_response, model) VALUES ('s', 'q', 'a', 'm')")
+    db_utils.migrate()
+    db_utils.migrate()
+    assert _user_version(db_path) == len(db_utils.MIGRATIONS)
+    assert db_utils.get_chat_history("s") == [{"role": "human", "content": "q"}, {"role": "ai", "content": "a"}]
+
+def test_session_history_is_an_index_seek_in_insertion_order(db_path):
+    db_utils.migrate()
+    for turn in range(3):
+        db_utils.insert_application_logs("s1", f"q{turn}", f"a{turn}", "m")
+        db_utils.insert_application_logs("s2", "other", "other", "m")
+    history = db_utils.get_chat_history("s1")
+    assert [message["content"] for message in history] == ["q0", "a0", "q1", "a1", "q2", "a2"]
+
+    plan = " ".join(row[-1] for row in db_utils.get_db_connection().execute(
+        "EXPLAIN QUERY PLAN SELECT user_query, gpt_response FROM application_logs WHERE session_id = ? ORDER BY created_at, id",
+        ("s1",)
+    ))
+    assert "idx_application_logs_session_created" in plan
+    assert "TEMP B-TREE" not in plan
@@ -0,0 +1,79 @@
+from langchain_core.documents import Document
+from api.bm25_index import get_bm25_index
+from api.db_utils import get_source_chunk_ids
+from api.dedup import (
+    SourceChunks, content_chunk_id, delete_doc_from_chroma, file_sha256, index_document_to_chroma, store_sources, upload_source
+)
+from api.vector_store import get_vectorstore
+
+SHARED = "The Blue Nile Falls are thirty minutes from Bahir Dar by road."
+
+def _upload(file_id, *texts):
+    splits = [Document(page_content=text, metadata={}) for text in texts]
+    return store_sources([SourceChunks(upload_source(file_id), f"dedup_{file_id}.pdf", file_id, f"sha-{file_id}", splits)])
+
+def _stored(chunk_id):
+    data = get_vectorstore().get(ids=[chunk_id], include=["metadatas"])
+    return data["metadatas"][0] if data["ids"] else None
+
+def test_identical_chunks_share_one_vector_until_the_last_owner_is_deleted(fake_embeddings):
+    assert _upload(9101, SHARED, "Tis Issat means smoking water.") == {"chunks": 2, "embedded": 2, "reused": 0}
+    # Whitespace and case differences still map to the stored vector
+    assert _upload(9102, "  the blue nile falls are thirty minutes\nfrom Bahir Dar by road. ", "Boats leave for the monasteries of Lake Tana at dawn.") == \
+        {"chunks": 2, "embedded": 1, "reused": 1}
+    shared_id = content_chunk_id(SHARED)
+    only_first = content_chunk_id("Tis Issat means smoking water.")
+    assert get_source_chunk_ids(upload_source(9102))[0] == shared_id
+
+    assert delete_doc_from_chroma(9101)
+    assert _stored(only_first) is None
+    assert get_bm25_index().get_documents([only_first]) == []
+    # The surviving chunk now belongs to the remaining upload
+    assert _stored(shared_id)["file_id"] == 9102
+
+    assert delete_doc_from_chroma(9102)
+    assert _stored(shared_id) is None
+    assert get_bm25_index().get_documents([shared_id]) == []
+
+def test_byte_identical_document_links_without_embedding(fake_embeddings, tmp_path, monkeypatch):
+    original = tmp_path / "dedup_aksum.csv"
+    original.write_text("place,note\nAksum,Stelae field and the Queen of Sheba palace\n")
+    copy = tmp_path / "dedup_aksum_copy.csv"
+    copy.write_bytes(original.read_bytes())
+    assert file_sha256(str(original)) == file_sha256(str(copy))
+
+    assert index_document_to_chroma(str(original), 9201, "dedup_aksum.csv")
+    calls = []
+    embed = type(fake_embeddings).embed_documents
+    monkeypatch.setattr(type(fake_embeddings), "embed_documents", lambda self, texts: calls.append(texts) or embed(self, texts))
+    assert index_document_to_chroma(str(copy), 9202, "dedup_aksum_copy.csv")
+    assert calls == []
+    [chunk_id] = get_source_chunk_ids(upload_source(9201))
+    assert get_source_chunk_ids(upload_source(9202)) == [chunk_id]
+
+    assert delete_doc_from_chroma(9201)
+    assert _stored(chunk_id)["file_id"] == 9202
+    assert delete_doc_from_chroma(9202)
+    assert _stored(chunk_id) is None
+
+FILLER = (
+    "Additional practical detail for {place}: verify current conditions, respect access permissions, and plan "
+    "conservatively. Roads are slower than they look on the map, so plan by time rather than distance and watch "
+    "for livestock and pedestrians. In religious spaces dress modestly and follow posted guidance. Photography "
+    "remains welcome in most outdoor contexts, but always ask before portraits."
+)
+
+def test_near_duplicate_chunks_link_to_the_stored_one(fake_embeddings):
+    first = FILLER.format(place="Konso")
+    assert _upload(9301, first) == {"chunks": 1, "embedded": 1, "reused": 0}
+    # The same paragraph cut a few words later links to the stored chunk
+    assert _upload(9302, first + " Carry small notes for markets.") == {"chunks": 1, "embedded": 0, "reused": 1}
+    assert get_source_chunk_ids(upload_source(9302)) == [content_chunk_id(first)]
+    # The template filled in for another place stays a separate chunk
+    assert _upload(9303, FILLER.format(place="Jinka")) == {"chunks": 1, "embedded": 1, "reused": 0}
+
+    assert delete_doc_from_chroma(9301)
+    assert _stored(content_chunk_id(first))["file_id"] == 9302
+    for file_id in (9302, 9303):
+        assert delete_doc_from_chroma(file_id)
+    assert _stored(content_chunk_id(first)) is None
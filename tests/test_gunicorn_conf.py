@@ -0,0 +1,56 @@
+from api.llm_scheduler import PRIORITY_INTERACTIVE, LLMScheduler
+import os
+import runpy
+import threading
+import time
+import pytest
+
+CONF_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gunicorn.conf.py")
+
+def _load_conf(monkeypatch, workers, **settings):
+    for key in ("OKOO_LLM_CONCURRENCY", "OKOO_LLM_QUEUE_SIZE", "OKOO_LLM_TOTAL_CONCURRENCY",
+                "OKOO_LLM_TOTAL_QUEUE_SIZE", "TOKENIZERS_PARALLELISM"):
+        monkeypatch.delenv(key, raising=False)
+    # A configured Chroma host keeps the config from starting its own server
+    monkeypatch.setenv("OKOO_CHROMA_HOST", "127.0.0.1")
+    monkeypatch.setenv("OKOO_WORKERS", str(workers))
+    for key, value in settings.items():
+        monkeypatch.setenv(key, str(value))
+    runpy.run_path(CONF_PATH)
+    return int(os.environ["OKOO_LLM_CONCURRENCY"]), int(os.environ["OKOO_LLM_QUEUE_SIZE"])
+
+@pytest.mark.parametrize("workers, total, expected", [(1, 2, (2, 32)), (2, 4, (2, 16)), (4, 2, (1, 8)), (8, 2, (1, 4))])
+def test_llm_budget_is_split_across_workers_with_at_least_one_slot(monkeypatch, workers, total, expected):
+    assert _load_conf(monkeypatch, workers, OKOO_LLM_CONCURRENCY=total) == expected
+    # Reloading the config does not split the totals again
+    runpy.run_path(CONF_PATH)
+    assert (int(os.environ["OKOO_LLM_CONCURRENCY"]), int(os.environ["OKOO_LLM_QUEUE_SIZE"])) == expected
+
+def test_a_single_busy_worker_serves_a_burst_of_its_share(monkeypatch):
+    # 4 workers share 2 Ollama slots and a queue of 32: one worker gets 1 slot and 8 queued callers.
+    # When all the traffic lands on that worker, its burst is still served in full, one call at a time.
+    concurrency, queue_size = _load_conf(monkeypatch, 4, OKOO_LLM_CONCURRENCY=2, OKOO_LLM_QUEUE_SIZE=32)
+    scheduler = LLMScheduler(concurrency=concurrency, queue_size=queue_size)
+    hold = 0.02
+    served, peak, lock = [], [0], threading.Lock()
+
+    def call(i):
+        with scheduler.slot(PRIORITY_INTERACTIVE, time.monotonic() + 10):
+            with lock:
+                peak[0] = max(peak[0], scheduler.active)
+            time.sleep(hold)
+            served.append(i)
+
+    burst = concurrency + queue_size
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(burst)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    elapsed = time.monotonic() - started
+
+    assert sorted(served) == list(range(burst))
+    assert sum(scheduler.rejected.values()) == 0
+    assert peak[0] == concurrency
+    assert elapsed < burst * hold * 5
@@ -0,0 +1,91 @@
+from concurrent.futures import ThreadPoolExecutor
+from api import ingestion
+from api.bm25_index import INDEX_PATH, BM25Index, get_bm25_index
+from api.bootstrap import preload_documents
+from api.corpus_sync import corpus_write_lock, read_corpus_version
+from api.place_cards import place_cards
+from api.vector_store import get_vectorstore
+import pytest
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch, fake_embeddings):
+    monkeypatch.setattr(ingestion, "MANIFEST_PATH", str(tmp_path / "ingest_manifest.json"))
+    # Parse on threads so the test can see which files were parsed
+    monkeypatch.setattr(ingestion, "ProcessPoolExecutor", lambda max_workers, mp_context: ThreadPoolExecutor(max_workers))
+    parsed = []
+    parse_file = ingestion._parse_file
+    monkeypatch.setattr(ingestion, "_parse_file", lambda path: parsed.append(path.rsplit("/", 1)[-1]) or parse_file(path))
+    directory = tmp_path / "data"
+    directory.mkdir()
+    (directory / "manifest_harar.csv").write_text("place,note\nHarar,Walled city with hyena feeding at night\n")
+    (directory / "manifest_konso.csv").write_text("place,note\nKonso,Stone terraces and carved wooden waka\n")
+    return directory, parsed
+
+def _chunks(filename):
+    return get_vectorstore().get(where={"filename": filename}, include=["documents"])["documents"]
+
+def test_unchanged_files_are_skipped_on_the_next_run(data_dir):
+    directory, parsed = data_dir
+    assert ingestion.ingest_directory(str(directory))["indexed"] == 2
+    assert sorted(parsed) == ["manifest_harar.csv", "manifest_konso.csv"]
+    assert all(entry["status"] == "done" for entry in ingestion.load_manifest().values())
+
+    parsed.clear()
+    summary = ingestion.ingest_directory(str(directory))
+    assert (summary["indexed"], summary["skipped"]) == (0, 2)
+    assert parsed == []
+
+def test_changed_and_removed_files_are_reindexed_and_dropped(data_dir):
+    directory, parsed = data_dir
+    ingestion.ingest_directory(str(directory))
+    parsed.clear()
+
+    (directory / "manifest_harar.csv").write_text("place,note\nHarar,Coffee houses in the old Jugol\n")
+    (directory / "manifest_konso.csv").unlink()
+    summary = ingestion.ingest_directory(str(directory))
+    assert (summary["indexed"], summary["skipped"], summary["removed"]) == (1, 0, 1)
+    assert parsed == ["manifest_harar.csv"]
+    assert ["Jugol" in text for text in _chunks("manifest_harar.csv")] == [True]
+    assert _chunks("manifest_konso.csv") == []
+    assert set(ingestion.load_manifest()) == {"manifest_harar.csv"}
+
+def test_file_interrupted_mid_write_is_indexed_again(data_dir):
+    directory, parsed = data_dir
+    ingestion.ingest_directory(str(directory))
+    parsed.clear()
+
+    manifest = ingestion.load_manifest()
+    manifest["manifest_konso.csv"]["status"] = "indexing"
+    ingestion.save_manifest(manifest)
+    summary = ingestion.ingest_directory(str(directory))
+    assert (summary["indexed"], summary["skipped"]) == (1, 1)
+    assert parsed == ["manifest_konso.csv"]
+    assert len(_chunks("manifest_konso.csv")) == 1
+
+def test_files_are_parsed_without_holding_the_write_lock(data_dir, monkeypatch):
+    directory, parsed = data_dir
+    parse_file = ingestion._parse_file
+    def parse_while_writing(path):
+        # An upload or delete in another thread gets the lock while ingestion parses
+        with corpus_write_lock(timeout=0.5):
+            pass
+        return parse_file(path)
+    monkeypatch.setattr(ingestion, "_parse_file", parse_while_writing)
+    monkeypatch.setattr(place_cards, "schedule_refresh", lambda: None)
+    summary = preload_documents(data_dir=str(directory))
+    assert (summary["indexed"], summary["failed"]) == (2, 0)
+    assert sorted(parsed) == ["manifest_harar.csv", "manifest_konso.csv"]
+
+def test_bm25_index_is_saved_once_per_ingest_job(data_dir, monkeypatch):
+    directory, _ = data_dir
+    get_bm25_index()
+    saves = []
+    save = BM25Index.save
+    monkeypatch.setattr(BM25Index, "save", lambda self, *args: saves.append(len(self)) or save(self, *args))
+    # One write batch per file
+    monkeypatch.setattr(ingestion, "EMBED_BATCH_SIZE", 1)
+    version = read_corpus_version()
+
+    assert ingestion.ingest_directory(str(directory))["indexed"] == 2
+    assert len(saves) == 1 and read_corpus_version() == version + 1
+    assert len(BM25Index.load(INDEX_PATH)) == get_vectorstore()._collection.count()
@@ -0,0 +1,78 @@
+from api.intent_classifier import INTENT_MAP, classify_batch, classify_intent, classify_intent_with_confidence
+import pytest
+
+# The classifier this one replaced: substring checks, first intent in map order wins
+_BASELINE_MAP = {
+    "ask_fact": ["who", "what", "when", "where", "how", "fact", "information", "tell me", "question", "history", "details", "background"],
+    "plan_trip": ["plan", "trip", "itinerary", "travel", "schedule", "days", "visit", "route", "journey", "vacation", "holiday"],
+    "compare_hotels": ["compare", "hotel", "hotels", "accommodation", "stay", "price", "rating", "location", "amenities"],
+    "explore_place": ["explore", "location", "place", "overview", "learn about", "discover", "attractions", "things to do", "sights"]
+}
+
+def _baseline_classify(query):
+    query = query.lower()
+    for intent, keywords in _BASELINE_MAP.items():
+        if any(keyword in query for keyword in keywords):
+            return intent
+    return "unsupported"
+
+# Queries both classifiers must route the same way
+PARITY = [
+    ("Plan a 5 day trip to Gondar", "plan_trip"),
+    ("Itinerary for the Simien Mountains", "plan_trip"),
+    ("schedule for 3 days in Omo valley", "plan_trip"),
+    ("Compare hotels in Bahir Dar", "compare_hotels"),
+    ("Which hotels have the best rating in Addis?", "compare_hotels"),
+    ("Recommend accommodation near Lake Tana", "compare_hotels"),
+    ("Explore Harar", "explore_place"),
+    ("Things to do in Arba Minch", "explore_place"),
+    ("Give me an overview of the Danakil Depression", "explore_place"),
+    ("Discover Konso", "explore_place"),
+    ("Tell me about the history of Aksum", "ask_fact"),
+    ("Who built the castles of Gondar?", "ask_fact"),
+    ("Hello there", "unsupported"),
+]
+
+# Where the baseline was wrong: substring hits inside other words and map order beating stronger evidence
+FIXED = [
+    ("Show me the sights of Harar", "ask_fact", "explore_place"),
+    ("Where should I stay in Lalibela", "ask_fact", "compare_hotels"),
+    ("Are the planes to Gondar on time", "plan_trip", "unsupported"),
+    ("Cultural shows in Addis", "ask_fact", "unsupported"),
+    ("Itineraries for Tigray", "unsupported", "plan_trip"),
+]
+
+@pytest.mark.parametrize("query,intent", PARITY)
+def test_matches_the_baseline_classifier(query, intent):
+    assert _baseline_classify(query) == intent
+    assert classify_intent(query) == intent
+
+# Every keyword, singular or listed plural, routes where the baseline sent it ("itineraries" is
+# the one plural the baseline's substring checks missed, see FIXED)
+KEYWORDS = sorted({keyword for keywords in INTENT_MAP.values() for keyword in keywords} - {"itineraries"})
+
+@pytest.mark.parametrize("keyword", KEYWORDS)
+def test_each_keyword_matches_the_baseline(keyword):
+    query = f"{keyword.capitalize()} in Gondar"
+    assert classify_intent(query) == _baseline_classify(query)
+
+@pytest.mark.parametrize("query,baseline,intent", FIXED)
+def test_fixes_baseline_misroutes(query, baseline, intent):
+    assert _baseline_classify(query) == baseline
+    assert classify_intent(query) == intent
+
+def _confidence(query):
+    intent, confidence = classify_intent_with_confidence(query)
+    return intent, round(confidence, 3)
+
+def test_confidence_grows_with_evidence_and_shrinks_with_competition():
+    assert classify_intent_with_confidence("Hello there") == ("unsupported", 0.0)
+    # A single intent is not certain on one keyword
+    assert _confidence("Hotels in Bahir Dar") == ("compare_hotels", 0.5)
+    assert _confidence("Compare hotels in Bahir Dar") == ("compare_hotels", 0.667)
+    # "where" counts half against a full "stay"
+    assert _confidence("Where should I stay in Lalibela") == ("compare_hotels", 0.4)
+
+def test_batch_matches_single_queries():
+    queries = [query for query, _ in PARITY]
+    assert classify_batch(queries) == [classify_intent_with_confidence(query) for query in queries]
@@ -0,0 +1,60 @@
+from api.llm_scheduler import PRIORITY_BATCH, PRIORITY_INTERACTIVE, LLMScheduler, SchedulerRejected
+import threading
+import time
+import pytest
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+def _queue(scheduler, priority, served, name):
+    def run():
+        with scheduler.slot(priority, time.monotonic() + 5):
+            served.append(name)
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+def test_interactive_callers_are_served_before_batch_ones():
+    scheduler = LLMScheduler(concurrency=1, queue_size=4)
+    served = []
+    scheduler.acquire(PRIORITY_BATCH, time.monotonic() + 5)
+    threads = []
+    for priority, name in ((PRIORITY_BATCH, "batch-1"), (PRIORITY_INTERACTIVE, "interactive"), (PRIORITY_BATCH, "batch-2")):
+        threads.append(_queue(scheduler, priority, served, name))
+        _wait_for(lambda: scheduler.queued == len(threads))
+    scheduler.release(0.1)
+    for thread in threads:
+        thread.join(5)
+    assert served == ["interactive", "batch-1", "batch-2"]
+    assert scheduler.stats()["active"] == 0 and scheduler.completed == 4
+
+def test_full_queue_rejects_at_once():
+    scheduler = LLMScheduler(concurrency=1, queue_size=1)
+    served = []
+    scheduler.acquire(PRIORITY_INTERACTIVE, time.monotonic() + 5)
+    thread = _queue(scheduler, PRIORITY_INTERACTIVE, served, "queued")
+    _wait_for(lambda: scheduler.queued == 1)
+
+    started = time.monotonic()
+    with pytest.raises(SchedulerRejected) as rejected:
+        scheduler.acquire(PRIORITY_INTERACTIVE, time.monotonic() + 5)
+    assert time.monotonic() - started < 1
+    assert rejected.value.reason == "queue_full" and rejected.value.retry_after >= 1
+
+    scheduler.release(0.1)
+    thread.join(5)
+    assert served == ["queued"]
+
+def test_waiter_past_its_deadline_gives_up_its_place():
+    scheduler = LLMScheduler(concurrency=1, queue_size=4)
+    scheduler.acquire(PRIORITY_BATCH, time.monotonic() + 5)
+    with pytest.raises(SchedulerRejected) as rejected:
+        scheduler.acquire(PRIORITY_INTERACTIVE, time.monotonic() + 0.05)
+    assert rejected.value.reason == "deadline"
+    assert scheduler.queued == 0
+    # The slot goes back to the pool instead of to the cancelled waiter
+    scheduler.release(0.1)
+    assert scheduler.active == 0
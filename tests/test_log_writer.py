@@ -0,0 +1,25 @@
+from concurrent.futures import ThreadPoolExecutor
+from api import log_writer
+from api.log_writer import ChatLogWriter
+import threading
+
+def test_counters_add_up_under_concurrent_submits(monkeypatch):
+    release = threading.Event()
+    written = []
+    def insert(rows):
+        release.wait(5)
+        written.extend(rows)
+    monkeypatch.setattr(log_writer, "insert_application_logs_batch", insert)
+    writer = ChatLogWriter(max_queue=4, batch_size=2, flush_interval=0.01)
+
+    def submit_many(worker):
+        return sum(writer.submit(f"session-{worker}", f"question {n}", "answer", "qwen") for n in range(500))
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        accepted = sum(pool.map(submit_many, range(8)))
+    release.set()
+    writer.stop()
+
+    stats = writer.stats()
+    assert accepted + stats["dropped"] == 8 * 500
+    assert stats["written"] == len(written) == accepted
+    assert stats["failed"] == 0
@@ -0,0 +1,37 @@
+from langchain_core.documents import Document
+from api.planner_node import LOGISTICS_CHUNKS, PER_DESTINATION_CHUNKS, merge_with_quota, plan_sub_queries
+
+def _doc(doc_id):
+    return Document(id=doc_id, page_content=f"text of {doc_id}")
+
+def test_one_sub_query_per_destination_plus_logistics():
+    sub_queries = plan_sub_queries("10 days Lalibela and Gondar", ["lalibela", "gondar"])
+    assert [(places, quota) for _, places, quota in sub_queries] == [
+        (["lalibela"], PER_DESTINATION_CHUNKS), (["gondar"], PER_DESTINATION_CHUNKS), ([], LOGISTICS_CHUNKS)
+    ]
+    assert sub_queries[0][0].startswith("Lalibela") and sub_queries[1][0].startswith("Gondar")
+    assert sub_queries[-1][0].endswith("10 days Lalibela and Gondar")
+
+def test_destination_sub_queries_keep_the_request_without_the_other_places():
+    query = "10 days in Lalibela, Gondar and the Simien Mountains with festivals and hiking"
+    sub_queries = plan_sub_queries(query, ["lalibela", "gondar", "simien"])
+    assert sub_queries[0][0].startswith("Lalibela: 10 days in Lalibela with festivals and hiking.")
+    assert sub_queries[1][0].startswith("Gondar: 10 days in Gondar with festivals and hiking.")
+    assert sub_queries[2][0].startswith("Simien Mountains: 10 days in the Simien Mountains with festivals and hiking.")
+
+def test_quota_merge_interleaves_by_rank():
+    results = [
+        [_doc("a1"), _doc("a2"), _doc("a3")],
+        [_doc("b1"), _doc("b2")],
+        [_doc("c1"), _doc("c2"), _doc("c3")]
+    ]
+    merged = merge_with_quota(results, [2, 2, 1])
+    assert [doc.id for doc in merged] == ["a1", "b1", "c1", "a2", "b2"]
+
+def test_quota_merge_skips_short_lists_and_duplicates():
+    results = [[_doc("a1"), _doc("shared")], [_doc("shared")], [Document(page_content="no id"), Document(page_content="no id")]]
+    merged = merge_with_quota(results, [3, 3, 3])
+    assert [doc.id or doc.page_content for doc in merged] == ["a1", "shared", "no id"]
+
+def test_quota_merge_without_quotas_is_empty():
+    assert merge_with_quota([], []) == []
@@ -0,0 +1,84 @@
+from fastapi.testclient import TestClient
+from api import main, readiness as readiness_module
+from api.readiness import CORE_STAGES, NotReady, Readiness
+import threading
+import time
+import pytest
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+def _steps(**overrides):
+    return [(name, overrides.get(name, lambda: None)) for name in CORE_STAGES + ("documents",)]
+
+def _status(readiness, name):
+    return readiness.report()["stages"][name]["status"]
+
+@pytest.fixture
+def client(monkeypatch):
+    readiness = Readiness()
+    monkeypatch.setattr(main, "readiness", readiness)
+    return TestClient(main.app), readiness
+
+def test_queries_wait_for_the_core_stages_and_ready_for_documents(client):
+    client, readiness = client
+    index_loaded, documents_loaded = threading.Event(), threading.Event()
+    readiness.start(_steps(bm25_index=lambda: index_loaded.wait(5), documents=lambda: documents_loaded.wait(5)))
+
+    _wait_for(lambda: _status(readiness, "bm25_index") == "running")
+    with pytest.raises(NotReady) as not_ready:
+        readiness.require_serving()
+    assert not_ready.value.stage == "bm25_index"
+    response = client.get("/ready")
+    assert response.status_code == 503 and response.json()["status"] == "warming_up"
+    assert client.get("/ping").status_code == 200
+
+    index_loaded.set()
+    _wait_for(lambda: readiness.serving)
+    readiness.require_serving()
+    assert client.get("/ready").status_code == 503
+
+    documents_loaded.set()
+    _wait_for(lambda: readiness.ready)
+    response = client.get("/ready")
+    assert response.status_code == 200 and response.json()["status"] == "ready"
+
+def test_failed_indexing_leaves_the_service_degraded_but_serving():
+    readiness = Readiness()
+    def fail():
+        raise RuntimeError("corrupt PDF")
+    readiness.start(_steps(documents=fail))
+    _wait_for(lambda: _status(readiness, "documents") == "failed")
+    report = readiness.report()
+    assert (report["status"], report["ready"]) == ("degraded", True)
+    assert report["stages"]["documents"]["error"] == "corrupt PDF"
+    readiness.require_serving()
+
+def test_failed_core_stage_is_retried_with_backoff(monkeypatch):
+    monkeypatch.setattr(readiness_module, "RETRY_BACKOFF_SECONDS", 0.01)
+    attempts = []
+    def flaky():
+        attempts.append(time.monotonic())
+        if len(attempts) < 3:
+            raise ConnectionError("Chroma server not up yet")
+    readiness = Readiness()
+    readiness.start(_steps(vector_store=flaky))
+    _wait_for(lambda: readiness.ready)
+    assert len(attempts) == 3
+    assert readiness.report()["stages"]["vector_store"]["error"] is None
+
+def test_ping_fails_once_a_core_stage_gives_up(client, monkeypatch):
+    client, readiness = client
+    monkeypatch.setattr(readiness_module, "CORE_STAGE_RETRIES", 1)
+    monkeypatch.setattr(readiness_module, "RETRY_BACKOFF_SECONDS", 0.01)
+    def fail():
+        raise ConnectionError("Chroma server unreachable")
+    readiness.start(_steps(vector_store=fail))
+    _wait_for(lambda: _status(readiness, "vector_store") == "failed")
+    assert _status(readiness, "bm25_index") == "skipped"
+    response = client.get("/ping")
+    assert response.status_code == 503 and response.json()["status"] == "failed"
+    assert client.get("/ready").json()["status"] == "failed"
@@ -0,0 +1,94 @@
+from langchain_core.runnables import RunnableLambda
+from api import session_memory as session_memory_module
+from api.db_utils import get_session_summary, insert_application_logs
+from api.session_memory import RECENT_TURNS, SUMMARY_EVERY, SessionMemory
+import time
+import pytest
+
+@pytest.fixture
+def summarizer(monkeypatch):
+    calls = []
+    def summarize(inputs):
+        calls.append(inputs["turns"])
+        return f"{inputs['summary']} | {inputs['turns'].count('Traveller:')} turns"
+    monkeypatch.setattr(session_memory_module, "get_summary_chain", lambda model: RunnableLambda(summarize))
+    return calls
+
+def _settle(memory, session_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        with memory._lock:
+            if not memory._sessions[session_id].summarizing:
+                return
+        assert time.monotonic() < deadline, "summary did not finish"
+        time.sleep(0.01)
+
+# Turns as /chat runs them: history is read first, then the turn is added and logged
+def _chat(memory, session_id, turns):
+    for turn in range(turns):
+        memory.get_history(session_id, "qwen")
+        memory.add_turn(session_id, f"question {turn}", f"answer {turn}", "qwen")
+        insert_application_logs(session_id, f"question {turn}", f"answer {turn}", "qwen")
+        _settle(memory, session_id)
+
+def test_history_is_a_summary_plus_the_recent_window(summarizer):
+    memory = SessionMemory()
+    turns = RECENT_TURNS + 2 * SUMMARY_EVERY
+    _chat(memory, "memory-window", turns)
+
+    history = memory.get_history("memory-window", "qwen")
+    assert history[0]["role"] == "system" and "Summary of the earlier conversation" in history[0]["content"]
+    assert [message["content"] for message in history[1:]][::2] == [f"question {turn}" for turn in range(turns - RECENT_TURNS, turns)]
+    assert "question 0" in summarizer[0] and f"question {turns - RECENT_TURNS - 1}" in summarizer[-1]
+    assert get_session_summary("memory-window")["turns_summarized"] == turns - RECENT_TURNS
+
+def test_reloaded_session_resumes_after_the_summarized_turns(summarizer):
+    memory = SessionMemory()
+    _chat(memory, "memory-reload", RECENT_TURNS + SUMMARY_EVERY + 1)
+    expected = memory.get_history("memory-reload", "qwen")
+
+    # A restarted process rebuilds the same window from SQLite
+    reloaded = SessionMemory()
+    assert reloaded.get_history("memory-reload", "qwen") == expected
+    assert reloaded.misses == 1
+
+def test_a_dropped_log_row_does_not_shift_the_reloaded_window(summarizer):
+    memory = SessionMemory()
+    # The chat log writer dropped the first turn: it is summarized but was never logged
+    memory.add_turn("memory-dropped", "question lost", "answer lost", "qwen")
+    _chat(memory, "memory-dropped", RECENT_TURNS + SUMMARY_EVERY)
+    expected = memory.get_history("memory-dropped", "qwen")
+
+    # Two turns were folded, but only one of them is in the log
+    assert summarizer == ["Traveller: question lost\nAssistant: answer lost\nTraveller: question 0\nAssistant: answer 0"]
+    assert get_session_summary("memory-dropped")["turns_summarized"] == 2
+    reloaded = SessionMemory()
+    assert reloaded.get_history("memory-dropped", "qwen") == expected
+    # Turn 1 was not summarized, so it is still waiting for the next fold after the reload
+    assert reloaded._sessions["memory-dropped"].turns == memory._sessions["memory-dropped"].turns
+
+def test_failed_summary_falls_back_to_an_extract(monkeypatch):
+    def fail(inputs):
+        raise RuntimeError("LLM is busy")
+    monkeypatch.setattr(session_memory_module, "get_summary_chain", lambda model: RunnableLambda(fail))
+    memory = SessionMemory()
+    _chat(memory, "memory-fallback", RECENT_TURNS + SUMMARY_EVERY)
+    assert memory.fallback_summaries == 1
+    assert "The traveller asked: question 0; question 1" in memory.get_history("memory-fallback", "qwen")[0]["content"]
+
+def test_shared_session_checks_the_chat_log_at_most_once_per_interval(monkeypatch, summarizer):
+    monkeypatch.setattr(session_memory_module, "SHARED_SESSIONS", True)
+    monkeypatch.setattr(session_memory_module, "SHARED_SESSION_RECHECK_SECONDS", 60)
+    counted = []
+    count_chat_turns = session_memory_module.count_chat_turns
+    monkeypatch.setattr(session_memory_module, "count_chat_turns", lambda session_id, after_id=0: counted.append(session_id) or count_chat_turns(session_id, after_id))
+    memory = SessionMemory()
+    _chat(memory, "memory-shared", 2)
+    assert counted == []
+
+    # Another worker logs a turn; the next access after the interval reloads the session
+    insert_application_logs("memory-shared", "question elsewhere", "answer elsewhere", "qwen")
+    memory._sessions["memory-shared"].checked_at -= 60
+    history = memory.get_history("memory-shared", "qwen")
+    assert counted == ["memory-shared"]
+    assert history[-2]["content"] == "question elsewhere"
@@ -0,0 +1,20 @@
+from api import planner_node, tourism_graph
+from api.tourism_graph import prefetch_context, should_prefetch
+
+def test_unsupported_queries_skip_the_prefetch(monkeypatch):
+    def retriever(query, filter_places=False):
+        raise AssertionError("retrieval ran for an unsupported query")
+    monkeypatch.setattr(tourism_graph, "get_adaptive_retriever", retriever)
+    assert prefetch_context({"input": "Hello there"}) == {"retrieved": None}
+
+def test_planner_fan_outs_and_refusals_skip_the_prefetch(monkeypatch):
+    monkeypatch.setattr(planner_node, "query_places", lambda query: ["gondar", "lalibela"])
+    assert not should_prefetch("Plan a trip to Gondar and Lalibela")
+    monkeypatch.setattr(planner_node, "query_places", lambda query: ["gondar"])
+    assert should_prefetch("Plan a trip to Gondar")
+    assert not should_prefetch("Plan a trip to Gondar, how far is it?")
+
+def test_other_intents_prefetch():
+    assert should_prefetch("Tell me about the history of Aksum")
+    assert should_prefetch("Compare hotels in Bahir Dar")
+    assert should_prefetch("Explore Harar")
@@ -0,0 +1,93 @@
+from api import upload_jobs as upload_jobs_module
+from api.db_utils import get_db_connection, get_filename_by_id, insert_document_record, upsert_upload_job
+from api.upload_jobs import UploadJobQueue, UploadQueueFull
+import os
+import subprocess
+import sys
+import threading
+import time
+import pytest
+
+def _wait_finished(queue, job_id, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while queue.get(job_id)["finished_at"] is None:
+        assert time.monotonic() < deadline, "job did not finish"
+        time.sleep(0.01)
+    return queue.get(job_id)
+
+# Statuses as /upload-status in another process would see them
+def _recording(monkeypatch):
+    stored = []
+    upsert = upload_jobs_module.upsert_upload_job
+    def record(job):
+        if not stored or stored[-1] != (job["status"], job["finished_at"] is not None):
+            stored.append((job["status"], job["finished_at"] is not None))
+        upsert(job)
+    monkeypatch.setattr(upload_jobs_module, "upsert_upload_job", record)
+    return stored
+
+@pytest.fixture
+def queue():
+    queue = UploadJobQueue(workers=1, max_pending=2)
+    yield queue
+    queue.stop()
+
+def test_job_moves_through_its_states_with_progress(queue, tmp_path, fake_embeddings, monkeypatch):
+    path = tmp_path / "upload_jobs_gondar.csv"
+    path.write_text("place,note\nGondar,Castles of Fasil Ghebbi\nGondar,Debre Berhan Selassie church\n")
+    stored = _recording(monkeypatch)
+    job = queue.submit(str(path), "upload_jobs_gondar.csv", insert_document_record("upload_jobs_gondar.csv"))
+    job = _wait_finished(queue, job["job_id"])
+    # "done" is only ever stored together with finished_at
+    assert [status for status, _ in stored if status != "queued"] == ["parsing", "embedding", "done"]
+    assert stored[-1] == ("done", True) and ("done", False) not in stored
+    assert job["status"] == "done" and job["error"] is None
+    assert (job["pages_parsed"], job["chunks_total"], job["chunks_embedded"]) == (2, 2, 2)
+    assert not path.exists()
+    assert queue.stats()["pending"] == 0
+
+def test_failed_job_reports_the_error_and_drops_its_record(queue, tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("not a supported document")
+    file_id = insert_document_record("notes.txt")
+    job = _wait_finished(queue, queue.submit(str(path), "notes.txt", file_id)["job_id"])
+    assert job["status"] == "failed" and "Unsupported file type" in job["error"]
+    assert get_filename_by_id(file_id) is None
+    assert not path.exists()
+
+def test_queue_is_bounded(queue, tmp_path, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(upload_jobs_module, "load_document", lambda path: release.wait(5) and [])
+    paths = []
+    for number in range(3):
+        paths.append(tmp_path / f"blocked_{number}.pdf")
+        paths[-1].write_bytes(b"%PDF")
+    jobs = [queue.submit(str(paths[number]), paths[number].name, number) for number in range(2)]
+    with pytest.raises(UploadQueueFull):
+        queue.submit(str(paths[2]), paths[2].name, 2)
+    release.set()
+    for job in jobs:
+        _wait_finished(queue, job["job_id"])
+    assert queue.stats()["pending"] == 0
+
+def _stored_job(job_id, owner_pid, file_id):
+    job = {"job_id": job_id, "file_id": file_id, "filename": "waiting.pdf", "status": "queued",
+           "error": None, "created_at": time.time() - 7200, "finished_at": None}
+    upsert_upload_job(job)
+    conn = get_db_connection()
+    with conn:
+        conn.execute("UPDATE upload_jobs SET owner_pid = ?, updated_at = datetime('now', '-2 hours') WHERE job_id = ?", (owner_pid, job_id))
+
+def test_stored_job_is_abandoned_only_when_its_process_is_gone(queue):
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    waiting_id, orphan_id = insert_document_record("waiting.pdf"), insert_document_record("orphan.pdf")
+    _stored_job("queued-elsewhere", os.getppid(), waiting_id)
+    _stored_job("orphaned", exited.pid, orphan_id)
+
+    # Queued for two hours behind other uploads in a live process: still queued
+    assert queue.get("queued-elsewhere")["status"] == "queued"
+    assert get_filename_by_id(waiting_id) == "waiting.pdf"
+    job = queue.get("orphaned")
+    assert job["status"] == "failed" and job["finished_at"] is not None
+    assert get_filename_by_id(orphan_id) is None